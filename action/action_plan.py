@@ -0,0 +1,301 @@
+import os
+import json
+from functools import partial
+from types import MappingProxyType
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+from data.emr_data import EMRData
+from action.selection_planner import plan_selection, DEFAULT_SELECTION_METHODS
+
+
+STEPS_FILE_NAME = "steps.json"
+# Ceiling in seconds for wait_for_template steps polled by an input pacer
+TEMPLATE_WAIT_TIMEOUT = 3.0
+
+# Operation kinds
+OP_CALL = "call"  # Fully bound call, nothing depends on the record
+OP_MOVE = "move"  # Move to the located field or the last waited-for template
+OP_WRITE = "write"  # Type the current value
+OP_SELECT = "select"  # Pick a dropdown option from the selection table
+OP_WAIT_TEMPLATE = "wait_for_template"  # Locate a template and move the target coordinates there
+OP_LOOP = "loop"  # Repeat steps for every element of the current value
+
+KNOWN_ACTIONS = (
+    "mouse_move", "mouse_click", "mouse_scroll", "keyboard_write", "keyboard_press", "keyboard_hotkey",
+    "keyboard_release_all_keys", "wait", "wait_for_template", "check_selection_options",
+    "loop_array", "loop_tuple_array",
+)
+
+
+class Operation(NamedTuple):
+    """
+    One compiled step of a field.
+
+    Attributes:
+        kind (str): One of the OP_* kinds.
+        func (callable): Bound function executing the step.
+        data_name (str or None): EMRData field becoming the current value before the step runs.
+        text_key (str or None): Key read from dict values by OP_WRITE.
+        tuple_index (int or None): Element of tuple values typed by OP_WRITE inside loop_tuple_array.
+        table (mapping or None): Option -> tuple of keys pressed in order, for OP_SELECT.
+        steps (tuple): Loop body for OP_LOOP.
+        last_steps (tuple): Loop body of the last iteration for OP_LOOP.
+        required (bool): For OP_WAIT_TEMPLATE, fail the field when the template is not found.
+        template_name (str or None): Template located by OP_WAIT_TEMPLATE.
+    """
+    kind: str
+    func: Optional[Callable]
+    data_name: Optional[str] = None
+    text_key: Optional[str] = None
+    tuple_index: Optional[int] = None
+    table: Any = None
+    steps: Tuple = ()
+    last_steps: Tuple = ()
+    required: bool = True
+    template_name: Optional[str] = None
+
+
+class FieldPlan(NamedTuple):
+    """
+    Compiled steps of one field.
+
+    Attributes:
+        name (str): Field name.
+        operations (tuple): Operations in execution order.
+        data_names (tuple): Every EMRData field the steps read.
+    """
+    name: str
+    operations: Tuple[Operation, ...]
+    data_names: Tuple[str, ...]
+
+    def execute(self, x, y, emr_data):
+        """
+        Run the field against a record.
+
+        Args:
+            x (int): X-coordinate of the located field.
+            y (int): Y-coordinate of the located field.
+            emr_data (EMRData): Record providing the values.
+        """
+        _run_operations(self.operations, x, y, emr_data, "")
+
+
+def _run_operations(operations, x, y, emr_data, value):
+    """
+    Execute compiled operations; value is the current field value.
+
+    Returns:
+        tuple: (x, y) after the last operation, which wait_for_template may have moved.
+    """
+    for operation in operations:
+        if operation.data_name is not None:
+            value = emr_data.get_value(operation.data_name)
+        kind = operation.kind
+        if kind == OP_CALL:
+            operation.func()
+        elif kind == OP_MOVE:
+            operation.func(x, y)
+        elif kind == OP_WRITE:
+            if isinstance(value, dict):
+                text = value.get(operation.text_key)
+            elif operation.tuple_index is not None:
+                text = value[operation.tuple_index]
+            else:
+                text = value
+            operation.func(text)
+        elif kind == OP_SELECT:
+            operation.func(list(operation.table[value]))
+        elif kind == OP_WAIT_TEMPLATE:
+            coors = operation.func()
+            if coors:
+                x, y = coors
+            elif operation.required:
+                raise RuntimeError(f"Could not find template: {operation.template_name}")
+        elif kind == OP_LOOP:
+            values = value or []
+            for i, element in enumerate(values):
+                body = operation.last_steps if i + 1 == len(values) else operation.steps
+                _run_operations(body, x, y, emr_data, element)
+    return x, y
+
+
+class PagePlan(NamedTuple):
+    """
+    Compiled steps.json of one page.
+
+    Attributes:
+        config_dir (str): Page config folder the plan was compiled from.
+        fields (mapping): Field name -> FieldPlan, in steps.json order (read-only).
+        step_config (mapping): The parsed steps.json, kept for ordering constraints (read-only).
+    """
+    config_dir: str
+    fields: Any
+    step_config: Any
+
+
+def _load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def compile_page_plan(config_dir, control, locate_template, modifier_key, config_store=None, pacer=None):
+    """
+    Compile a page's steps.json and its selection tables into an immutable plan.
+
+    Every step is validated and bound once: unknown actions, missing selection
+    tables, unknown data names and malformed loops raise a ValueError naming the
+    field, instead of failing halfway through a record.
+
+    Args:
+        config_dir (str): Page config folder holding steps.json and the <field>.json selection tables.
+        control (Control): Input controller the operations are bound to.
+        locate_template (callable): locate_template(template_name) -> (x, y) or None.
+        modifier_key (str): Key substituted for "<MODIFIER_KEY>" in hotkeys.
+        config_store (EMRConfigStore, optional): Store serving steps.json and the selection tables
+                                                 from memory. Files are read from disk if None.
+        pacer (InputPacer, optional): Turns "wait" steps into waits for the UI to change after the previous
+                                      action and settle, with the configured seconds as ceiling, and
+                                      polls wait_for_template steps.
+
+    Returns:
+        PagePlan: The compiled page.
+    """
+    if config_store is not None:
+        step_config = config_store.steps(config_dir)
+    else:
+        step_config = _load_json(os.path.join(config_dir, STEPS_FILE_NAME))
+    known_data_names = set(vars(EMRData()))
+
+    def compile_steps(field_name, steps, in_loop, tuple_loop=False):
+        if not isinstance(steps, list):
+            raise ValueError(f"Steps of field {field_name} must be a list")
+        operations = []
+        data_names = []
+        selection_table = None
+        for j, step in enumerate(steps, 1):
+            if not (isinstance(step, list) and len(step) == 2 and isinstance(step[1], dict)):
+                raise ValueError(f"Malformed step {j} of field {field_name}: {step}")
+            action_name, params = step
+            if action_name not in KNOWN_ACTIONS:
+                raise ValueError(f"Unknown action {action_name} in field {field_name}")
+
+            data_name = params.get("data_name")
+            if data_name is not None:
+                if data_name not in known_data_names:
+                    raise ValueError(f"Unknown data name {data_name} in field {field_name}")
+                data_names.append(data_name)
+
+            if action_name == "check_selection_options":
+                table_path = os.path.join(config_dir, field_name + ".json")
+                if not os.path.exists(table_path):
+                    raise ValueError(f"Selection table not found for field {field_name}: {table_path}")
+                if config_store is not None:
+                    table = config_store.selection_table(config_dir, field_name)
+                else:
+                    table = _load_json(table_path)
+                # Shortest key sequence per option, among the methods the dropdown declares it supports
+                selection_table = MappingProxyType(plan_selection(
+                    table, methods=tuple(params.get("methods", DEFAULT_SELECTION_METHODS)),
+                    leading_entries=params.get("leading_entries", 0)
+                ))
+                if data_name is not None:
+                    operations.append(Operation(OP_CALL, lambda: None, data_name=data_name))
+                continue
+
+            if action_name == "mouse_move":
+                operation = Operation(OP_MOVE, partial(_move, control, params.get("smooth", True)))
+            elif action_name == "mouse_click":
+                operation = Operation(OP_CALL, partial(
+                    control.mouse_click, button=params.get("button", "left"), clicks=params.get("clicks", 1),
+                    interval=params.get("interval", 0.1)
+                ))
+            elif action_name == "mouse_scroll":
+                operation = Operation(OP_CALL, partial(control.mouse_scroll, clicks=params.get("clicks", 0)))
+            elif action_name == "keyboard_write":
+                operation = Operation(
+                    OP_WRITE,
+                    partial(_write, control, params.get("interval", 0.01), params.get("can_paste", True)),
+                    text_key=params.get("text_key", ""),
+                    tuple_index=params.get("tuple_index", 0) if tuple_loop else None,
+                )
+            elif action_name == "keyboard_press":
+                if selection_table is not None and j == len(steps):
+                    # The last key press of a dropdown is replaced by the option's planned key sequence
+                    operation = Operation(
+                        OP_SELECT, partial(control.keyboard_press, interval=0.1), table=selection_table
+                    )
+                else:
+                    operation = Operation(OP_CALL, partial(
+                        control.keyboard_press, button=params.get("key"), presses=params.get("presses", 1),
+                        interval=params.get("interval", 0.1)
+                    ))
+            elif action_name == "keyboard_hotkey":
+                keys = tuple(modifier_key if key == "<MODIFIER_KEY>" else key for key in params.get("keys", []))
+                operation = Operation(OP_CALL, partial(control.keyboard_hotkey, *keys, interval=params.get("interval", 0.1)))
+            elif action_name == "keyboard_release_all_keys":
+                operation = Operation(OP_CALL, control.keyboard_release_all_keys)
+            elif action_name == "wait":
+                if pacer is not None:
+                    operation = Operation(OP_CALL, partial(
+                        _paced_wait, pacer, f"wait:{field_name}", params.get("seconds", 1)
+                    ))
+                else:
+                    operation = Operation(OP_CALL, partial(control.backend.sleep, params.get("seconds", 1)))
+            elif action_name == "wait_for_template":
+                if "template_name" not in params:
+                    raise ValueError(f"wait_for_template without template_name in field {field_name}")
+                # Inside loops a missing template does not fail the field
+                template_name = params["template_name"]
+                if pacer is not None:
+                    locate = partial(_poll_template, pacer, locate_template, template_name)
+                else:
+                    locate = partial(locate_template, template_name)
+                operation = Operation(OP_WAIT_TEMPLATE, locate, required=not in_loop, template_name=template_name)
+            else:
+                if in_loop:
+                    raise ValueError(f"Nested loop in field {field_name}")
+                if data_name is None:
+                    raise ValueError(f"{action_name} without data_name in field {field_name}")
+                body, body_data_names = compile_steps(
+                    field_name, params.get("steps", []), in_loop=True, tuple_loop=action_name == "loop_tuple_array"
+                )
+                skip_in_last_loop = params.get("skip_in_last_loop", 0)
+                operation = Operation(
+                    OP_LOOP, None, steps=body,
+                    last_steps=body[:len(body) - skip_in_last_loop] if skip_in_last_loop else body
+                )
+                data_names.extend(body_data_names)
+
+            operations.append(operation._replace(data_name=data_name))
+        return tuple(operations), tuple(data_names)
+
+    fields = {}
+    for field_name, steps in step_config.items():
+        if field_name.startswith("_"):
+            continue  # Page-level settings such as _visit_order
+        operations, data_names = compile_steps(field_name, steps, in_loop=False)
+        fields[field_name] = FieldPlan(field_name, operations, data_names)
+    return PagePlan(config_dir, MappingProxyType(fields), MappingProxyType(step_config))
+
+
+def _move(control, smooth, x, y):
+    control.mouse_move(coor_x=x, coor_y=y, smooth=smooth)
+
+
+def _write(control, interval, copy_paste, text):
+    control.keyboard_write(text=text, interval=interval, copy_paste=copy_paste)
+
+
+def _paced_wait(pacer, label, seconds):
+    # A configured wait expects a visible change, so a screen that merely looks still does not end it
+    pacer.wait_until_settled(
+        label=label, timeout=pacer.tuned_timeout(label, default=seconds), require_change=True
+    )
+
+
+def _poll_template(pacer, locate_template, template_name):
+    label = f"template:{template_name}"
+    return pacer.wait_for(
+        partial(locate_template, template_name), label=label,
+        timeout=pacer.tuned_timeout(label, default=TEMPLATE_WAIT_TIMEOUT)
+    )
@@ -0,0 +1,251 @@
+import math
+
+
+# Key of steps.json listing fields that must be visited in a given order, e.g. dependent dropdowns
+VISIT_ORDER_KEY = "_visit_order"
+
+
+class FieldScheduler:
+    """
+    Orders the fields of a page to minimize scrolling and pointer travel.
+
+    Travel between two fields is estimated from EMRAssistant.scroll_and_get_coors():
+    changing scroll position costs two scroll actions plus a per-click cost, and
+    moving the pointer costs time proportional to the distance. Ordering
+    constraints are respected: fields listed in a steps.json "_visit_order" chain
+    keep their relative order, and a field whose steps do not start with a
+    mouse_move relies on the focus left by the previous field, so it stays right
+    after it.
+
+    Small pages are ordered exactly (dynamic programming over visited sets), larger
+    ones greedily by nearest next field.
+    """
+
+    def __init__(self, scroll_action_time=0.3, scroll_click_time=0.01, pointer_time_per_pixel=0.0002, exact_limit=10):
+        """
+        Initialize the FieldScheduler instance.
+
+        Args:
+            scroll_action_time (float, optional): Seconds per scroll action, including the Control delays.
+            scroll_click_time (float, optional): Seconds per scrolled click.
+            pointer_time_per_pixel (float, optional): Seconds of pointer travel per screen pixel.
+            exact_limit (int, optional): Largest number of visits ordered exactly.
+        """
+        self.scroll_action_time = scroll_action_time
+        self.scroll_click_time = scroll_click_time
+        self.pointer_time_per_pixel = pointer_time_per_pixel
+        self.exact_limit = exact_limit
+
+    @staticmethod
+    def constraints_from_steps(step_config, fields):
+        """
+        Read the ordering constraints of a page from its steps.json.
+
+        Args:
+            step_config (dict): Parsed steps.json.
+            fields (list of str): Fields to visit, in steps.json order.
+
+        Returns:
+            tuple: (precedences, chained) where precedences is a list of (before, after) pairs
+                   and chained maps a field to the field it must directly follow.
+        """
+        field_set = set(fields)
+        precedences = []
+        for chain in step_config.get(VISIT_ORDER_KEY, []):
+            chain = [field for field in chain if field in field_set]
+            precedences.extend(zip(chain, chain[1:]))
+
+        chained = {}
+        step_order = [field for field in step_config if field in field_set]
+        for previous_field, field in zip(step_order, step_order[1:]):
+            actions = [action_name for action_name, _ in step_config[field] if action_name != "check_selection_options"]
+            if not actions or actions[0] != "mouse_move":
+                chained[field] = previous_field
+        return precedences, chained
+
+    def travel_time(self, from_coors, to_coors):
+        """
+        Estimated seconds to go from one field to the next.
+
+        Args:
+            from_coors (tuple): (scroll_click, screen_x, screen_y) of the current field.
+            to_coors (tuple): (scroll_click, screen_x, screen_y) of the next field.
+        """
+        from_click, from_x, from_y = from_coors
+        to_click, to_x, to_y = to_coors
+        seconds = math.hypot(to_x - from_x, to_y - from_y) * self.pointer_time_per_pixel
+        if to_click != from_click:
+            # Scroll back to the top, then down to the target position
+            seconds += 2 * self.scroll_action_time + (from_click + to_click) * self.scroll_click_time
+        return seconds
+
+    def total_time(self, order, page_elements_coors, start):
+        """
+        Estimated travel seconds of a visiting order.
+
+        Args:
+            order (list of str): Field names in visiting order.
+            page_elements_coors (dict): Field name -> (scroll_click, screen_x, screen_y).
+            start (tuple): (scroll_click, screen_x, screen_y) before the first field.
+        """
+        seconds, position = 0.0, start
+        for field in order:
+            seconds += self.travel_time(position, page_elements_coors[field])
+            position = page_elements_coors[field]
+        return seconds
+
+    def _build_visits(self, fields, chained):
+        """
+        Group chained fields into visits that are scheduled as one block.
+
+        Chains are followed from their first field, so a field may come before the
+        field it follows in the input order. A field whose leader is not on the page,
+        or already has a follower, starts its own visit, and so does a field of a cycle.
+        """
+        field_set = set(fields)
+        follower = {}  # leader -> field directly following it
+        for field in fields:
+            leader = chained.get(field)
+            if leader in field_set and leader != field and leader not in follower:
+                follower[leader] = field
+        followed = set(follower.values())
+
+        visits = []
+        visit_of = {}
+
+        def add_visit(field):
+            visit = [field]
+            visit_of[field] = len(visits)
+            while visit[-1] in follower and follower[visit[-1]] not in visit_of:
+                visit.append(follower[visit[-1]])
+                visit_of[visit[-1]] = len(visits)
+            visits.append(visit)
+
+        for field in fields:
+            if field not in followed:
+                add_visit(field)
+        for field in fields:
+            if field not in visit_of:
+                add_visit(field)
+        return visits, visit_of
+
+    def schedule(self, page_elements_coors, precedences=(), chained=None, start=None):
+        """
+        Compute a visiting order of the fields.
+
+        Args:
+            page_elements_coors (dict): Field name -> (scroll_click, screen_x, screen_y), in the naive order.
+            precedences (list, optional): (before, after) pairs of fields.
+            chained (dict, optional): Field -> field it must directly follow.
+            start (tuple, optional): (scroll_click, screen_x, screen_y) before the first field.
+                                     Defaults to the top of the page with the pointer on the first field.
+
+        Returns:
+            list: Field names in visiting order.
+        """
+        fields = list(page_elements_coors)
+        if not fields:
+            return []
+        if start is None:
+            start = page_elements_coors[fields[0]]
+        visits, visit_of = self._build_visits(fields, chained or {})
+
+        # A visit can start once every visit it depends on is done
+        required = [0] * len(visits)
+        for before, after in precedences:
+            if before in visit_of and after in visit_of and visit_of[before] != visit_of[after]:
+                required[visit_of[after]] |= 1 << visit_of[before]
+
+        def entry(visit):
+            return page_elements_coors[visits[visit][0]]
+
+        def exit_(visit):
+            return page_elements_coors[visits[visit][-1]]
+
+        inner_time = [self.total_time(visit[1:], page_elements_coors, page_elements_coors[visit[0]]) for visit in visits]
+
+        if len(visits) <= self.exact_limit:
+            visit_order = self._exact_order(len(visits), required, entry, exit_, inner_time, start)
+        else:
+            visit_order = self._greedy_order(len(visits), required, entry, exit_, start)
+        return [field for visit in visit_order for field in visits[visit]]
+
+    def _exact_order(self, count, required, entry, exit_, inner_time, start):
+        """
+        Cheapest order over all visits respecting the precedences (Held-Karp).
+        """
+        full = (1 << count) - 1
+        # best[(done, last)] = (seconds, previous last)
+        best = {}
+        for visit in range(count):
+            if not required[visit]:
+                best[(1 << visit, visit)] = (self.travel_time(start, entry(visit)) + inner_time[visit], None)
+
+        for done in range(1, full + 1):
+            for last in range(count):
+                state = best.get((done, last))
+                if state is None:
+                    continue
+                for visit in range(count):
+                    if done & (1 << visit) or (required[visit] & done) != required[visit]:
+                        continue
+                    seconds = state[0] + self.travel_time(exit_(last), entry(visit)) + inner_time[visit]
+                    key = (done | (1 << visit), visit)
+                    if key not in best or seconds < best[key][0]:
+                        best[key] = (seconds, last)
+
+        candidates = [(best[(full, last)][0], last) for last in range(count) if (full, last) in best]
+        if not candidates:
+            raise ValueError("Field ordering constraints are cyclic")
+        _, last = min(candidates)
+        visit_order, done = [], full
+        while last is not None:
+            visit_order.append(last)
+            previous = best[(done, last)][1]
+            done &= ~(1 << last)
+            last = previous
+        return visit_order[::-1]
+
+    def _greedy_order(self, count, required, entry, exit_, start):
+        """
+        Repeatedly visit the nearest visit whose precedences are satisfied.
+        """
+        visit_order, done, position = [], 0, start
+        while len(visit_order) < count:
+            available = [
+                visit for visit in range(count)
+                if not done & (1 << visit) and (required[visit] & done) == required[visit]
+            ]
+            if not available:
+                raise ValueError("Field ordering constraints are cyclic")
+            visit = min(available, key=lambda visit: self.travel_time(position, entry(visit)))
+            visit_order.append(visit)
+            done |= 1 << visit
+            position = exit_(visit)
+        return visit_order
+
+
+def check_field_chains():
+    """
+    Check that chained fields stay together whatever their order in the input.
+
+    The follower "b" is listed before its leader "a", and "a" is far from "b", so
+    only the chain keeps "b" right after "a".
+
+    Returns:
+        bool: True if every order kept the chain.
+    """
+    scheduler = FieldScheduler()
+    coors = {"c": (0, 100, 100), "b": (0, 110, 100), "a": (3, 900, 700)}
+    ok = True
+    for fields in (["c", "b", "a"], ["a", "b", "c"], ["b", "a", "c"]):
+        page_elements_coors = {field: coors[field] for field in fields}
+        order = scheduler.schedule(page_elements_coors, chained={"b": "a"})
+        kept = sorted(order) == ["a", "b", "c"] and order.index("b") == order.index("a") + 1
+        print(f"{fields}: {order}{'' if kept else ' CHAIN BROKEN'}")
+        ok = ok and kept
+    return ok
+
+
+if __name__ == "__main__":
+    check_field_chains()
@@ -0,0 +1,150 @@
+from collections import deque
+from typing import NamedTuple, Tuple
+
+
+# Source of edges that can be taken from any page, e.g. a home link shown on every page
+ANY_PAGE = "*"
+
+
+class Edge(NamedTuple):
+    """
+    A click leading from one page to another.
+
+    Attributes:
+        source (str): Page the click is made on, or ANY_PAGE.
+        target (str): Page reached.
+        templates (tuple): General templates of the element to click; the first one found is clicked.
+    """
+    source: str
+    target: str
+    templates: Tuple[str, ...]
+
+
+class NavigationGraph:
+    """
+    Pages of an EMR and the clicks leading between them.
+
+    Declared in config.json under "navigation":
+
+        "navigation": {
+            "edges": [{"from": "home", "to": "manage_patients", "click": ["manage_patient_tab"]}, ...],
+            "recognize": {"manage_patients": ["add_new_patient"], ...},
+            "tasks": {"add_new_patient": "patient", ...}
+        }
+
+    "from": "*" marks an edge available on every page. "recognize" lists, in priority
+    order, the general templates identifying a page; pages not listed are recognized
+    by the templates of their outgoing edges. "tasks" maps a task to the page it starts on.
+
+    Configs without a "navigation" section get a graph derived from task_route: the
+    homepage_0/1/2 links lead home from anywhere, each route is a chain of pages starting
+    at home and ending on the task's node, and pages are linked by to_<target>_from_<page>.
+    """
+
+    def __init__(self, edges, recognizers=None, task_pages=None):
+        """
+        Initialize the NavigationGraph instance.
+
+        Args:
+            edges (list of Edge): Clicks between pages.
+            recognizers (dict, optional): Page -> templates identifying it, in priority order.
+            task_pages (dict, optional): Task name -> page the task starts on.
+        """
+        self.edges = list(edges)
+        self.task_pages = dict(task_pages or {})
+        self._outgoing = {}
+        for edge in self.edges:
+            self._outgoing.setdefault(edge.source, []).append(edge)
+        self.recognizers = dict(recognizers or {})
+        for source, edges_from in self._outgoing.items():
+            if source != ANY_PAGE and source not in self.recognizers:
+                self.recognizers[source] = [template for edge in edges_from for template in edge.templates]
+        self._paths = {}  # (source, target) -> tuple of edges
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Build the graph of a validated config.json.
+        """
+        navigation = config.get("navigation")
+        if navigation is not None:
+            edges = [
+                Edge(edge["from"], edge["to"], tuple(edge["click"]))
+                for edge in navigation.get("edges", [])
+            ]
+            return cls(edges, navigation.get("recognize"), navigation.get("tasks"))
+
+        edges = [Edge(ANY_PAGE, "home", ("homepage_0", "homepage_1", "homepage_2"))]
+        task_pages = {}
+        for task_name, route in config.get("task_route", {}).items():
+            source = "home"
+            for i, template in enumerate(route):
+                target = task_name if i + 1 == len(route) else f"{task_name}:{i + 1}"
+                edges.append(Edge(source, target, (template,)))
+                source = target
+            task_pages[task_name] = task_name
+        pages = list(config.get("pages", {}))
+        for page in pages:
+            for target in pages:
+                if target != page:
+                    edges.append(Edge(page, target, (f"to_{target}_from_{page}",)))
+        # Recognizing legacy pages would require every to_* template, so only expected pages are trusted
+        return cls(edges, recognizers={page: [] for page in pages}, task_pages=task_pages)
+
+    def pages(self):
+        """
+        Every page of the graph.
+        """
+        names = {edge.target for edge in self.edges} | {edge.source for edge in self.edges if edge.source != ANY_PAGE}
+        return sorted(names)
+
+    def task_page(self, task_name):
+        """
+        Page a task starts on.
+        """
+        if task_name not in self.task_pages:
+            raise ValueError(f"Invalid task: {task_name}")
+        return self.task_pages[task_name]
+
+    def shortest_path(self, source, target):
+        """
+        Fewest clicks from a page to another. Paths are cached.
+
+        Args:
+            source (str or None): Current page, or None if unknown, in which case only edges
+                                  available on every page can start the path.
+            target (str): Page to reach.
+
+        Returns:
+            tuple: Edges to take in order, empty if source is target.
+
+        Raises:
+            ValueError: If the target cannot be reached.
+        """
+        key = (source, target)
+        if key in self._paths:
+            return self._paths[key]
+        if source == target:
+            return ()
+
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            page = queue.popleft()
+            if page == target:
+                break
+            for edge in self._outgoing.get(page, []) + self._outgoing.get(ANY_PAGE, []):
+                if edge.target not in previous:
+                    previous[edge.target] = (page, edge)
+                    queue.append(edge.target)
+        if target not in previous:
+            raise ValueError(f"No navigation path from {source or 'an unknown page'} to {target}")
+
+        path = []
+        page = target
+        while previous[page] is not None:
+            page, edge = previous[page]
+            path.append(edge)
+        path = tuple(reversed(path))
+        self._paths[key] = path
+        return path
@@ -0,0 +1,88 @@
+# Ways a dropdown can be driven from the keyboard once it is open
+METHOD_LETTERS = "letters"  # Press an option's first letter repeatedly to cycle through the options starting with it
+METHOD_HOME_END = "home_end"  # Jump to the first or last option, then walk with the arrow keys
+METHOD_PREFIX = "prefix"  # Type the start of an option (type-ahead), then walk down with the arrow keys
+SELECTION_METHODS = (METHOD_LETTERS, METHOD_HOME_END, METHOD_PREFIX)
+# Letter cycling works in every dropdown; the other methods are opted into per field with steps.json "methods"
+DEFAULT_SELECTION_METHODS = (METHOD_LETTERS,)
+
+
+def _letter_keys(table, option):
+    letter, presses = table[option]
+    return (letter,) * presses
+
+
+def _home_end_keys(index, option_count, leading_entries):
+    from_top = ("home",) + ("down",) * (leading_entries + index)
+    from_bottom = ("end",) + ("up",) * (option_count - 1 - index)
+    return min(from_top, from_bottom, key=len)
+
+
+def _prefix_keys(options, index):
+    """
+    Shortest typed prefix plus down arrows reaching options[index].
+
+    Returns None if the option does not start with a letter or digit.
+
+    Type-ahead selects the first option starting with the typed text. Only letters
+    and digits are typed, since a space selects the highlighted option, and a prefix
+    repeating one character is left out because browsers treat it as letter cycling.
+    """
+    option = options[index]
+    lowered = [candidate.lower() for candidate in options]
+    best = None
+    for length in range(1, len(option) + 1):
+        prefix = option[:length]
+        if not prefix[-1].isalnum():
+            break
+        if length > 1 and len(set(prefix.lower())) == 1:
+            continue
+        first_match = next(i for i, candidate in enumerate(lowered) if candidate.startswith(prefix.lower()))
+        keys = tuple(prefix) + ("down",) * (index - first_match)
+        if best is None or len(keys) < len(best):
+            best = keys
+        if first_match == index:
+            break  # Longer prefixes cannot be shorter
+    return best
+
+
+def plan_selection(table, methods=DEFAULT_SELECTION_METHODS, leading_entries=0):
+    """
+    Precompute the shortest key sequence selecting each option of a dropdown.
+
+    Args:
+        table (dict): Selection table option -> [first letter, presses], in dropdown order,
+                      as built by utils/generate_selection_list.generate_dictionary().
+        methods (tuple, optional): Methods the dropdown supports, among SELECTION_METHODS. Defaults to
+                                   letter cycling only.
+        leading_entries (int, optional): Entries above the first option, e.g. an empty placeholder.
+
+    Returns:
+        dict: Option -> tuple of keys pressed in order. Ties keep the letter repeats of the table.
+    """
+    unknown_methods = set(methods) - set(SELECTION_METHODS)
+    if unknown_methods:
+        raise ValueError(f"Unknown selection methods: {sorted(unknown_methods)}")
+    options = list(table)
+    plan = {}
+    for index, option in enumerate(options):
+        candidates = []
+        if METHOD_LETTERS in methods:
+            candidates.append(_letter_keys(table, option))
+        if METHOD_PREFIX in methods:
+            prefix_keys = _prefix_keys(options, index)
+            if prefix_keys is not None:
+                candidates.append(prefix_keys)
+        if METHOD_HOME_END in methods:
+            candidates.append(_home_end_keys(index, len(options), leading_entries))
+        if not candidates:
+            raise ValueError(f"No selection method reaches option {option}")
+        plan[option] = min(candidates, key=len)
+    return plan
+
+
+def keystrokes_saved(table, plan):
+    """
+    Key presses a plan saves over repeating first letters, summed over all options.
+    """
+    return sum(presses for _, presses in table.values()) - sum(len(keys) for keys in plan.values())
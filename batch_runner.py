@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+from emr_assistant_new import EMRAssistant
+from computer.input_backend import create_input_backend
+from computer.screen_effect import OverlayState
+
+
+# Pages filled by each task, in order
+TASK_PAGES = {
+    "add_new_patient": ("patient", "insurance"),
+    "add_new_visit": ("visit_info", "billing_info", "billing_options"),
+}
+
+
+def _select_icd10(assistant):
+    if assistant.get_coordinates("ICD_type_9_to_10", img_dir=assistant.general_img_dir):
+        assistant.overlay.update_status("Switching to ICD-10...")
+        assistant.control.mouse_move(assistant.aligner.current_x, assistant.aligner.current_y)
+        assistant.control.mouse_click()
+
+
+# Called once a page is open, before its fields are filled
+PAGE_SETUP = {
+    "billing_info": _select_icd10,
+}
+
+
+class BatchCheckpoint:
+    """
+    Progress of a batch on disk: completed and failed record IDs, and the fields filled so far
+    in the record being entered.
+
+    The file is rewritten atomically after every change, so a crash loses at most the
+    field being filled.
+    """
+
+    def __init__(self, file_path):
+        """
+        Initialize the BatchCheckpoint instance, loading the file if it exists.
+
+        Args:
+            file_path (str): Path to the JSON checkpoint.
+        """
+        self.file_path = file_path
+        self.completed = set()
+        self.failed = {}  # record ID -> error message
+        self.current = None  # {"record_id", "page", "fields"} of the record being entered
+        self._lock = threading.Lock()
+        if os.path.exists(file_path):
+            with open(file_path, 'r') as f:
+                saved = json.load(f)
+            self.completed = set(saved.get("completed", []))
+            self.failed = saved.get("failed", {})
+            self.current = saved.get("current")
+
+    def save(self):
+        with self._lock:
+            snapshot = {
+                "completed": sorted(self.completed),
+                "failed": self.failed,
+                "current": self.current,
+            }
+            tmp_path = self.file_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.file_path)
+
+    def is_done(self, record_id):
+        return record_id in self.completed or record_id in self.failed
+
+    def start_page(self, record_id, page, fields=()):
+        self.current = {"record_id": record_id, "page": page, "fields": sorted(fields)}
+        self.save()
+
+    def field_done(self, field_name):
+        self.current["fields"].append(field_name)
+        self.save()
+
+    def finish(self, record_id, error=None):
+        if error is None:
+            self.completed.add(record_id)
+        else:
+            self.failed[record_id] = error
+        self.current = None
+        self.save()
+
+
+def read_records(file_path):
+    """
+    Stream the records of a JSONL file.
+
+    Each line is an object with a "task" (a key of TASK_PAGES), an optional "record_id"
+    (defaults to the line number) and the EMRData fields, either under "data" or at the top level.
+
+    Yields:
+        tuple: (record ID, task name, data dict)
+    """
+    with open(file_path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record_id = str(record.get("record_id", f"line:{line_number}"))
+            if "data" in record:
+                data = record["data"]
+            else:
+                data = {key: value for key, value in record.items() if key not in ("record_id", "task")}
+            # JSON has no tuples, e.g. for clinical_cpt_codes
+            data = {
+                key: [tuple(item) if isinstance(item, list) else item for item in value] if isinstance(value, list) else value
+                for key, value in data.items()
+            }
+            yield record_id, record.get("task"), data
+
+
+class BatchRunner:
+    """
+    Enters a queue of records with one assistant kept warm across records.
+
+    Templates, compiled page plans and page layouts stay loaded between records,
+    only the record data is swapped. Progress is checkpointed after every field.
+    On restart, completed and failed records are skipped, and the record that was
+    interrupted resumes on the page it was on, skipping the fields already filled.
+    This assumes the EMR form is still open where the previous run stopped.
+    """
+
+    def __init__(self, records_path, checkpoint_path=None, stop_on_error=False, **assistant_kwargs):
+        """
+        Initialize the BatchRunner instance.
+
+        Args:
+            records_path (str): JSONL file of records.
+            checkpoint_path (str, optional): Checkpoint file. Defaults to <records_path>.checkpoint.json.
+            stop_on_error (bool, optional): Stop at the first failed record instead of moving on.
+            **assistant_kwargs: Passed to EMRAssistant.
+        """
+        self.records_path = records_path
+        self.checkpoint = BatchCheckpoint(checkpoint_path or records_path + ".checkpoint.json")
+        self.stop_on_error = stop_on_error
+        self.assistant_kwargs = assistant_kwargs
+        self.assistant = None
+        self.records_done = 0
+        self.records_failed = 0
+        self.elapsed = 0.0
+
+    def records_per_minute(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return self.records_done * 60 / self.elapsed
+
+    def _enter_record(self, record_id, task_name, data):
+        """
+        Enter one record, resuming it if the checkpoint says it was interrupted.
+        """
+        if task_name not in TASK_PAGES:
+            raise ValueError(f"Invalid task: {task_name}")
+        pages = TASK_PAGES[task_name]
+        assistant = self.assistant
+        assistant.load_record(data)
+
+        resume = self.checkpoint.current
+        if resume is not None and resume["record_id"] == record_id and resume["page"] in pages:
+            first_page = pages.index(resume["page"])
+            assistant.set_page(resume["page"])
+            assistant.completed_fields = set(resume["fields"])
+            assistant.overlay.update_status(f"Resuming record {record_id} on page {resume['page']}...")
+        else:
+            first_page = 0
+            assistant.overlay.update_status(f"Record {record_id}: {task_name}...")
+            assistant.assign_task(task_name=task_name)
+            assistant.set_page(pages[0])
+
+        for i in range(first_page, len(pages)):
+            page = pages[i]
+            if i > first_page:
+                assistant.overlay.update_status(f"Switching to {page} page...")
+                assistant.change_page_within_task(target_page=page)
+            self.checkpoint.start_page(record_id, page, assistant.completed_fields)
+            if page in PAGE_SETUP and not assistant.completed_fields:
+                PAGE_SETUP[page](assistant)
+            assistant.run()
+
+    def run(self):
+        """
+        Enter every record not done yet.
+
+        Returns:
+            dict: "done" and "failed" record counts, "elapsed" seconds and "records_per_minute".
+        """
+        start = time.perf_counter()
+        try:
+            for record_id, task_name, data in read_records(self.records_path):
+                if self.checkpoint.is_done(record_id):
+                    continue
+                if self.assistant is None:
+                    first_page = TASK_PAGES.get(task_name, ("general",))[0]
+                    self.assistant = EMRAssistant(page=first_page, **self.assistant_kwargs)
+                    self.assistant.on_field_done = self.checkpoint.field_done
+
+                try:
+                    self._enter_record(record_id, task_name, data)
+                except Exception as e:
+                    self.records_failed += 1
+                    self.checkpoint.finish(record_id, error=str(e))
+                    print(f"Record {record_id} failed: {e}")
+                    if self.stop_on_error:
+                        raise
+                    continue
+
+                self.checkpoint.finish(record_id)
+                self.records_done += 1
+                self.elapsed = time.perf_counter() - start
+                rate = f"{self.records_per_minute():.1f} records/min"
+                print(f"Record {record_id} done ({self.records_done} done, {rate})")
+                self.assistant.overlay.set_state(OverlayState.READY)
+                self.assistant.overlay.update_status(f"Record {record_id} done, {rate}")
+        finally:
+            self.elapsed = time.perf_counter() - start
+            if self.assistant is not None:
+                self.assistant.cleanup()
+
+        return {
+            "done": self.records_done,
+            "failed": self.records_failed,
+            "elapsed": self.elapsed,
+            "records_per_minute": self.records_per_minute(),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enter a JSONL queue of EMR records.")
+    parser.add_argument("records", help="JSONL file, one record per line")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <records>.checkpoint.json)")
+    parser.add_argument("--config", default="./emr_templates/officeAlly/config.json", help="EMR config.json")
+    parser.add_argument("--page-discovery", default="scan", choices=("scan", "stitch", "lazy"))
+    parser.add_argument("--input-backend", default="pyautogui",
+                        help='"pyautogui", "dry-run" or "record:<file>" to record a dry run')
+    parser.add_argument("--stop-on-error", action="store_true")
+    args = parser.parse_args()
+
+    runner = BatchRunner(
+        args.records, checkpoint_path=args.checkpoint, stop_on_error=args.stop_on_error,
+        config_path=args.config, page_discovery=args.page_discovery,
+        input_backend=create_input_backend(args.input_backend)
+    )
+    summary = runner.run()
+    print(f"Done: {summary['done']}, failed: {summary['failed']}, "
+          f"{summary['records_per_minute']:.1f} records/min over {summary['elapsed']:.0f} secs")
+    sys.exit(1 if summary["failed"] else 0)
@@ -1,60 +1,158 @@
-import pyautogui
-import pyperclip
 import time
 import math
 
+from computer.input_backend import PyAutoGUIInputBackend, DryRunInputBackend
+
 
 def add_delay(before=0.05, after=0.1):
-    """Decorator to add a delay before and after the execution of a function."""
+    """
+    Decorator to add a delay before and after the execution of a function.
+    With an input pacer on the instance, the fixed delays are replaced by waiting until the UI settled.
+    """
     def decorator(func):
         def wrapper(*args, **kwargs):
-            if before > 0:
-                time.sleep(before)
+            pacer = getattr(args[0], "pacer", None) if args else None
+            # Sleep through the instance's input backend, so a dry run only accounts for the delay
+            backend = getattr(args[0], "backend", None) if args else None
+            sleep = backend.sleep if backend is not None else time.sleep
+            if before > 0 and pacer is None:
+                sleep(before)
             result = func(*args, **kwargs)
-            if after > 0:
-                time.sleep(after)
+            # Let observers (e.g. a frame grabber) know the screen may change from now on
+            input_listener = getattr(args[0], "input_listener", None) if args else None
+            if input_listener is not None:
+                input_listener()
+            if pacer is not None:
+                pacer.wait_until_settled(label=func.__name__)
+            elif after > 0:
+                sleep(after)
             return result
         return wrapper
     return decorator
 
-def smooth_move_to(x, y, duration=0.2):
-    start_x, start_y = pyautogui.position()
+
+# Smooth mouse motion: pointer events per second and the speed a move's duration is derived from
+MOVE_EVENT_RATE = 120
+MOVE_PIXELS_PER_SECOND = 2500
+MOVE_MIN_DURATION = 0.05
+MOVE_MAX_DURATION = 0.2
+MOVE_SNAP_DISTANCE = 3  # Moves shorter than this many pixels jump straight to the target
+
+
+def move_duration(distance):
+    """
+    Duration of a smooth move, proportional to its distance within [MOVE_MIN_DURATION, MOVE_MAX_DURATION].
+    """
+    if distance < MOVE_SNAP_DISTANCE:
+        return 0.0
+    return min(max(distance / MOVE_PIXELS_PER_SECOND, MOVE_MIN_DURATION), MOVE_MAX_DURATION)
+
+
+def plan_mouse_path(start_x, start_y, x, y, duration=None, event_rate=MOVE_EVENT_RATE):
+    """
+    Precompute an eased pointer path sampled at a fixed event rate.
+
+    Args:
+        start_x (int): Current X-coordinate.
+        start_y (int): Current Y-coordinate.
+        x (int): Target X-coordinate.
+        y (int): Target Y-coordinate.
+        duration (float, optional): Seconds the move takes. Defaults to move_duration(distance).
+        event_rate (int, optional): Pointer events per second.
+
+    Returns:
+        list: (seconds after start, x, y) points with distinct integer positions, ending on the target.
+    """
     dx = x - start_x
     dy = y - start_y
     distance = math.hypot(dx, dy)  # Calculate the distance in pixels
+    if duration is None:
+        duration = move_duration(distance)
+    steps = int(duration * event_rate)
+    if steps <= 1:
+        return [(0.0, x, y)]
 
-    start_time = time.time()
+    path = []
+    last_point = (start_x, start_y)
+    for step in range(1, steps + 1):
+        t = step / steps
+        eased_t = (1 - math.cos(t * math.pi)) / 2  # easeInOutSine function
+        point = (int(round(start_x + dx * eased_t)), int(round(start_y + dy * eased_t)))
+        if point != last_point:
+            path.append((t * duration, point[0], point[1]))
+            last_point = point
+    return path
 
-    while True:
-        elapsed_time = time.time() - start_time
-        if elapsed_time > duration:
-            break
 
-        t = elapsed_time / duration
-        eased_t = (1 - math.cos(t * math.pi)) / 2  # easeInOutSine function
+def smooth_move_to(x, y, backend, duration=None):
+    """
+    Move the pointer along a precomputed eased path.
+
+    Each point is sent at its scheduled time. Sleeping until the deadline of the next
+    point keeps the CPU idle between events, and a late event does not delay the later ones.
+
+    Args:
+        x (int): Target X-coordinate.
+        y (int): Target Y-coordinate.
+        backend (InputBackend): Backend sending the events and providing the clock.
+        duration (float, optional): Seconds the move takes. Defaults to a duration scaled to the distance.
+
+    Returns:
+        int: Number of pointer events sent.
+    """
+    start_x, start_y = backend.position()
+    path = plan_mouse_path(start_x, start_y, x, y, duration=duration)
+    start_time = backend.clock()
+    for offset, point_x, point_y in path:
+        delay = start_time + offset - backend.clock()
+        if delay > 0:
+            backend.sleep(delay)
+        backend.move_to(point_x, point_y, pause=False)
+    return len(path)
+
+
+def check_smooth_move(moves=10, distance=800):
+    """
+    Measure smooth moves against a dry-run input backend, which counts events and does not sleep.
 
-        target_x = start_x + dx * eased_t
-        target_y = start_y + dy * eased_t
-        pyautogui.moveTo(target_x, target_y)
+    Args:
+        moves (int, optional): Number of moves, alternating between two points.
+        distance (int, optional): Length of each move in pixels.
 
-    # Ensure the mouse ends up exactly at the target (x, y)
-    pyautogui.moveTo(x, y)
+    Returns:
+        dict: Events, virtual seconds and CPU milliseconds per move.
+    """
+    backend = DryRunInputBackend()
+    cpu_start = time.process_time()
+    for i in range(moves):
+        target = distance if i % 2 == 0 else 0
+        smooth_move_to(target, 0, backend)
+    cpu_seconds = time.process_time() - cpu_start
+    return {
+        "events_per_move": backend.counts.get("move_to", 0) / moves,
+        "expected_events_per_move": int(move_duration(distance) * MOVE_EVENT_RATE),
+        "seconds_per_move": backend.elapsed / moves,
+        "cpu_ms_per_move": cpu_seconds * 1000 / moves,
+    }
 
 
 class Control:
     """A class to simulate human behavior."""
     
-    def __init__(self, modifier_key=None, verbose=False):
+    def __init__(self, modifier_key=None, verbose=False, input_listener=None, pacer=None, backend=None):
         self.verbose = verbose
+        self.backend = backend if backend is not None else PyAutoGUIInputBackend()  # InputBackend sending the events
         self.modifier_key = modifier_key
+        self.input_listener = input_listener  # Called after every mouse/keyboard action
+        self.pacer = pacer  # InputPacer replacing the fixed delays, if any
 
     @add_delay()
     def mouse_move(self, coor_x, coor_y, smooth=False):
         try:
             if smooth:
-                smooth_move_to(coor_x, coor_y)
+                smooth_move_to(coor_x, coor_y, self.backend)
             else:
-                pyautogui.moveTo(coor_x, coor_y)
+                self.backend.move_to(coor_x, coor_y)
         except Exception as e:
             raise RuntimeError(
                 f"An error occurred while moving the mouse to certain position: {e}. "
@@ -63,7 +161,7 @@ class Control:
     @add_delay()
     def mouse_click(self, button="left", clicks=1, interval=0.1):
         try:
-            pyautogui.click(button=button, clicks=clicks, interval=interval)
+            self.backend.click(button=button, clicks=clicks, interval=interval)
         except Exception as e:
             raise RuntimeError(
                 f"An error occurred while clicking the mouse: {e}. "
@@ -75,7 +173,7 @@ class Control:
         Scrolls the screen vertically until the mouse reaches the target Y coordinate.
         """
         try:
-            pyautogui.scroll(clicks)
+            self.backend.scroll(clicks)
         except Exception as e:
             raise RuntimeError(
                 f"An error occurred while scrolling: {e}. "
@@ -88,9 +186,9 @@ class Control:
         """
         try:
             if not copy_paste:
-                pyautogui.write(text, interval=interval)
+                self.backend.write(text, interval=interval)
             else:
-                pyperclip.copy(text)
+                self.backend.copy(text)
                 # Paste
                 self.keyboard_hotkey(self.modifier_key, 'v')
         except Exception as e:
@@ -107,7 +205,7 @@ class Control:
         If keys is a list, each key in the list is pressed once.
         """
         try:
-            pyautogui.press(button, presses=presses, interval=interval)
+            self.backend.press(button, presses=presses, interval=interval)
         except Exception as e:
             raise RuntimeError(
                 f"An error occurred while keyboard pressing: {e}. "
@@ -119,7 +217,7 @@ class Control:
         Press a sequence of keys in the order they are provided, and then release them in reverse order.
         """
         try:
-            pyautogui.hotkey(*args, interval=interval)
+            self.backend.hotkey(*args, interval=interval)
         except Exception as e:
             raise RuntimeError(
                 f"An error occurred while doing keyboard hotkey: {e}. "
@@ -130,4 +228,4 @@ class Control:
         keys_to_release = ['command', 'ctrl', 'alt', 'shift', 'win', 'enter', 'esc', 'fn']
 
         for key in keys_to_release:
-            pyautogui.keyUp(key)
\ No newline at end of file
+            self.backend.key_up(key)
\ No newline at end of file
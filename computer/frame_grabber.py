@@ -0,0 +1,206 @@
+import time
+import threading
+
+import cv2
+import numpy as np
+
+from computer.screen_capture import CaptureBackend
+
+
+class FrameGrabber(CaptureBackend):
+    """
+    Background capture thread keeping the latest screen state in a ring buffer.
+
+    Frames are written into preallocated slots (grayscale and, optionally, BGR),
+    each tagged with a sequence number and capture timestamp, so capture latency
+    overlaps with matching. Readers get private copies, since the capture thread
+    keeps overwriting the slots. latest() and wait_for_newer() can return read-only
+    views with copy=False; such a view is only valid until ring_size - 1 newer
+    frames were captured.
+
+    The grabber is itself a CaptureBackend: grab() returns the newest frame that
+    was captured after the last mark_input(), so a TemplateAligner using it never
+    matches against a screen older than the last mouse or keyboard action.
+    """
+
+    def __init__(self, capture_backend, ring_size=3, interval=0.03, keep_color=False):
+        """
+        Initialize the FrameGrabber instance.
+
+        Args:
+            capture_backend (CaptureBackend): Backend the capture thread reads from.
+            ring_size (int, optional): Number of preallocated frame slots, at least 2.
+            interval (float, optional): Minimum seconds between two captures; 0 captures as fast as possible,
+                                        keeping a core busy.
+            keep_color (bool, optional): Also keep BGR frames, e.g. for the object detector.
+        """
+        if ring_size < 2:
+            raise ValueError("ring_size must be at least 2")
+        self.capture_backend = capture_backend
+        self.ring_size = ring_size
+        self.interval = interval
+        self.keep_color = keep_color
+
+        frame_w, frame_h = capture_backend.frame_size()
+        self._gray_ring = np.zeros((ring_size, frame_h, frame_w), dtype=np.uint8)
+        self._color_ring = np.zeros((ring_size, frame_h, frame_w, 3), dtype=np.uint8) if keep_color else None
+        self._sequences = [-1] * ring_size
+        self._start_times = [0.0] * ring_size  # When the capture of each slot started
+        self._timestamps = [0.0] * ring_size  # When the capture of each slot finished
+
+        self.sequence = -1  # Sequence number of the newest complete frame
+        self._input_time = 0.0  # Frames must have been started after this time to be served by grab()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.error = None
+
+    def start(self):
+        """
+        Start the capture thread.
+        """
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name="frame_grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the capture thread and wait for it to exit.
+        """
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _capture_loop(self):
+        """
+        Capture frames into the ring until stopped.
+        """
+        next_sequence = 0
+        while self._running:
+            slot = next_sequence % self.ring_size
+            start_time = time.perf_counter()
+            try:
+                if self.keep_color:
+                    color_frame = self.capture_backend.grab(gray=False)
+                    np.copyto(self._color_ring[slot], color_frame)
+                    cv2.cvtColor(color_frame, cv2.COLOR_BGR2GRAY, dst=self._gray_ring[slot])
+                else:
+                    np.copyto(self._gray_ring[slot], self.capture_backend.grab(gray=True))
+            except Exception as e:
+                with self._condition:
+                    self.error = e
+                    self._running = False
+                    self._condition.notify_all()
+                return
+
+            with self._condition:
+                self._sequences[slot] = next_sequence
+                self._start_times[slot] = start_time
+                self._timestamps[slot] = time.perf_counter()
+                self.sequence = next_sequence
+                self._condition.notify_all()
+            next_sequence += 1
+
+            if self.interval > 0:
+                remaining = self.interval - (time.perf_counter() - start_time)
+                if remaining > 0:
+                    time.sleep(remaining)
+
+    def _view(self, slot, gray, copy):
+        frame = self._gray_ring[slot] if gray else self._color_ring[slot]
+        if copy:
+            return frame.copy()
+        view = frame.view()
+        view.flags.writeable = False
+        return view
+
+    def _wait(self, predicate, timeout):
+        """
+        Wait until predicate(slot) holds for the newest frame.
+
+        Returns:
+            int: The slot of the newest frame.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._condition:
+            while True:
+                if self.error is not None:
+                    raise RuntimeError(f"Frame grabber stopped: {self.error}")
+                if self.sequence >= 0:
+                    slot = self.sequence % self.ring_size
+                    if predicate(slot):
+                        return slot
+                if not self._running:
+                    raise RuntimeError("Frame grabber is not running")
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a new frame")
+                self._condition.wait(remaining)
+
+    def latest(self, gray=True, copy=True, timeout=None):
+        """
+        Return the newest frame.
+
+        Args:
+            gray (bool, optional): Grayscale frame if True, otherwise BGR (requires keep_color).
+            copy (bool, optional): Return a private copy. If False, return a read-only view into the ring.
+            timeout (float, optional): Seconds to wait for the very first frame.
+
+        Returns:
+            tuple: (frame, sequence, timestamp)
+        """
+        slot = self._wait(lambda slot: True, timeout)
+        return self._view(slot, gray, copy), self._sequences[slot], self._timestamps[slot]
+
+    def wait_for_newer(self, sequence, gray=True, copy=True, timeout=None):
+        """
+        Wait for a frame newer than a given sequence number, e.g. after an input action.
+
+        Args:
+            sequence (int): Frames with this sequence number or lower are ignored.
+            gray (bool, optional): Grayscale frame if True, otherwise BGR (requires keep_color).
+            copy (bool, optional): Return a private copy. If False, return a read-only view into the ring.
+            timeout (float, optional): Maximum seconds to wait.
+
+        Returns:
+            tuple: (frame, sequence, timestamp)
+        """
+        slot = self._wait(lambda slot: self._sequences[slot] > sequence, timeout)
+        return self._view(slot, gray, copy), self._sequences[slot], self._timestamps[slot]
+
+    def mark_input(self):
+        """
+        Record that an input action just happened; later grab() calls only serve frames captured after it.
+        """
+        with self._condition:
+            self._input_time = time.perf_counter()
+
+    def grab(self, region=None, gray=True):
+        """
+        Return a copy of the newest frame started after the last mark_input().
+        """
+        input_time = self._input_time
+        slot = self._wait(lambda slot: self._start_times[slot] >= input_time, timeout=None)
+        # Only the requested region is copied out of the ring
+        return self._crop(self._view(slot, gray, copy=False), region).copy()
+
+    def screen_size(self):
+        return self.capture_backend.screen_size()
+
+    def frame_size(self):
+        return self.capture_backend.frame_size()
+
+    def close(self):
+        self.stop()
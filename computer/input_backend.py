@@ -0,0 +1,308 @@
+import json
+import time
+import threading
+
+
+class InputBackend:
+    """
+    Base class of the input backends used by Control.
+
+    A backend sends pointer and keyboard events and owns the clock the actions
+    are paced with, so that a backend without a desktop can account for delays
+    instead of sleeping them. Coordinates are screen coordinates as used by
+    pyautogui. Methods with a pause argument follow pyautogui's PAUSE after the
+    event when it is True.
+    """
+
+    def position(self):
+        """
+        Current pointer position.
+
+        Returns:
+            tuple: (x, y)
+        """
+        raise NotImplementedError
+
+    def move_to(self, x, y, pause=True):
+        raise NotImplementedError
+
+    def click(self, button="left", clicks=1, interval=0.1):
+        raise NotImplementedError
+
+    def scroll(self, clicks):
+        raise NotImplementedError
+
+    def write(self, text, interval=0.01):
+        raise NotImplementedError
+
+    def press(self, key, presses=1, interval=0.1):
+        """
+        Press a key, or each key of a list in order, presses times.
+        """
+        raise NotImplementedError
+
+    def hotkey(self, *keys, interval=0.1):
+        raise NotImplementedError
+
+    def key_up(self, key):
+        raise NotImplementedError
+
+    def copy(self, text):
+        """
+        Put text on the clipboard.
+        """
+        raise NotImplementedError
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def clock(self):
+        """
+        Monotonic clock in seconds.
+        """
+        return time.perf_counter()
+
+    def close(self):
+        """
+        Release resources held by the backend.
+        """
+        return
+
+
+class PyAutoGUIInputBackend(InputBackend):
+    """
+    Backend driving the real desktop through pyautogui and pyperclip.
+    """
+
+    def __init__(self):
+        import pyautogui
+        import pyperclip
+        self._pyautogui = pyautogui
+        self._pyperclip = pyperclip
+
+    def position(self):
+        position = self._pyautogui.position()
+        return (position[0], position[1])
+
+    def move_to(self, x, y, pause=True):
+        self._pyautogui.moveTo(x, y, _pause=pause)
+
+    def click(self, button="left", clicks=1, interval=0.1):
+        self._pyautogui.click(button=button, clicks=clicks, interval=interval)
+
+    def scroll(self, clicks):
+        self._pyautogui.scroll(clicks)
+
+    def write(self, text, interval=0.01):
+        self._pyautogui.write(text, interval=interval)
+
+    def press(self, key, presses=1, interval=0.1):
+        self._pyautogui.press(key, presses=presses, interval=interval)
+
+    def hotkey(self, *keys, interval=0.1):
+        self._pyautogui.hotkey(*keys, interval=interval)
+
+    def key_up(self, key):
+        self._pyautogui.keyUp(key)
+
+    def copy(self, text):
+        self._pyperclip.copy(text)
+
+
+class DryRunInputBackend(InputBackend):
+    """
+    Backend that sends nothing and only accounts for the time each action would take.
+
+    Sleeps advance a virtual clock instead of blocking, and every event adds the
+    intervals and the pyautogui PAUSE the real backend would spend, so a whole run
+    can be timed on a machine without a desktop.
+    """
+
+    def __init__(self, pause=0.1, start_position=(0, 0)):
+        """
+        Initialize the DryRunInputBackend instance.
+
+        Args:
+            pause (float, optional): Seconds pyautogui pauses after each call (pyautogui.PAUSE).
+            start_position (tuple, optional): Initial pointer (x, y).
+        """
+        self.pause = pause
+        self.elapsed = 0.0  # Virtual seconds spent so far
+        self.counts = {}  # event name -> number of calls
+        self.durations = {}  # event name -> virtual seconds, sleeps included under "sleep"
+        self.clipboard = ""
+        self._position = tuple(start_position)
+        self._lock = threading.Lock()
+
+    def _account(self, name, seconds, pause=True):
+        if pause:
+            seconds += self.pause
+        with self._lock:
+            self.elapsed += seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def position(self):
+        return self._position
+
+    def move_to(self, x, y, pause=True):
+        self._position = (x, y)
+        self._account("move_to", 0.0, pause)
+
+    def click(self, button="left", clicks=1, interval=0.1):
+        self._account("click", max(clicks - 1, 0) * interval)
+
+    def scroll(self, clicks):
+        self._account("scroll", 0.0)
+
+    def write(self, text, interval=0.01):
+        self._account("write", len(text) * interval)
+
+    def press(self, key, presses=1, interval=0.1):
+        key_count = 1 if isinstance(key, str) else len(key)
+        self._account("press", key_count * presses * interval)
+
+    def hotkey(self, *keys, interval=0.1):
+        # pyautogui waits the interval after every key down and key up
+        self._account("hotkey", 2 * len(keys) * interval)
+
+    def key_up(self, key):
+        self._account("key_up", 0.0)
+
+    def copy(self, text):
+        self.clipboard = text
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self._account("sleep", seconds, pause=False)
+
+    def clock(self):
+        return self.elapsed
+
+    def summary(self):
+        """
+        Returns:
+            dict: "elapsed" virtual seconds, and per event name its "count" and "seconds".
+        """
+        with self._lock:
+            return {
+                "elapsed": self.elapsed,
+                "events": {
+                    name: {"count": self.counts[name], "seconds": self.durations.get(name, 0.0)}
+                    for name in self.counts
+                },
+            }
+
+
+class RecordingInputBackend(InputBackend):
+    """
+    Backend that logs every event with its timestamp, optionally forwarding it to another backend.
+
+    Events are written as one compact JSON array per line: [seconds since start, event
+    name, arguments...]. Time comes from the wrapped backend, so recording a dry run
+    gives its virtual timeline. Read a recording back with load_input_events().
+    """
+
+    def __init__(self, file_path, backend=None):
+        """
+        Initialize the RecordingInputBackend instance.
+
+        Args:
+            file_path (str): Path of the recording, overwritten if it exists.
+            backend (InputBackend, optional): Backend the events are forwarded to.
+                                              Defaults to a DryRunInputBackend.
+        """
+        self.backend = backend if backend is not None else DryRunInputBackend()
+        self.file_path = file_path
+        self._file = open(file_path, 'w')
+        self._lock = threading.Lock()
+        self._start = self.backend.clock()
+
+    def _record(self, name, *args):
+        timestamp = round(self.backend.clock() - self._start, 4)
+        with self._lock:
+            self._file.write(json.dumps([timestamp, name, *args], separators=(',', ':')) + "\n")
+
+    def position(self):
+        return self.backend.position()
+
+    def move_to(self, x, y, pause=True):
+        self._record("move_to", x, y)
+        self.backend.move_to(x, y, pause=pause)
+
+    def click(self, button="left", clicks=1, interval=0.1):
+        self._record("click", button, clicks)
+        self.backend.click(button=button, clicks=clicks, interval=interval)
+
+    def scroll(self, clicks):
+        self._record("scroll", clicks)
+        self.backend.scroll(clicks)
+
+    def write(self, text, interval=0.01):
+        self._record("write", text)
+        self.backend.write(text, interval=interval)
+
+    def press(self, key, presses=1, interval=0.1):
+        self._record("press", key, presses)
+        self.backend.press(key, presses=presses, interval=interval)
+
+    def hotkey(self, *keys, interval=0.1):
+        self._record("hotkey", *keys)
+        self.backend.hotkey(*keys, interval=interval)
+
+    def key_up(self, key):
+        self._record("key_up", key)
+        self.backend.key_up(key)
+
+    def copy(self, text):
+        self._record("copy", text)
+        self.backend.copy(text)
+
+    def sleep(self, seconds):
+        self.backend.sleep(seconds)
+
+    def clock(self):
+        return self.backend.clock()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        self.backend.close()
+
+
+def load_input_events(file_path):
+    """
+    Read a recording written by RecordingInputBackend.
+
+    Returns:
+        list: (seconds since start, event name, arguments tuple) per event.
+    """
+    events = []
+    with open(file_path, 'r') as f:
+        for line in f:
+            if line.strip():
+                timestamp, name, *args = json.loads(line)
+                events.append((timestamp, name, tuple(args)))
+    return events
+
+
+def create_input_backend(name="pyautogui", **kwargs):
+    """
+    Build an input backend by name.
+
+    Args:
+        name (str, optional): "pyautogui" for the real desktop, "dry-run", or "record:<file path>"
+                              to record a dry run.
+        **kwargs: Passed to the backend constructor.
+
+    Returns:
+        InputBackend: The input backend.
+    """
+    if name.startswith("record:"):
+        return RecordingInputBackend(name[len("record:"):], **kwargs)
+    if name == "dry-run":
+        return DryRunInputBackend(**kwargs)
+    if name == "pyautogui":
+        return PyAutoGUIInputBackend(**kwargs)
+    raise ValueError(f"Unknown input backend: {name}")
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import threading
+
+import cv2
+import numpy as np
+
+
+PACING_STATS_FILE_NAME = "pacing_stats.json"
+
+class InputPacer:
+    """
+    Waits for the UI to settle after an input action instead of sleeping a fixed time.
+
+    After an action the screen (or a watched region of it) is polled until it
+    changed and then stayed still for a few frames, or did not change at all for a
+    short quiet period. A wait can instead require a change since the last input
+    action, for slow responses that start after the screen looked still. Every
+    wait has a ceiling timeout. The observed latencies are recorded per label, so
+    ceilings can be tuned from real response times and saved for later sessions.
+    """
+
+    def __init__(self, capture_backend, poll_interval=0.03, stable_frames=2, quiet_period=0.1,
+                 default_timeout=1.0, diff_threshold=8, downsample=4, min_samples=5):
+        """
+        Initialize the InputPacer instance.
+
+        Args:
+            capture_backend (CaptureBackend): Backend used to watch the screen.
+            poll_interval (float, optional): Seconds between two polls.
+            stable_frames (int, optional): Consecutive unchanged polls after a change for the UI to count as settled.
+            quiet_period (float, optional): Seconds without any change after which the action is assumed to
+                                            have no visible effect. Kept below the 0.15 s of fixed Control
+                                            delays it replaces.
+            default_timeout (float, optional): Ceiling of a wait when neither the caller nor the recorded
+                                               latencies give one.
+            diff_threshold (int, optional): Minimum gray-level difference counted as a change.
+            downsample (int, optional): Downscaling factor applied to polled frames before comparing them.
+            min_samples (int, optional): Recorded latencies needed before a label's ceiling is tuned.
+        """
+        self.capture_backend = capture_backend
+        self.poll_interval = poll_interval
+        self.stable_frames = stable_frames
+        self.quiet_period = quiet_period
+        self.default_timeout = default_timeout
+        self.diff_threshold = diff_threshold
+        self.downsample = downsample
+        self.min_samples = min_samples
+        self.region = None  # Region watched by default, in frame pixels; None watches the full frame
+        self.latencies = {}  # label -> settle latencies in seconds
+        self.timeouts = 0  # Waits that hit their ceiling
+        self._lock = threading.Lock()
+        self._sequence = -1
+        self._action_baseline = None  # (region, signature) captured when the last action's wait started
+
+    def _grab(self, region):
+        """
+        Capture a downsampled signature of the watched region.
+        """
+        if hasattr(self.capture_backend, "wait_for_newer"):
+            # A frame grabber serves the same frame until it captured a new one
+            frame, self._sequence, _ = self.capture_backend.wait_for_newer(self._sequence, timeout=self.default_timeout)
+            frame = self.capture_backend._crop(frame, region)
+        else:
+            frame = self.capture_backend.grab(region=region)
+        frame_h, frame_w = frame.shape[:2]
+        small = cv2.resize(
+            frame,
+            (max(frame_w // self.downsample, 1), max(frame_h // self.downsample, 1)),
+            interpolation=cv2.INTER_AREA
+        )
+        return small.astype(np.int16)
+
+    def _changed(self, previous, current):
+        return previous.shape != current.shape or int(np.abs(current - previous).max()) > self.diff_threshold
+
+    def tuned_timeout(self, label, default=None):
+        """
+        Ceiling of a wait, tuned from the latencies recorded for its label.
+
+        With enough samples the ceiling is twice the 95th percentile latency, never more
+        than the default.
+
+        Args:
+            label (str): Kind of wait, e.g. the Control method name.
+            default (float, optional): Ceiling without enough samples. Defaults to default_timeout.
+
+        Returns:
+            float: Seconds.
+        """
+        if default is None:
+            default = self.default_timeout
+        with self._lock:
+            samples = list(self.latencies.get(label, ()))
+        if len(samples) < self.min_samples:
+            return default
+        return min(default, max(2 * float(np.percentile(samples, 95)), self.quiet_period + self.poll_interval))
+
+    def record(self, label, latency):
+        """
+        Record how long the UI took to respond to an action.
+        """
+        with self._lock:
+            self.latencies.setdefault(label, []).append(latency)
+
+    def wait_until_settled(self, label="action", timeout=None, region=None, require_change=False):
+        """
+        Wait until the watched region changed and stopped changing, or stayed still for the quiet period.
+
+        Args:
+            label (str, optional): Kind of wait, used to record and tune latencies.
+            timeout (float, optional): Ceiling in seconds. Defaults to the tuned ceiling of the label.
+            region (tuple, optional): (left, top, width, height) to watch. Defaults to self.region.
+            require_change (bool, optional): Do not end on the quiet period; wait until the region differs
+                                             from when the last action's wait started, then settles.
+                                             Meant for explicit waits following an action.
+
+        Returns:
+            float: Seconds waited.
+        """
+        if timeout is None:
+            timeout = self.tuned_timeout(label)
+        if region is None:
+            region = self.region
+        start = time.perf_counter()
+        deadline = start + timeout
+        previous = self._grab(region)
+        changed_at = None
+        stable_polls = 0
+        if not require_change:
+            self._action_baseline = (region, previous)
+        elif self._action_baseline is not None and self._action_baseline[0] == region:
+            if self._changed(self._action_baseline[1], previous):
+                changed_at = start  # The action's change already arrived, only wait for it to settle
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                self.timeouts += 1
+                break
+            time.sleep(min(self.poll_interval, deadline - now))
+            current = self._grab(region)
+            if self._changed(previous, current):
+                changed_at = time.perf_counter()
+                stable_polls = 0
+            else:
+                stable_polls += 1
+                if changed_at is not None and stable_polls >= self.stable_frames:
+                    break
+                if changed_at is None and not require_change and time.perf_counter() - start >= self.quiet_period:
+                    break
+            previous = current
+
+        elapsed = time.perf_counter() - start
+        self.record(label, elapsed)
+        return elapsed
+
+    def wait_for(self, condition, label="condition", timeout=None):
+        """
+        Poll a condition, e.g. that an expected template appeared, until it holds or the ceiling is reached.
+
+        Args:
+            condition (callable): Returns a truthy value when the wait is over.
+            label (str, optional): Kind of wait, used to record and tune latencies.
+            timeout (float, optional): Ceiling in seconds. Defaults to the tuned ceiling of the label.
+
+        Returns:
+            The last value returned by condition, falsy if the ceiling was reached.
+        """
+        if timeout is None:
+            timeout = self.tuned_timeout(label)
+        start = time.perf_counter()
+        deadline = start + timeout
+        while True:
+            result = condition()
+            if result:
+                self.record(label, time.perf_counter() - start)
+                return result
+            now = time.perf_counter()
+            if now >= deadline:
+                self.timeouts += 1
+                return result
+            time.sleep(min(self.poll_interval, deadline - now))
+
+    def stats(self):
+        """
+        Latency summary per label.
+
+        Returns:
+            dict: label -> {"count", "mean", "p95", "timeout"} in seconds.
+        """
+        with self._lock:
+            snapshot = {label: list(samples) for label, samples in self.latencies.items()}
+        return {
+            label: {
+                "count": len(samples),
+                "mean": float(np.mean(samples)),
+                "p95": float(np.percentile(samples, 95)),
+                "timeout": self.tuned_timeout(label),
+            }
+            for label, samples in snapshot.items() if samples
+        }
+
+    def load(self, file_path, max_samples=200):
+        """
+        Merge latencies recorded by earlier sessions.
+
+        Args:
+            file_path (str): Path to the JSON file.
+            max_samples (int, optional): Most recent samples kept per label.
+        """
+        if not os.path.exists(file_path):
+            return
+        with open(file_path, 'r') as f:
+            saved_latencies = json.load(f)
+        with self._lock:
+            for label, samples in saved_latencies.items():
+                self.latencies[label] = (samples + self.latencies.get(label, []))[-max_samples:]
+
+    def save(self, file_path, max_samples=200):
+        """
+        Write the most recent latencies of every label to disk.
+        """
+        with self._lock:
+            snapshot = {label: samples[-max_samples:] for label, samples in self.latencies.items()}
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, file_path)
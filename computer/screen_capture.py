@@ -0,0 +1,305 @@
+import os
+import glob
+import math
+import threading
+
+import cv2
+import numpy as np
+
+
+class CaptureBackend:
+    """
+    Base class of the screen capture backends.
+
+    Regions are (left, top, width, height) in frame pixels, i.e. in the pixel
+    grid of a full capture, which on HiDPI displays is larger than the screen
+    size reported in points by screen_size().
+    """
+
+    def grab(self, region=None, gray=True):
+        """
+        Capture the screen, or a region of it.
+
+        Args:
+            region (tuple, optional): (left, top, width, height) in frame pixels. Full frame if None.
+            gray (bool, optional): Return a grayscale array if True, otherwise BGR.
+
+        Returns:
+            numpy.ndarray: The captured frame.
+        """
+        raise NotImplementedError
+
+    def screen_size(self):
+        """
+        Size of the screen in the coordinate space used by mouse input.
+
+        Returns:
+            tuple: (width, height)
+        """
+        raise NotImplementedError
+
+    def frame_size(self):
+        """
+        Size of a full capture in pixels.
+
+        Returns:
+            tuple: (width, height)
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release resources held by the backend.
+        """
+        return
+
+    @staticmethod
+    def _convert(frame, source_order, gray):
+        """
+        Convert an RGB/BGRA/BGR/gray frame into grayscale or BGR.
+        """
+        if frame.ndim == 2:
+            return frame if gray else cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        code = {
+            ("RGB", True): cv2.COLOR_RGB2GRAY,
+            ("RGB", False): cv2.COLOR_RGB2BGR,
+            ("BGRA", True): cv2.COLOR_BGRA2GRAY,
+            ("BGRA", False): cv2.COLOR_BGRA2BGR,
+            ("BGR", True): cv2.COLOR_BGR2GRAY,
+        }.get((source_order, gray))
+        return frame if code is None else cv2.cvtColor(frame, code)
+
+    @staticmethod
+    def _crop(frame, region):
+        if region is None:
+            return frame
+        left, top, width, height = region
+        return frame[top:top + height, left:left + width]
+
+
+class PyAutoGUICapture(CaptureBackend):
+    """
+    Portable capture backend built on pyautogui.screenshot().
+    """
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+        self._frame_size = None
+
+    def grab(self, region=None, gray=True):
+        screenshot = np.array(self._pyautogui.screenshot())
+        self._frame_size = (screenshot.shape[1], screenshot.shape[0])
+        # pyautogui regions are in points, so crop in frame pixels for consistent units across backends
+        return self._convert(np.ascontiguousarray(self._crop(screenshot, region)), "RGB", gray)
+
+    def screen_size(self):
+        return tuple(self._pyautogui.size())
+
+    def frame_size(self):
+        if self._frame_size is None:
+            self.grab()
+        return self._frame_size
+
+
+class MSSCapture(CaptureBackend):
+    """
+    Fast native capture backend built on the optional `mss` package.
+
+    Only the requested region is copied out of the display, which is much cheaper
+    than a full-desktop grab for small ROIs.
+    """
+
+    def __init__(self, monitor_index=1):
+        """
+        Initialize the MSSCapture instance.
+
+        Args:
+            monitor_index (int, optional): mss monitor number; 1 is the primary display.
+        """
+        try:
+            import mss
+        except ImportError:
+            raise ImportError("MSSCapture requires the 'mss' package: pip install mss")
+        self._mss = mss
+        self._local = threading.local()  # mss handles must not be shared between threads
+        self.monitor = self._handle().monitors[monitor_index]
+        full = self._handle().grab(self.monitor)
+        self._frame_size = (full.width, full.height)
+        self.scale = full.width / self.monitor["width"]
+
+    def _handle(self):
+        handle = getattr(self._local, "handle", None)
+        if handle is None:
+            handle = self._mss.mss()
+            self._local.handle = handle
+        return handle
+
+    def grab(self, region=None, gray=True):
+        if region is None:
+            return self._convert(np.asarray(self._handle().grab(self.monitor)), "BGRA", gray)
+
+        # mss takes regions in points; grab the enclosing point area, then crop the exact pixels
+        left, top, width, height = region
+        point_left, point_top = math.floor(left / self.scale), math.floor(top / self.scale)
+        point_right, point_bottom = math.ceil((left + width) / self.scale), math.ceil((top + height) / self.scale)
+        area = {
+            "left": self.monitor["left"] + point_left,
+            "top": self.monitor["top"] + point_top,
+            "width": point_right - point_left,
+            "height": point_bottom - point_top,
+        }
+        frame = np.asarray(self._handle().grab(area))
+        offset_x = left - int(round(point_left * self.scale))
+        offset_y = top - int(round(point_top * self.scale))
+        frame = frame[offset_y:offset_y + height, offset_x:offset_x + width]
+        return self._convert(np.ascontiguousarray(frame), "BGRA", gray)
+
+    def screen_size(self):
+        return self.monitor["width"], self.monitor["height"]
+
+    def frame_size(self):
+        return self._frame_size
+
+    def close(self):
+        handle = getattr(self._local, "handle", None)
+        if handle is not None:
+            handle.close()
+            self._local.handle = None
+
+
+class FileCapture(CaptureBackend):
+    """
+    Deterministic capture backend serving recorded frames from a folder of images or a video file.
+
+    Every grab() returns the next recorded frame (looping at the end by default), so
+    the whole pipeline can be replayed and benchmarked without a display.
+    """
+    IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+    def __init__(self, source, loop=True, advance_on_grab=True, screen_size=None):
+        """
+        Initialize the FileCapture instance.
+
+        Args:
+            source (str): Folder of images (played in name order) or a video file.
+            loop (bool, optional): Restart from the first frame after the last one.
+            advance_on_grab (bool, optional): Move to the next frame after each grab; otherwise call advance().
+            screen_size (tuple, optional): Screen size to report. Defaults to the frame size (no HiDPI scaling).
+        """
+        self.source = source
+        self.loop = loop
+        self.advance_on_grab = advance_on_grab
+        self.index = 0
+        self._frames = self._load_frames(source)
+        if not self._frames:
+            raise FileNotFoundError(f"No frames found in {source}")
+        first = self._frames[0]
+        self._frame_size = (first.shape[1], first.shape[0])
+        self._screen_size = tuple(screen_size) if screen_size else self._frame_size
+
+    def _load_frames(self, source):
+        """
+        Decode every recorded frame up front, so grabs cost no I/O.
+        """
+        if os.path.isdir(source):
+            frame_paths = sorted(
+                path for path in glob.glob(os.path.join(source, '*'))
+                if path.lower().endswith(self.IMAGE_EXTENSIONS)
+            )
+            frames = [cv2.imread(path, cv2.IMREAD_COLOR) for path in frame_paths]
+        else:
+            frames = self._read_video(source)
+        # Frames are served repeatedly, protect them from in-place edits by callers
+        for frame in frames:
+            frame.flags.writeable = False
+        return frames
+
+    @staticmethod
+    def _read_video(source):
+        """
+        Decode every frame of a video file.
+        """
+
+        video = cv2.VideoCapture(source)
+        frames = []
+        try:
+            while True:
+                ok, frame = video.read()
+                if not ok:
+                    break
+                frames.append(frame)
+        finally:
+            video.release()
+        return frames
+
+    def __len__(self):
+        return len(self._frames)
+
+    def seek(self, index):
+        """
+        Jump to a recorded frame.
+        """
+        self.index = index % len(self._frames) if self.loop else min(index, len(self._frames) - 1)
+
+    def advance(self):
+        """
+        Move to the next recorded frame.
+        """
+        self.seek(self.index + 1)
+
+    def grab(self, region=None, gray=True):
+        frame = self._frames[self.index]
+        if self.advance_on_grab:
+            self.advance()
+        return self._convert(np.ascontiguousarray(self._crop(frame, region)), "BGR", gray)
+
+    def screen_size(self):
+        return self._screen_size
+
+    def frame_size(self):
+        return self._frame_size
+
+
+def create_capture_backend(name="auto", **kwargs):
+    """
+    Build a capture backend by name.
+
+    Args:
+        name (str, optional): "auto" (mss if installed, otherwise pyautogui), "mss", "pyautogui",
+                              or "file:<folder or video>" for recorded frames.
+        **kwargs: Passed to the backend constructor.
+
+    Returns:
+        CaptureBackend: The capture backend.
+    """
+    if name.startswith("file:"):
+        return FileCapture(name[len("file:"):], **kwargs)
+    if name == "mss":
+        return MSSCapture(**kwargs)
+    if name == "pyautogui":
+        return PyAutoGUICapture(**kwargs)
+    if name == "auto":
+        try:
+            return MSSCapture(**kwargs)
+        except ImportError:
+            return PyAutoGUICapture(**kwargs)
+    raise ValueError(f"Unknown capture backend: {name}")
+
+
+_shared_capture_backend = None
+_shared_capture_lock = threading.Lock()
+
+
+def get_shared_capture_backend():
+    """
+    Return the process-wide default capture backend, creating it on first use.
+
+    Returns:
+        CaptureBackend: The shared capture backend.
+    """
+    global _shared_capture_backend
+    with _shared_capture_lock:
+        if _shared_capture_backend is None:
+            _shared_capture_backend = create_capture_backend()
+        return _shared_capture_backend
@@ -0,0 +1,261 @@
+import os
+import json
+import threading
+
+
+CONFIG_FILE_NAME = "config.json"
+STEPS_FILE_NAME = "steps.json"
+
+
+def _fail(path, message):
+    raise ValueError(f"Invalid EMR config {path}: {message}")
+
+
+def validate_config(config, path="config.json"):
+    """
+    Check the structure of an EMR config.json.
+
+    Raises:
+        ValueError: If a required key is missing or has the wrong type.
+    """
+    if not isinstance(config, dict):
+        _fail(path, "top level must be an object")
+    if not isinstance(config.get("base_dir"), str):
+        _fail(path, "base_dir must be a string")
+    general_paths = config.get("general_paths")
+    if not isinstance(general_paths, dict) or not all(isinstance(general_paths.get(key), str) for key in ("images", "configs")):
+        _fail(path, "general_paths must have string images and configs")
+    pages = config.get("pages")
+    if not isinstance(pages, dict):
+        _fail(path, "pages must be an object")
+    for page, page_info in pages.items():
+        if not isinstance(page_info, dict) or not all(isinstance(page_info.get(key), str) for key in ("images", "configs")):
+            _fail(path, f"page {page} must have string images and configs")
+    task_route = config.get("task_route", {})
+    if not isinstance(task_route, dict):
+        _fail(path, "task_route must be an object")
+    for task, route in task_route.items():
+        if not isinstance(route, list) or not all(isinstance(step, str) for step in route):
+            _fail(path, f"task_route {task} must be a list of template names")
+    navigation = config.get("navigation", {})
+    if not isinstance(navigation, dict):
+        _fail(path, "navigation must be an object")
+    for edge in navigation.get("edges", []):
+        if not (
+            isinstance(edge, dict) and isinstance(edge.get("from"), str) and isinstance(edge.get("to"), str)
+            and isinstance(edge.get("click"), list) and edge["click"] and all(isinstance(name, str) for name in edge["click"])
+        ):
+            _fail(path, f"navigation edge {edge} must have from, to and a non-empty click list of template names")
+    for page, templates in navigation.get("recognize", {}).items():
+        if not isinstance(templates, list) or not all(isinstance(name, str) for name in templates):
+            _fail(path, f"navigation recognizer of {page} must be a list of template names")
+    for task, page in navigation.get("tasks", {}).items():
+        if not isinstance(page, str):
+            _fail(path, f"navigation task {task} must map to a page name")
+
+
+def validate_steps(steps, path="steps.json"):
+    """
+    Check the structure of a page's steps.json.
+
+    Raises:
+        ValueError: If a field's steps are not a list of [action_name, params] pairs.
+    """
+    if not isinstance(steps, dict):
+        _fail(path, "top level must be an object")
+
+    def check_step_list(field, step_list):
+        if not isinstance(step_list, list):
+            _fail(path, f"steps of {field} must be a list")
+        for step in step_list:
+            if not (isinstance(step, list) and len(step) == 2 and isinstance(step[0], str) and isinstance(step[1], dict)):
+                _fail(path, f"step {step} of {field} must be [action_name, params]")
+            if "steps" in step[1]:
+                check_step_list(field, step[1]["steps"])
+
+    for field, step_list in steps.items():
+        if field == "_visit_order":
+            if not isinstance(step_list, list) or not all(
+                isinstance(chain, list) and all(isinstance(name, str) for name in chain) for chain in step_list
+            ):
+                _fail(path, "_visit_order must be a list of field name lists")
+        elif not field.startswith("_"):
+            check_step_list(field, step_list)
+
+
+def validate_selection_table(table, path="selection table"):
+    """
+    Check a dropdown selection table: option -> [key, presses].
+
+    Raises:
+        ValueError: If an option does not map to a key and a press count.
+    """
+    if not isinstance(table, dict):
+        _fail(path, "top level must be an object")
+    for option, keys in table.items():
+        if not (isinstance(keys, list) and len(keys) == 2 and isinstance(keys[0], str) and isinstance(keys[1], int)):
+            _fail(path, f"option {option} must map to [key, presses]")
+
+
+class EMRConfigStore:
+    """
+    In-memory index of an EMR template tree: config.json, every steps.json and every selection table.
+
+    Files are parsed and validated once, then served from memory. Each access
+    checks the file's modification time, so edited configs are picked up without
+    restarting. Every config folder has a generation number that changes whenever
+    one of its files is reloaded, so derived data such as compiled plans can tell
+    when to rebuild.
+    """
+
+    VALIDATORS = {
+        "config": validate_config,
+        "steps": validate_steps,
+        "selection": validate_selection_table,
+    }
+
+    def __init__(self, config_path):
+        """
+        Initialize the EMRConfigStore instance.
+
+        Args:
+            config_path (str): Path to the EMR's config.json.
+        """
+        if not os.path.exists(config_path):
+            raise FileNotFoundError(f"Configuration file not found at {config_path}")
+        self.config_path = config_path
+        self._files = {}  # path -> (mtime, parsed JSON)
+        self._generations = {}  # folder -> generation
+        self._lock = threading.RLock()
+        self.loads = 0  # JSON files parsed so far
+
+    def _get(self, path, kind):
+        """
+        Serve a parsed JSON file, reloading and revalidating it if it changed on disk.
+        """
+        path = os.path.normpath(path)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.VALIDATORS[kind](data, path)
+            self._files[path] = (mtime, data)
+            folder = os.path.dirname(path)
+            self._generations[folder] = self._generations.get(folder, 0) + 1
+            self.loads += 1
+            return data
+
+    @property
+    def config(self):
+        """
+        The validated config.json.
+        """
+        return self._get(self.config_path, "config")
+
+    @property
+    def base_dir(self):
+        return self.config["base_dir"]
+
+    def general_dirs(self):
+        """
+        Returns:
+            tuple: (images folder, configs folder) of the general templates.
+        """
+        general_paths = self.config["general_paths"]
+        return (
+            os.path.join(self.base_dir, general_paths["images"]),
+            os.path.join(self.base_dir, general_paths["configs"]),
+        )
+
+    def page_dirs(self, page):
+        """
+        Returns:
+            tuple: (images folder, configs folder) of a page.
+        """
+        pages = self.config["pages"]
+        if page not in pages:
+            raise ValueError(f"Invalid page type: {page}")
+        return (
+            os.path.join(self.base_dir, pages[page]["images"]),
+            os.path.join(self.base_dir, pages[page]["configs"]),
+        )
+
+    def page_info(self, page):
+        """
+        The config.json entry of a page, e.g. for its anchor_layout.
+        """
+        return self.config["pages"].get(page, {})
+
+    def steps(self, config_dir):
+        """
+        The validated steps.json of a page config folder.
+        """
+        return self._get(os.path.join(config_dir, STEPS_FILE_NAME), "steps")
+
+    def selection_table(self, config_dir, field_name):
+        """
+        The validated selection table <field>.json of a page config folder.
+        """
+        table_path = os.path.join(config_dir, field_name + ".json")
+        if not os.path.exists(table_path):
+            raise FileNotFoundError(f"Selection table not found for field {field_name}: {table_path}")
+        return self._get(table_path, "selection")
+
+    def generation(self, config_dir):
+        """
+        Check the files already loaded from a folder for changes and return its generation.
+
+        Returns:
+            int: A number that changes whenever a file of the folder was reloaded.
+        """
+        config_dir = os.path.normpath(config_dir)
+        with self._lock:
+            loaded_paths = [path for path in self._files if os.path.dirname(path) == config_dir]
+        for path in loaded_paths:
+            kind = "steps" if os.path.basename(path) == STEPS_FILE_NAME else "selection"
+            if os.path.exists(path):
+                self._get(path, kind)
+        return self._generations.get(config_dir, 0)
+
+    def preload(self):
+        """
+        Load and validate config.json and the steps and selection tables of every page.
+
+        Returns:
+            int: Number of files held in memory.
+        """
+        _, general_config_dir = self.general_dirs()
+        config_dirs = [general_config_dir] + [self.page_dirs(page)[1] for page in self.config["pages"]]
+        for config_dir in config_dirs:
+            if not os.path.isdir(config_dir):
+                continue
+            for file in sorted(os.listdir(config_dir)):
+                if file == STEPS_FILE_NAME:
+                    self.steps(config_dir)
+                elif file.endswith(".json"):
+                    self.selection_table(config_dir, os.path.splitext(file)[0])
+        return len(self._files)
+
+
+_config_stores = {}
+_config_stores_lock = threading.Lock()
+
+
+def get_config_store(config_path):
+    """
+    Return the process-wide store of an EMR config, creating it on first use.
+
+    Args:
+        config_path (str): Path to the EMR's config.json.
+
+    Returns:
+        EMRConfigStore: The shared store.
+    """
+    key = os.path.abspath(config_path)
+    with _config_stores_lock:
+        if key not in _config_stores:
+            _config_stores[key] = EMRConfigStore(config_path)
+        return _config_stores[key]
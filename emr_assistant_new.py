@@ -1,19 +1,50 @@
 import os
-import json
 import platform
 import time
+from functools import partial
 from computer.control import Control
 from computer.screen_effect import ScreenOverlay, OverlayState
 from template_alignment.template_alignment import TemplateAligner
+from template_alignment.template_cache import shared_template_cache
+from template_alignment.template_pack import TemplatePack, PACK_FILE_NAME
+from template_alignment.change_detector import FrameChangeDetector
+from computer.screen_capture import get_shared_capture_backend
+from computer.frame_grabber import FrameGrabber
+from computer.input_pacer import InputPacer, PACING_STATS_FILE_NAME
+from template_alignment.page_mapper import PageMapper
+from template_alignment.page_end_finder import PageEndFinder
+from template_alignment.scroll_tracker import ScrollTracker
+from template_alignment.layout_cache import PageLayoutCache, LAYOUT_CACHE_FILE_NAME, template_tree_version
+from template_alignment.anchor_layout import AnchorLayout
+from action.field_scheduler import FieldScheduler
+from action.action_plan import compile_page_plan
+from action.navigation import NavigationGraph
 from data.emr_data import EMRData
+from data.emr_config import get_config_store
 
 
 
 class EMRAssistant:
-    def __init__(self, page="general", config_path="./emr_templates/officeAlly/config.json", input_data=None, template_img_dir=None, template_config_dir=None):
+    LAYOUT_ANCHOR_COUNT = 2  # Fields checked before a cached page layout is reused
+    LAYOUT_ANCHOR_TOLERANCE = 8  # Maximum anchor displacement in screen pixels
+    NAVIGATION_TIMEOUT = 3  # Seconds a page change after a click may take
+
+    def __init__(self, page="general", config_path="./emr_templates/officeAlly/config.json", input_data=None, template_img_dir=None, template_config_dir=None, use_frame_grabber=False, page_discovery="scan", use_layout_cache=True, adaptive_pacing=False, input_backend=None, capture_backend=None):
         """
         Initialize the assistant with page type and optional custom template directories.
+        With use_frame_grabber, screenshots are captured continuously on a background thread.
+        page_discovery selects how fields are located: "scan" retries templates while scrolling,
+        "stitch" maps the whole page in one scroll pass and matches every template once,
+        "lazy" only locates the fields the record has data for, just before filling them.
+        With use_layout_cache, page layouts found by earlier runs are reused once their anchors validate.
+        With adaptive_pacing, fixed input delays are replaced by waiting until the screen settled.
+        input_backend (InputBackend) sends the mouse and keyboard events, e.g. a DryRunInputBackend
+        to time a run without a desktop; defaults to pyautogui.
+        capture_backend (CaptureBackend) takes the screenshots the frame grabber, the template
+        matching and the input pacing work on; defaults to the fastest one available.
         """
+        if page_discovery not in ("scan", "stitch", "lazy"):
+            raise ValueError(f"Invalid page discovery mode: {page_discovery}")
         self.operating_system = platform.system()
         self.page = page
         self.config_path = config_path
@@ -21,9 +52,35 @@ class EMRAssistant:
         self.modifier_key = self._initialize_modifier_key()
         self.scroll_total_clicks_current_page = None
         self.scroll_click_now = 0
-        self.control = Control(modifier_key=self.modifier_key)
-        self.aligner = TemplateAligner()
+        self.frame_grabber = None
+        self.pacer = None
+        if capture_backend is None:
+            capture_backend = get_shared_capture_backend()
+        if use_frame_grabber:
+            self.frame_grabber = FrameGrabber(capture_backend).start()
+            if adaptive_pacing:
+                self.pacer = InputPacer(self.frame_grabber)
+            self.control = Control(modifier_key=self.modifier_key, input_listener=self.frame_grabber.mark_input, pacer=self.pacer, backend=input_backend)
+            self.aligner = TemplateAligner(change_detector=FrameChangeDetector(), capture_backend=self.frame_grabber)
+        else:
+            if adaptive_pacing:
+                self.pacer = InputPacer(capture_backend)
+            self.control = Control(modifier_key=self.modifier_key, pacer=self.pacer, backend=input_backend)
+            self.aligner = TemplateAligner(change_detector=FrameChangeDetector(), capture_backend=capture_backend)
+        # Page changes are always polled, through a private pacer when input is not paced
+        self.navigation_pacer = self.pacer if self.pacer is not None else InputPacer(self.aligner.capture_backend)
         self.page_elements_coors = {}
+        self.page_discovery = page_discovery
+        self.scroll_tracker = ScrollTracker()
+        self.field_scheduler = FieldScheduler()
+        self.page_plans = {}  # page config dir -> (config generation, PagePlan)
+        self.scroll_offsets = {}  # scroll click -> page offset in screenshot pixels, measured during discovery
+        self.use_layout_cache = use_layout_cache
+        self.layout_cache = PageLayoutCache()
+        self.completed_fields = set()  # Fields of the current page already filled for the current record
+        self.on_field_done = None  # Called with the field name after each field is filled
+        self.current_node = None  # Page of the navigation graph on screen, None if unknown
+        self._navigation = None  # (config it was built from, NavigationGraph)
         
         # Initialize overlay
         self.overlay = ScreenOverlay()
@@ -36,15 +93,37 @@ class EMRAssistant:
         
         try:
             # Load configurations
-            self.config_data = self._load_config(self.config_path)
-            self.general_img_dir = os.path.join(self.config_data["base_dir"], self.config_data["general_paths"]["images"])
-            self.general_config_dir = os.path.join(self.config_data["base_dir"], self.config_data["general_paths"]["configs"])
+            self.config_store = get_config_store(self.config_path)
+            self.general_img_dir, self.general_config_dir = self.config_store.general_dirs()
 
             if template_img_dir and template_config_dir:
                 self.template_img_dir = template_img_dir
                 self.template_config_dir = template_config_dir
             else:
-                self.template_img_dir, self.template_config_dir = self._initialize_template_dir_from_config(self.config_data)
+                self.template_img_dir, self.template_config_dir = self._initialize_template_dir_from_config()
+
+            # Serve templates from the compiled pack when it is up to date, otherwise decode the PNGs once up front
+            pack_path = os.path.join(self.config_store.base_dir, PACK_FILE_NAME)
+            template_pack = TemplatePack(pack_path) if os.path.exists(pack_path) else None
+            if template_pack is not None and not template_pack.is_stale():
+                self.aligner.template_pack = template_pack
+            else:
+                if template_pack is not None:
+                    print(f"Template pack {pack_path} is out of date, loading template files instead")
+                self._preload_templates()
+
+            # Restore template locations remembered by earlier sessions
+            self.spatial_priors_path = os.path.join(self.config_store.base_dir, "spatial_priors.json")
+            self.aligner.spatial_priors.load(self.spatial_priors_path)
+
+            # Page layouts are kept next to config.json
+            self.layout_cache_path = os.path.join(os.path.dirname(self.config_path), LAYOUT_CACHE_FILE_NAME)
+            self.layout_cache.load(self.layout_cache_path)
+
+            # UI response times measured by earlier sessions tune the pacing ceilings
+            self.pacing_stats_path = os.path.join(self.config_store.base_dir, PACING_STATS_FILE_NAME)
+            if self.pacer is not None:
+                self.pacer.load(self.pacing_stats_path)
                 
             self.overlay.update_status("System initialized")
         except Exception as e:
@@ -58,70 +137,31 @@ class EMRAssistant:
         else:
             return "ctrl"
 
-    def _load_config(self, config_path):
+    def _initialize_template_dir_from_config(self):
         """
-        Loads the JSON configuration file.
+        Initializes template directories from JSON config.
         """
-        if not os.path.exists(config_path):
-            raise FileNotFoundError(f"Configuration file not found at {config_path}")
-        
-        with open(config_path, 'r') as f:
-            return json.load(f)
+        return self.config_store.page_dirs(self.page)
 
-    def _initialize_template_dir_from_config(self, config_data):
+    def _preload_templates(self):
         """
-        Initializes template directories from JSON config.
+        Decode the general and current page templates into the aligner's template cache.
         """
-        base_dir = config_data["base_dir"]
-        page_dirs = config_data["pages"]
-
-        if self.page not in page_dirs:
-            raise ValueError(f"Invalid page type: {self.page}")
-        
-        page_info = page_dirs[self.page]
-        img_dir = os.path.join(base_dir, page_info["images"])
-        config_dir = os.path.join(base_dir, page_info["configs"])
-
-        return img_dir, config_dir
-    
-    def _handle_array_loop(self, steps, skip_in_last_loop, array_values):
-        """Handle iteration over simple arrays"""
-        values_length = len(array_values)
-        steps_length = len(steps)
-        for i, value in enumerate(array_values):
-            for j, step in enumerate(steps):
-                # Skip redundent actions for the last loop
-                if i + 1 == values_length and (steps_length - skip_in_last_loop) == j:
-                    break
-                action_name, action_params = step
-                # Set text directly for keyboard_write actions
-                if action_name == "keyboard_write":
-                    action_params = action_params.copy()  # Create a copy to avoid modifying original
-                    action_params["text"] = value
-                self.execute_action(action_name, action_params, value)
-
-    def _handle_tuple_array_loop(self, steps, skip_in_last_loop, tuple_array):
-        """Handle iteration over arrays of tuples"""
-        values_length = len(tuple_array)
-        steps_length = len(steps)
-        for i, tuple_value in enumerate(tuple_array):
-            for j, step in enumerate(steps):
-                # Skip redundent actions for the last loop
-                if i + 1 == values_length and (steps_length - skip_in_last_loop) == j:
-                    break
-                action_name, action_params = step
-                # For keyboard_write, use tuple_index to get the right value
-                if action_name == "keyboard_write":
-                    action_params = action_params.copy()  # Create a copy to avoid modifying original
-                    index = action_params.get("tuple_index", 0)
-                    action_params["text"] = tuple_value[index]
-                self.execute_action(action_name, action_params, tuple_value)
+        for img_dir in (self.general_img_dir, self.template_img_dir):
+            if os.path.isdir(img_dir):
+                self.aligner.template_cache.preload_dir(img_dir)
     
     def get_all_fields_name(self):
         """
         Returns a list of all PNG file names in the specified folder.
         """
         folder_path = self.template_img_dir
+
+        # The template pack already indexes every image folder
+        if self.aligner.template_pack is not None:
+            png_names = self.aligner.template_pack.list_names(folder_path)
+            if png_names:
+                return png_names
             
         if not os.path.exists(folder_path):
             raise FileNotFoundError(f"Folder not found: {folder_path}")
@@ -139,97 +179,491 @@ class EMRAssistant:
         """Try to reach the end of the page"""
         self.overlay.set_state(OverlayState.RUNNING)
         self.overlay.update_status("Initializing scrolling parameters...")
-        footer_template = "footer"
+        footer_path = os.path.join(self.general_img_dir, "footer.png")
+        threshold_val = self.aligner.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
         self.control.mouse_move(self.aligner.screen_width // 2, self.aligner.screen_height // 2)
-        self.control.mouse_scroll(100)
 
-        # Start find a footer at the page
-        total_scroll = 0
-        while not self.get_coordinates(footer_template, img_dir=self.general_img_dir):
-            self.control.mouse_scroll(-10)
-            total_scroll += 10
-        self.scroll_total_clicks_current_page = total_scroll
+        def footer_visible(frame, scroll_click):
+            score, _, _ = self.aligner.align_many([footer_path], frame=frame, prior_key=(self.page, scroll_click))["footer"]
+            return score >= threshold_val
 
-        # Back to top
-        self.control.mouse_scroll(self.scroll_total_clicks_current_page)
-        self.overlay.update_status("Scrolling parameters initialized")
+        # Gallop down the page and bisect back, stopping at the footer or where the page stops moving
+        end_finder = PageEndFinder(self.aligner, self.control)
+        self.scroll_total_clicks_current_page = end_finder.find_end(footer_visible)
+        self.overlay.update_status(f"Scrolling parameters initialized ({end_finder.captures} captures)")
         return
     
+    def _general_templates_visible(self, template_names, require_all=True):
+        """
+        Check on one screenshot whether general templates are visible.
+
+        Args:
+            template_names (list of str): General templates to look for.
+            require_all (bool, optional): Require every template instead of any of them.
+        """
+        template_paths = [os.path.join(self.general_img_dir, name + ".png") for name in dict.fromkeys(template_names)]
+        results = self.aligner.align_many(template_paths, prior_key=("navigation", 0))
+        threshold_val = self.aligner.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
+        found = [results[name][0] >= threshold_val for name in template_names]
+        return all(found) if require_all else any(found)
+
+    def _wait_for_page(self, page, next_edge=None, timeout=NAVIGATION_TIMEOUT):
+        """
+        Wait for a page opened by a click.
+
+        The page is confirmed once all of its recognizer templates are visible. A page
+        without recognizers is confirmed by any template of the next click on the route,
+        and the last page of a route without recognizers once the screen settled.
+
+        Args:
+            page (str): Page of the navigation graph that should open.
+            next_edge (Edge, optional): Next click of the route, if any.
+            timeout (float, optional): Ceiling in seconds.
+
+        Raises:
+            RuntimeError: If the page was not confirmed within the timeout.
+        """
+        label = f"navigate:{page}"
+        timeout = self.navigation_pacer.tuned_timeout(label, default=timeout)
+        recognizers = self.navigation.recognizers.get(page)
+        if recognizers:
+            condition = partial(self._general_templates_visible, recognizers)
+        elif next_edge is not None:
+            condition = partial(self._general_templates_visible, next_edge.templates, require_all=False)
+        else:
+            self.navigation_pacer.wait_until_settled(label=label, timeout=timeout)
+            return
+        if not self.navigation_pacer.wait_for(condition, label=label, timeout=timeout):
+            raise RuntimeError(f"Page {page} did not open within {timeout:.1f} secs")
+
+    @property
+    def navigation(self):
+        """
+        Navigation graph of the EMR, rebuilt when config.json changes.
+        """
+        config = self.config_store.config
+        if self._navigation is None or self._navigation[0] is not config:
+            self._navigation = (config, NavigationGraph.from_config(config))
+        return self._navigation[1]
+
+    def _general_template_available(self, template_name):
+        template_path = os.path.join(self.general_img_dir, template_name + ".png")
+        if self.aligner.template_pack is not None and self.aligner.template_pack.get(template_path) is not None:
+            return True
+        return os.path.exists(template_path)
+
+    def identify_current_page(self, expected=None):
+        """
+        Recognize the page on screen from one screenshot.
+
+        A page is recognized when all of its recognizer templates are found. The expected
+        page is checked first, then the others in priority order. An expected page without
+        recognizers cannot be checked and is trusted.
+
+        Args:
+            expected (str, optional): Page the assistant believes it is on.
+
+        Returns:
+            str or None: The page, or None if no page was recognized.
+        """
+        recognizers = self.navigation.recognizers
+        if expected is not None and expected in recognizers and not recognizers[expected]:
+            return expected
+        candidates = [page for page in recognizers if recognizers[page] and page != expected]
+        if expected in recognizers:
+            candidates.insert(0, expected)
+
+        # Pages whose templates are all available, in priority order
+        candidates = [
+            page for page in candidates
+            if all(self._general_template_available(name) for name in recognizers[page])
+        ]
+        frame = self.aligner.get_screenshot()
+        threshold_val = self.aligner.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
+        scores = {}
+
+        def match(templates):
+            template_paths = [
+                os.path.join(self.general_img_dir, name + ".png") for name in dict.fromkeys(templates) if name not in scores
+            ]
+            if not template_paths:
+                return
+            results = self.aligner.align_many(template_paths, frame=frame, prior_key=("navigation", 0))
+            scores.update({name: result[0] for name, result in results.items()})
+
+        if candidates and candidates[0] == expected:
+            # Usually the assistant is where it believes, which only needs the expected page's templates
+            match(recognizers[expected])
+            if all(scores[name] >= threshold_val for name in recognizers[expected]):
+                return expected
+        match([name for page in candidates for name in recognizers[page]])
+        for page in candidates:
+            if all(scores[name] >= threshold_val for name in recognizers[page]):
+                return page
+        return None
+
+    def navigate_to(self, target, expected=None):
+        """
+        Take the fewest clicks from the page on screen to the target page.
+
+        Args:
+            target (str): Page of the navigation graph.
+            expected (str, optional): Page believed to be on screen. Defaults to the last page navigated to.
+        """
+        source = self.identify_current_page(expected=expected or self.current_node)
+        path = self.navigation.shortest_path(source, target)
+
+        for i, edge in enumerate(path):
+            for template_name in edge.templates:
+                if self.get_coordinates(column_name=template_name, img_dir=self.general_img_dir):
+                    break
+            else:
+                raise RuntimeError(f"Failed to navigate from {source} to {target}, step {edge.target}")
+            self.control.mouse_move(self.aligner.current_x, self.aligner.current_y)
+            self.control.mouse_click(clicks=2)
+            self._wait_for_page(edge.target, path[i + 1] if i + 1 < len(path) else None)
+            self.current_node = edge.target
+
     def assign_task(self, task_name):
-        if task_name not in self.config_data["task_route"]:
-            raise ValueError(f"Invalid task: {task_name}")
-        route_items = self.config_data["task_route"][task_name]
+        """
+        Open the page a task starts on, by the shortest path from the page on screen.
+        """
+        target = self.navigation.task_page(task_name)
         # Back to top
         self.control.mouse_move(self.aligner.screen_width // 2, self.aligner.screen_height // 2)
         self.control.mouse_scroll(100)
+        self.navigate_to(target)
 
-        # Back to home page first, need optimized for reading the homepage images
-        for home_img_name in ["homepage_0", "homepage_1", "homepage_2"]:
-            if self.get_coordinates(column_name=home_img_name, img_dir=self.general_img_dir):
-                self.control.mouse_move(self.aligner.current_x, self.aligner.current_y)
-                self.control.mouse_click(clicks=2)
-                time.sleep(3)
-                break
-            
-        for img_name in route_items:
-            if self.get_coordinates(column_name=img_name, img_dir=self.general_img_dir):
-                self.control.mouse_move(self.aligner.current_x, self.aligner.current_y)
-                self.control.mouse_click(clicks=2)
-                time.sleep(3)
-            else:
-                raise RuntimeError (f"Failed for assigning new task, step {img_name}")
+    def load_record(self, input_data):
+        """
+        Replace the record being entered, keeping templates, plans and page layouts warm.
+
+        Args:
+            input_data (dict): EMRData field -> value.
+        """
+        self.emr_data = EMRData()
+        self.emr_data.update(input_data)
+        self.completed_fields = set()
+
+    def set_page(self, page):
+        """
+        Switch the templates and steps used to the given page, without clicking anything.
+        """
+        self.page = page
+        self.current_node = page
+        self.template_img_dir, self.template_config_dir = self._initialize_template_dir_from_config()
+        self.page_elements_coors = {}
+        self.completed_fields = set()
+        if self.aligner.template_pack is None:
+            self._preload_templates()
 
-    # NEED MODIFY
     def change_page_within_task(self, target_page):
-        column_name = "to_" + target_page + "_from_" + self.page # Need a more comprehensive method for this in the future
-        if self.get_coordinates(column_name, img_dir=self.general_img_dir):
-            self.control.mouse_move(self.aligner.current_x, self.aligner.current_y)
-            self.control.mouse_click(clicks=2)
-            self.page = target_page
-            self.template_img_dir, self.template_config_dir = self._initialize_template_dir_from_config(self.config_data)
-        else:
-            raise RuntimeError(
-                f"An error occurred while changing page. "
-            )
-        return
+        """
+        Navigate to another page of the current task and switch its templates and steps.
+        """
+        self.navigate_to(target_page, expected=self.page)
+        self.set_page(target_page)
         
+    def _start_scroll_tracking(self):
+        """
+        Anchor the scroll tracker at the top of the page, where discovery leaves it.
+        """
+        self.scroll_click_now = 0
+        self.scroll_tracker.reset(keep_references=True)
+        self.scroll_tracker.track(self.aligner.get_screenshot(), expected_offset=0)
+
     def scroll_and_get_coors(self, column_name):
         target_scroll_click, coor_x, coor_y = self.page_elements_coors[column_name]
         if target_scroll_click != self.scroll_click_now:
             self.control.mouse_scroll(self.scroll_click_now)
             self.control.mouse_scroll(-target_scroll_click)
             self.scroll_click_now = target_scroll_click
+
+            # Correct the stored coordinates by how far the page really moved, instead of searching again
+            expected_offset = self.scroll_offsets.get(target_scroll_click)
+            if expected_offset is not None and self.scroll_tracker.has_frame:
+                measured_offset = self.scroll_tracker.track(
+                    self.aligner.get_screenshot(), expected_offset=expected_offset, keep_reference=True
+                )
+                drift = measured_offset - expected_offset
+                if drift:
+                    coor_y -= int(drift * self.aligner.screen_height / self.scroll_tracker.frame_height)
+                    if not 0 <= coor_y < self.aligner.screen_height:
+                        # The field scrolled out of view, look for it directly
+                        if not self.get_coordinates(column_name):
+                            raise RuntimeError(f"Field {column_name} not found after scrolling")
+                        coor_x, coor_y = self.aligner.current_x, self.aligner.current_y
         return coor_x, coor_y
 
-    def get_coordinates(self, column_name, img_dir=None):
+    def get_coordinates(self, column_name, img_dir=None, scroll_offset=None):
         if not img_dir:
             img_pth = os.path.join(self.template_img_dir, column_name + ".png")
         else:
             img_pth = os.path.join(img_dir, column_name + ".png")
-        if not self.aligner.align(img_pth):
+        # Search where the template was last seen on this page and scroll position first
+        if scroll_offset is None:
+            scroll_offset = self.scroll_click_now
+        if not self.aligner.align(img_pth, prior_key=(self.page, scroll_offset)):
             return False
         return True
     
+    def _layout_key(self):
+        """
+        Key of the current page in the layout cache: page, screen size, DPI scale and template version.
+        """
+        frame_w, _ = self.aligner.capture_backend.frame_size()
+        if self.aligner.template_pack is not None:
+            template_version = self.aligner.template_pack.version
+        else:
+            template_version = template_tree_version(self.template_img_dir)
+        return self.layout_cache.make_key(
+            self.page,
+            (self.aligner.screen_width, self.aligner.screen_height),
+            frame_w / self.aligner.screen_width,
+            template_version
+        )
+
+    def store_layout(self):
+        """
+        Save the discovered page layout, with the fields visible at the top of the page as anchors.
+        """
+        anchors = [
+            field for field, (scroll_click, _, _) in self.page_elements_coors.items() if scroll_click == 0
+        ][:self.LAYOUT_ANCHOR_COUNT]
+        if not anchors:
+            return  # Nothing to validate the layout with without scrolling
+        self.layout_cache.put(
+            self._layout_key(), self.scroll_total_clicks_current_page, self.scroll_offsets,
+            self.page_elements_coors, anchors
+        )
+
+    def restore_cached_layout(self):
+        """
+        Reuse the page layout of an earlier run if its anchors are still where they were.
+
+        Returns:
+            bool: True if the layout was restored and discovery can be skipped.
+        """
+        layout_key = self._layout_key()
+        layout = self.layout_cache.get(layout_key)
+        if layout is None:
+            return False
+
+        # Anchors are validated at the top of the page, on a single screenshot
+        self.control.mouse_move(self.aligner.screen_width // 2, self.aligner.screen_height // 2)
+        self.control.mouse_scroll(layout["scroll_total_clicks"] + 10)
+        threshold_val = self.aligner.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
+        top_frame = self.aligner.get_screenshot()
+        match_results = self.aligner.align_many(
+            [os.path.join(self.template_img_dir, anchor + ".png") for anchor in layout["anchors"]],
+            frame=top_frame,
+            prior_key=(self.page, 0)
+        )
+        for anchor in layout["anchors"]:
+            score, coor_x, coor_y = match_results[anchor]
+            _, cached_x, cached_y = layout["fields"][anchor]
+            if (score < threshold_val or abs(coor_x - cached_x) > self.LAYOUT_ANCHOR_TOLERANCE
+                    or abs(coor_y - cached_y) > self.LAYOUT_ANCHOR_TOLERANCE):
+                # The page moved, relocate its fields relative to the anchors of each scroll position
+                self.layout_cache.forget(layout_key)
+                self.scroll_total_clicks_current_page = layout["scroll_total_clicks"]
+                if not self.locate_fields_from_anchors(AnchorLayout.learn(layout["fields"])):
+                    return False
+                self.store_layout()
+                return True
+
+        self.scroll_total_clicks_current_page = layout["scroll_total_clicks"]
+        self.scroll_offsets = layout["scroll_offsets"]
+        self.page_elements_coors = layout["fields"]
+        # Discovery was skipped, so only the top of the page is a scroll reference until the
+        # other positions are measured against it while filling
+        self.scroll_tracker.reset()
+        self.scroll_tracker.add_reference(0, top_frame)
+        self._start_scroll_tracking()
+        self.overlay.update_status("Page layout restored from cache")
+        return True
+
+    def locate_fields_from_anchors(self, anchor_layout):
+        """
+        Locate the page fields from their offsets to the anchors of each scroll position.
+
+        At each scroll position only the anchors are matched on the full frame; every other
+        field is predicted from them and verified around the prediction. Fields whose
+        prediction fails verification are matched directly on the same frame.
+
+        Args:
+            anchor_layout (AnchorLayout): Anchors and field offsets of the current page.
+
+        Returns:
+            bool: True if every field of the layout was located.
+        """
+        self.overlay.update_status("Locating page elements from anchors...")
+        self.page_elements_coors = {}
+        self.scroll_offsets = {}
+        self.scroll_tracker.reset()
+        threshold_val = self.aligner.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
+        fallback_matches = 0
+
+        self.control.mouse_move(self.aligner.screen_width // 2, self.aligner.screen_height // 2)
+        self.control.mouse_scroll(self.scroll_total_clicks_current_page + 10)  # Back to top
+        scrolling_count = 0
+        for scroll_click in anchor_layout.scroll_clicks():
+            self.control.mouse_scroll(scrolling_count - scroll_click)
+            scrolling_count = scroll_click
+            frame = self.aligner.get_screenshot()
+            self.scroll_offsets[scroll_click] = self.scroll_tracker.track(frame)
+            self.scroll_tracker.add_reference(self.scroll_offsets[scroll_click], frame)
+
+            anchors = anchor_layout.anchors_at(scroll_click)
+            anchor_results = self.aligner.align_many(
+                [os.path.join(self.template_img_dir, anchor + ".png") for anchor in anchors],
+                frame=frame,
+                prior_key=(self.page, scroll_click)
+            )
+            anchor_positions = {
+                anchor: (coor_x, coor_y)
+                for anchor, (score, coor_x, coor_y) in anchor_results.items() if score >= threshold_val
+            }
+            for anchor, coors in anchor_positions.items():
+                self.page_elements_coors[anchor] = (scroll_click, *coors)
+
+            unverified = []
+            predictions = anchor_layout.predict(scroll_click, anchor_positions)
+            for field in anchor_layout.fields_at(scroll_click):
+                if field in anchor_positions:
+                    continue
+                if field in predictions:
+                    score, coor_x, coor_y = self.aligner.match_near(
+                        os.path.join(self.template_img_dir, field + ".png"), frame, *predictions[field]
+                    )
+                    if score >= threshold_val:
+                        self.page_elements_coors[field] = (scroll_click, coor_x, coor_y)
+                        continue
+                unverified.append(field)
+
+            # Per-field fallback to direct matching on the same frame
+            if unverified:
+                fallback_matches += len(unverified)
+                match_results = self.aligner.align_many(
+                    [os.path.join(self.template_img_dir, field + ".png") for field in unverified],
+                    frame=frame,
+                    prior_key=(self.page, scroll_click)
+                )
+                for field in unverified:
+                    score, coor_x, coor_y = match_results[field]
+                    if score >= threshold_val:
+                        self.page_elements_coors[field] = (scroll_click, coor_x, coor_y)
+
+        self.control.mouse_scroll(scrolling_count + 10)  # Back to top
+        self._start_scroll_tracking()
+        located_all = all(
+            field in self.page_elements_coors
+            for scroll_click in anchor_layout.scroll_clicks() for field in anchor_layout.fields_at(scroll_click)
+        )
+        self.overlay.update_status(f"Page elements located from anchors ({fallback_matches} direct matches)")
+        return located_all
+
+    def discover_page_layout(self):
+        """
+        Locate every field of the current page, reusing a cached or configured layout when possible.
+        """
+        if self.use_layout_cache and self.restore_cached_layout():
+            return
+
+        configured_layout = self.config_store.page_info(self.page).get("anchor_layout")
+        if configured_layout is not None:
+            self.get_scrolling_parameters()
+            if not self.locate_fields_from_anchors(AnchorLayout.from_dict(configured_layout)):
+                self.get_all_coordinates_on_page()
+        elif self.page_discovery == "stitch":
+            self.map_page_elements()
+        else:
+            self.get_scrolling_parameters()
+            self.get_all_coordinates_on_page()
+
+        if self.use_layout_cache:
+            self.store_layout()
+
     # TODO: What if you can't find all matches
     def get_all_coordinates_on_page(self):
         self.overlay.update_status("Detecting page elements...")
         self.page_elements_coors = {}
+        self.scroll_offsets = {}
+        self.scroll_tracker.reset()
         scrolling_count = 0
         template_names = self.get_all_fields_name()
 
+        threshold_val = self.aligner.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
+
         # When you not reaching the end of the page and you haven't found every coors yet, keep searching
         while scrolling_count <= self.scroll_total_clicks_current_page and (len(self.page_elements_coors) < len(template_names)):
-            for template in template_names:
-                if template not in self.page_elements_coors and self.get_coordinates(template):
-                    self.page_elements_coors[template] = (scrolling_count, self.aligner.current_x, self.aligner.current_y)
+            # One screenshot per scroll position, matched against every template still missing
+            pending_templates = [template for template in template_names if template not in self.page_elements_coors]
+            frame = self.aligner.get_screenshot()
+            self.scroll_offsets[scrolling_count] = self.scroll_tracker.track(frame)
+            self.scroll_tracker.add_reference(self.scroll_offsets[scrolling_count], frame)
+            match_results = self.aligner.align_many(
+                [os.path.join(self.template_img_dir, template + ".png") for template in pending_templates],
+                frame=frame,
+                prior_key=(self.page, scrolling_count)
+            )
+            for template in pending_templates:
+                score, coor_x, coor_y = match_results[template]
+                if score >= threshold_val:
+                    self.page_elements_coors[template] = (scrolling_count, coor_x, coor_y)
             if len(self.page_elements_coors) == len(template_names):
                 break
             self.control.mouse_scroll(-5)
             scrolling_count += 5
         self.control.mouse_scroll(scrolling_count + 5)
+        self._start_scroll_tracking()
         self.overlay.update_status("Page elements detected")
         return template_names
     
+    def map_page_elements(self):
+        """
+        Locate every field from a page stitched together in a single scroll pass.
+        """
+        self.overlay.update_status("Mapping page...")
+        template_names = self.get_all_fields_name()
+        page_mapper = PageMapper(self.aligner, self.control)
+        page_map = page_mapper.capture_page()
+        self.scroll_total_clicks_current_page = page_map.total_scroll_clicks
+        self.scroll_offsets = dict(page_map.offsets)
+        self.scroll_tracker.reset()
+        frame_h = page_map.frame_shape[0]
+        for page_offset in self.scroll_offsets.values():
+            self.scroll_tracker.add_reference(page_offset, page_map.image[page_offset:page_offset + frame_h])
+        self._start_scroll_tracking()
+
+        found_coors = page_mapper.locate_fields(
+            page_map, [os.path.join(self.template_img_dir, template + ".png") for template in template_names]
+        )
+        # Keep the template discovery order, like get_all_coordinates_on_page()
+        self.page_elements_coors = {
+            template: found_coors[template] for template in template_names if template in found_coors
+        }
+        self.overlay.update_status(f"Page elements detected ({page_mapper.captures} captures)")
+        return template_names
+
+    def plan_field_order(self, page_plan):
+        """
+        Order the located fields to minimize scrolling and pointer travel, respecting steps.json constraints.
+
+        Returns:
+            list: Field names in visiting order.
+        """
+        precedences, chained = self.field_scheduler.constraints_from_steps(
+            page_plan.step_config, list(self.page_elements_coors)
+        )
+        start = (self.scroll_click_now, self.aligner.screen_width // 2, self.aligner.screen_height // 2)
+        field_order = self.field_scheduler.schedule(self.page_elements_coors, precedences, chained, start)
+
+        naive_time = self.field_scheduler.total_time(list(self.page_elements_coors), self.page_elements_coors, start)
+        planned_time = self.field_scheduler.total_time(field_order, self.page_elements_coors, start)
+        self.overlay.update_status(f"Field order planned, estimated {naive_time - planned_time:.1f}s saved")
+        return field_order
+
     # TODO
     def check_filled_content(self, columm_value):
         """
@@ -237,101 +671,163 @@ class EMRAssistant:
         """
         pass
 
-    def check_selection_options(self, column_name):
-        config_pth = os.path.join(self.template_config_dir, column_name + ".json")
+    def cleanup(self):
+        """
+        Clean up resources
+        """
         try:
-            selection_options = self._load_config(config_pth)
-            return selection_options
-        
+            self.overlay.update_status("Cleaning up...")
+            self.aligner.spatial_priors.save(self.spatial_priors_path)
+            self.layout_cache.save(self.layout_cache_path)
+            if self.pacer is not None:
+                self.pacer.save(self.pacing_stats_path)
+            if self.frame_grabber is not None:
+                self.frame_grabber.stop()
+            # Flushes a recording input backend
+            self.control.backend.close()
+            self.overlay.cleanup()
         except Exception as e:
-            raise RuntimeError(
-                f"An error occurred while finding value in template dictionary: {e}"
+            print(f"Error during cleanup: {str(e)}")
+
+    
+    def fields_needing_action(self, page_plan, fields):
+        """
+        Keep the fields the current record has data for, and the fields that need no data.
+
+        Fields in completed_fields are left out, unless a field still to do relies on the
+        focus they leave, in which case they are filled again.
+
+        Returns:
+            list: Field names, in steps.json order.
+        """
+        needed_fields = [
+            field_name for field_name, field_plan in page_plan.fields.items()
+            if field_name in fields and (
+                not field_plan.data_names
+                or any(self.emr_data.has_value(data_name) for data_name in field_plan.data_names)
             )
+        ]
+        if not self.completed_fields:
+            return needed_fields
+        _, chained = self.field_scheduler.constraints_from_steps(page_plan.step_config, needed_fields)
+        redo_fields = set()
+        for field_name in reversed(needed_fields):
+            if (field_name not in self.completed_fields or field_name in redo_fields) and field_name in chained:
+                redo_fields.add(chained[field_name])
+        return [
+            field_name for field_name in needed_fields
+            if field_name not in self.completed_fields or field_name in redo_fields
+        ]
 
-    def execute_action(self, action_name, params, field_value=None):
+    def fill_fields_lazily(self, page_plan):
         """
-        Execute a single action based on the action name and parameters.
+        Locate and fill the fields that need an action, in scroll order, just before each is used.
+
+        The page is walked from the top in steps of 5 scroll clicks. At each position only the
+        templates of needed fields not located yet are matched, and every located field whose
+        ordering constraints are satisfied is filled right away.
         """
-        def process_text_value(params, field_value):
-            if isinstance(field_value, dict):
-                return field_value.get(params.get("text_key", ""))
-            elif isinstance(field_value, (list, tuple)):
-                if "tuple_index" in params:
-                    return field_value[params.get("tuple_index")]
-                return field_value
-            return field_value
-        
-        action_map = {
-            "mouse_move": lambda p: self.control.mouse_move(
-                coor_x=p.get("x"),
-                coor_y=p.get("y"),
-                smooth=p.get("smooth", True)
-            ),
-            
-            "mouse_click": lambda p: self.control.mouse_click(
-                button=p.get("button", "left"),
-                clicks=p.get("clicks", 1),
-                interval=p.get("interval", 0.1)
-            ),
-            
-            "keyboard_write": lambda p: self.control.keyboard_write(
-                text=p.get("text") if "text" in p else process_text_value(p, field_value),
-                interval=p.get("interval", 0.01),
-                copy_paste=p.get("can_paste", True)
-            ),
-            
-            "keyboard_press": lambda p: self.control.keyboard_press(
-                button=p.get("key"),
-                presses=p.get("presses", 1),
-                interval=p.get("interval", 0.1)
-            ),
-            
-            "keyboard_hotkey": lambda p: self.control.keyboard_hotkey(
-                *(self.modifier_key if key == "<MODIFIER_KEY>" else key 
-                for key in p.get("keys", [])),
-                interval=p.get("interval", 0.1)
-            ),
-            
-            "keyboard_release_all_keys": lambda p: self.control.keyboard_release_all_keys(),
-            
-            "mouse_scroll": lambda p: self.control.mouse_scroll(
-                clicks=p.get("clicks", 0)
-            ),
+        needed_fields = self.fields_needing_action(page_plan, self.get_all_fields_name())
+        precedences, chained = self.field_scheduler.constraints_from_steps(page_plan.step_config, needed_fields)
+        followers = {}
+        for field, leader in chained.items():
+            followers.setdefault(leader, []).append(field)
+        self.overlay.update_status(f"{len(needed_fields)} fields need an action")
+        if not needed_fields:
+            return
+
+        self.get_scrolling_parameters()
+        self.page_elements_coors = {}
+        self.scroll_offsets = {}  # Probes are not contiguous, so no drift correction
+        self.scroll_tracker.reset()
+        self.scroll_click_now = 0
+        threshold_val = self.aligner.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
+        filled = set()
+        scrolling_count = 0
 
-            "wait_for_template": lambda p: self.get_coordinates(p.get("template_name"), img_dir=self.general_img_dir),
+        def chain_from(field):
+            # A field followed by the fields that rely on the focus it leaves
+            chain = [field]
+            for follower in followers.get(field, []):
+                chain.extend(chain_from(follower))
+            return chain
+
+        def ready(field):
+            return (
+                field not in filled and field not in chained
+                and all(member in self.page_elements_coors for member in chain_from(field))
+                and all(before in filled for before, after in precedences if after == field)
+            )
 
-            "loop_array": lambda p: self._handle_array_loop(p.get("steps", []), p.get("skip_in_last_loop", 0), field_value),
+        while len(filled) < len(needed_fields):
+            ready_fields = [field for field in needed_fields if ready(field)]
+            if ready_fields:
+                for field in chain_from(ready_fields[0]):
+                    self.overlay.update_status(f"Processing field ({len(filled) + 1}/{len(needed_fields)}): {field}")
+                    self.process_field(page_plan.fields[field])
+                    filled.add(field)
+                continue
 
-            "loop_tuple_array": lambda p: self._handle_tuple_array_loop(p.get("steps", []), p.get("skip_in_last_loop", 0), field_value),
-            
-            "wait": lambda p: time.sleep(p.get("seconds", 1))
-        }
+            if scrolling_count > self.scroll_total_clicks_current_page:
+                missing = [field for field in needed_fields if field not in self.page_elements_coors]
+                raise RuntimeError(f"Fields not found on page: {missing}")
 
-        if action_name not in action_map:
-            raise ValueError(f"Unknown action: {action_name}")
+            # Look further down the page for the fields still missing
+            self.control.mouse_scroll(self.scroll_click_now)
+            self.control.mouse_scroll(-scrolling_count)
+            self.scroll_click_now = scrolling_count
+            pending_fields = [field for field in needed_fields if field not in self.page_elements_coors]
+            match_results = self.aligner.align_many(
+                [os.path.join(self.template_img_dir, field + ".png") for field in pending_fields],
+                prior_key=(self.page, scrolling_count)
+            )
+            for field in pending_fields:
+                score, coor_x, coor_y = match_results[field]
+                if score >= threshold_val:
+                    self.page_elements_coors[field] = (scrolling_count, coor_x, coor_y)
+            scrolling_count += 5
 
-        result = action_map[action_name](params)
-    
-        # Special handling for template waiting
-        if action_name == "wait_for_template":
-            if not result:
-                return False
-            # Update coordinates for next mouse move
-            return True
-        
-        return True
+    def process_field(self, field_plan):
+        """
+        Scroll to a located field and execute its compiled steps.
+        """
+        # Get the final coordinates after right scrolling
+        x, y = self.scroll_and_get_coors(field_plan.name)
+        field_plan.execute(x, y, self.emr_data)
+        self.completed_fields.add(field_plan.name)
+        if self.on_field_done is not None:
+            self.on_field_done(field_plan.name)
+
+    def get_page_plan(self):
+        """
+        Compiled steps of the current page, built on first use and rebuilt when its config files change.
 
-    def cleanup(self):
+        Returns:
+            PagePlan: The page plan.
         """
-        Clean up resources
+        generation = self.config_store.generation(self.template_config_dir)
+        cached = self.page_plans.get(self.template_config_dir)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        page_plan = compile_page_plan(
+            self.template_config_dir, self.control, self._locate_general_template, self.modifier_key,
+            config_store=self.config_store, pacer=self.pacer
+        )
+        # Compiling may have loaded files of the folder for the first time
+        self.page_plans[self.template_config_dir] = (self.config_store.generation(self.template_config_dir), page_plan)
+        return page_plan
+
+    def _locate_general_template(self, template_name):
         """
-        try:
-            self.overlay.update_status("Cleaning up...")
-            self.overlay.cleanup()
-        except Exception as e:
-            print(f"Error during cleanup: {str(e)}")
+        Locate a template of the general folder, e.g. for wait_for_template steps.
+
+        Returns:
+            tuple or None: (x, y) screen coordinates, or None if not found.
+        """
+        if not self.get_coordinates(template_name, img_dir=self.general_img_dir):
+            return None
+        return self.aligner.current_x, self.aligner.current_y
 
-    
     def run(self):
         """
         Execute the task for the current page using the configuration file.
@@ -339,76 +835,45 @@ class EMRAssistant:
         try:
             self.overlay.set_state(OverlayState.RUNNING)
             self.overlay.update_status("Starting task...")
-            
-            # Initialize scrolling and get coordinates
-            self.get_scrolling_parameters()
-            self.get_all_coordinates_on_page()
 
-            # Load step configuration file
-            step_config = self._load_config(os.path.join(self.template_config_dir, "steps.json"))
-            
-            total_items = len(self.page_elements_coors)
-            for i, field_name in enumerate(self.page_elements_coors.keys(), 1):
-                self.overlay.update_status(f"Processing field ({i}/{total_items}): {field_name}")
-                
-                try:
-                    # Get the steps for this field
-                    if field_name not in step_config:
-                        raise ValueError(f"No configuration found for field: {field_name}")
+            # Steps of the page, compiled once and reused for every record
+            page_plan = self.get_page_plan()
 
-                    steps = step_config[field_name]
-                    field_value = ""
+            if self.page_discovery == "lazy" and not (self.use_layout_cache and self.restore_cached_layout()):
+                # Locate and fill only the fields the record has data for, top to bottom
+                self.fill_fields_lazily(page_plan)
+            else:
+                # Initialize scrolling and get coordinates
+                if self.page_discovery != "lazy":
+                    self.discover_page_layout()
+                else:
+                    # Restored from cache: skip fields without data like the lazy discovery would
+                    needed_fields = set(self.fields_needing_action(page_plan, list(self.page_elements_coors)))
+                    self.page_elements_coors = {
+                        field: coors for field, coors in self.page_elements_coors.items() if field in needed_fields
+                    }
+                if self.completed_fields:
+                    # Resuming a record: skip the fields it already filled
+                    remaining_fields = set(self.fields_needing_action(page_plan, list(self.page_elements_coors)))
+                    self.page_elements_coors = {
+                        field: coors for field, coors in self.page_elements_coors.items()
+                        if field in remaining_fields or field not in self.completed_fields
+                    }
+
+                field_order = self.plan_field_order(page_plan)
+                total_items = len(field_order)
+                for i, field_name in enumerate(field_order, 1):
+                    self.overlay.update_status(f"Processing field ({i}/{total_items}): {field_name}")
                     
-                    # Get the final coordinates after right scrolling
-                    x, y = self.scroll_and_get_coors(field_name)
+                    try:
+                        # Get the steps for this field
+                        if field_name not in page_plan.fields:
+                            raise ValueError(f"No configuration found for field: {field_name}")
+                        self.process_field(page_plan.fields[field_name])
 
-                    # Check if it's a selection button
-                    selection_options = None
-                    
-                    # Execute each step in the configuration
-                    total_steps = len(steps)
-                    for j, step in enumerate(steps, 1):
-                        action_name, action_params = step
-
-                        # Find corresponding data value in the emr data instance:
-                        if "data_name" in action_params:
-                            data_name = action_params["data_name"]
-                            field_value = self.emr_data.get_value(data_name)
-                        
-                        if action_name == "check_selection_options":
-                            selection_options = self.check_selection_options(field_name)
-                            continue
-                        
-                        if action_name == "wait_for_template":
-                            success = self.execute_action(action_name, action_params)
-                            if success:
-                                # Update coordinates for next mouse move
-                                x, y = self.aligner.current_x, self.aligner.current_y
-                            else:
-                                raise RuntimeError(f"Could not find template: {action_params.get('template_name')}")
-                            continue
-
-                        if action_name == "mouse_move" and x is not None and y is not None:
-                            action_params = {"x": x, "y": y, "smooth": action_params.get("smooth", True)}
-
-                        if action_name == "keyboard_write":
-                            if isinstance(field_value, dict):
-                                action_params["text_key"] = action_params.get("text_key", "")
-                            else:
-                                action_params["text"] = field_value
-                            action_params["can_paste"] = action_params.get("can_paste", True)
-
-                        if action_name == "keyboard_press" and selection_options and j == total_steps:
-                            press_key, press_time = selection_options[field_value]
-                            action_params = {"key": press_key, "presses": press_time}
-                            selection_options = None
-
-                        # Execute the action
-                        self.execute_action(action_name, action_params, field_value)
-
-                except Exception as e:
-                    self.overlay.update_status(f"Error processing field {field_name}: {str(e)}")
-                    raise e
+                    except Exception as e:
+                        self.overlay.update_status(f"Error processing field {field_name}: {str(e)}")
+                        raise e
 
             # Back to top when done
             self.control.mouse_scroll(self.scroll_click_now + 10)
@@ -542,5 +1007,6 @@ if __name__ == "__main__":
     test_add_new_visit("add_new_visit", test_data)
     end = time.time()
     print(f"Total process time: {end - start} secs")
+    print(f"Template cache stats: {shared_template_cache.stats()}")
     # Need a uniform checking methods for window loading, current too hard-coding
     # Need a field content checking method
\ No newline at end of file
@@ -80,6 +80,28 @@ def get_bboxes_coordinates(chosen_model, img, classes=[], conf=0.5, rectangle_th
     return label_and_coors, copy_img
 
 
+def get_screen_bboxes_coordinates(chosen_model, frame_grabber, classes=[], conf=0.5, after_sequence=None, timeout=5.0):
+    """
+    Run the detector on the newest frame of a background FrameGrabber
+
+    Args:
+    - chosen_model (ultralytics.engine.model.Model): Loaded YOLO model object
+    - frame_grabber (computer.frame_grabber.FrameGrabber): Running grabber created with keep_color=True
+    - class (list of str): A list of class names to filter predictions to
+    - conf (float): The minimum confidence threshold for a prediction to be considered
+    - after_sequence (int): If given, wait for a frame newer than this sequence number (e.g. after a click)
+    - timeout (float): Maximum seconds to wait for the frame
+
+    Returns:
+    - tuple: Same as get_bboxes_coordinates()
+    """
+    if after_sequence is None:
+        frame, _, _ = frame_grabber.latest(gray=False, timeout=timeout)
+    else:
+        frame, _, _ = frame_grabber.wait_for_newer(after_sequence, gray=False, timeout=timeout)
+    return get_bboxes_coordinates(chosen_model, frame, classes=classes, conf=conf)
+
+
 if __name__ == "__main__":
     image_pth = "/Users/chun/Documents/Bridgent/yolov10_form/object_detection/train/aug_dataset_1/screenshot_test_2.png"
     image = cv2.imread(image_pth)
@@ -6,20 +6,18 @@ import numpy as np
 import re
 from scipy.spatial import distance
 from scipy.cluster import hierarchy
+from computer.screen_capture import get_shared_capture_backend
 
 def get_screen_scaling_factor():
-    actual_width, actual_height = pyautogui.size()
-    screenshot = pyautogui.screenshot()
-    screenshot_width, screenshot_height = screenshot.size
+    capture_backend = get_shared_capture_backend()
+    actual_width, actual_height = capture_backend.screen_size()
+    screenshot_width, screenshot_height = capture_backend.frame_size()
     width_scale = screenshot_width / actual_width
     height_scale = screenshot_height / actual_height
     return width_scale, height_scale
 
-def custom_screenshot():
-    screenshot = pyautogui.screenshot()
-    screenshot_np = np.array(screenshot)
-    screenshot_np = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
-    return screenshot_np
+def custom_screenshot(region=None):
+    return get_shared_capture_backend().grab(region=region, gray=False)
 
 def is_valid_word(text):
     # Stricter criteria for valid words
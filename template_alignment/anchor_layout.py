@@ -0,0 +1,135 @@
+class AnchorLayout:
+    """
+    Field positions expressed relative to one or two anchor templates per scroll position.
+
+    Locating the anchors on a frame is enough to predict where every other field of
+    that scroll position is, so a whole scroll position costs one or two full-frame
+    matches instead of one per field. Offsets are in screen coordinates.
+
+    The layout can be learned from a successful discovery (EMRAssistant.page_elements_coors)
+    or declared in config.json under pages.<page>.anchor_layout, in the format of to_dict().
+    """
+
+    def __init__(self, groups):
+        """
+        Initialize the AnchorLayout instance.
+
+        Args:
+            groups (dict): scroll_click -> {"anchors": [anchor names],
+                                            "offsets": {field: {anchor: (dx, dy)}}}
+        """
+        self.groups = groups
+
+    @classmethod
+    def learn(cls, page_elements_coors, anchor_count=2):
+        """
+        Build the layout from field coordinates found by discovery.
+
+        At each scroll position, the fields farthest apart are used as anchors, so
+        that two anchors also constrain each other.
+
+        Args:
+            page_elements_coors (dict): Field name -> (scroll_click, screen_x, screen_y).
+            anchor_count (int, optional): Anchors per scroll position, 1 or 2.
+
+        Returns:
+            AnchorLayout: The learned layout.
+        """
+        positions_by_click = {}
+        for field, (scroll_click, coor_x, coor_y) in page_elements_coors.items():
+            positions_by_click.setdefault(scroll_click, {})[field] = (coor_x, coor_y)
+
+        groups = {}
+        for scroll_click, positions in positions_by_click.items():
+            fields = list(positions)
+            if anchor_count >= 2 and len(fields) >= 2:
+                anchors = list(max(
+                    ((a, b) for i, a in enumerate(fields) for b in fields[i + 1:]),
+                    key=lambda pair: (positions[pair[0]][0] - positions[pair[1]][0]) ** 2
+                    + (positions[pair[0]][1] - positions[pair[1]][1]) ** 2
+                ))
+            else:
+                anchors = fields[:1]
+            offsets = {
+                field: {
+                    anchor: (positions[field][0] - positions[anchor][0], positions[field][1] - positions[anchor][1])
+                    for anchor in anchors
+                }
+                for field in fields
+            }
+            groups[scroll_click] = {"anchors": anchors, "offsets": offsets}
+        return cls(groups)
+
+    @classmethod
+    def from_dict(cls, layout_dict):
+        """
+        Load a layout saved with to_dict(), e.g. from config.json.
+        """
+        return cls({
+            int(scroll_click): {
+                "anchors": list(group["anchors"]),
+                "offsets": {
+                    field: {anchor: tuple(offset) for anchor, offset in field_offsets.items()}
+                    for field, field_offsets in group["offsets"].items()
+                },
+            }
+            for scroll_click, group in layout_dict.items()
+        })
+
+    def to_dict(self):
+        """
+        JSON-serializable form of the layout.
+        """
+        return {
+            str(scroll_click): {
+                "anchors": list(group["anchors"]),
+                "offsets": {
+                    field: {anchor: list(offset) for anchor, offset in field_offsets.items()}
+                    for field, field_offsets in group["offsets"].items()
+                },
+            }
+            for scroll_click, group in self.groups.items()
+        }
+
+    def scroll_clicks(self):
+        """
+        Scroll positions covered by the layout, from the top of the page down.
+        """
+        return sorted(self.groups)
+
+    def anchors_at(self, scroll_click):
+        """
+        Anchor names of a scroll position.
+        """
+        return self.groups[scroll_click]["anchors"]
+
+    def fields_at(self, scroll_click):
+        """
+        Field names of a scroll position, anchors included.
+        """
+        return list(self.groups[scroll_click]["offsets"])
+
+    def predict(self, scroll_click, anchor_positions):
+        """
+        Predict field positions from the anchors found on the current frame.
+
+        Args:
+            scroll_click (int): Scroll position the frame was captured at.
+            anchor_positions (dict): Anchor name -> (screen_x, screen_y) for the anchors that were found.
+
+        Returns:
+            dict: Field name -> predicted (screen_x, screen_y), averaged over the found anchors.
+                  Empty if no anchor of this scroll position was found.
+        """
+        predictions = {}
+        for field, field_offsets in self.groups[scroll_click]["offsets"].items():
+            estimates = [
+                (anchor_positions[anchor][0] + dx, anchor_positions[anchor][1] + dy)
+                for anchor, (dx, dy) in field_offsets.items() if anchor in anchor_positions
+            ]
+            if estimates:
+                predictions[field] = (
+                    int(round(sum(x for x, _ in estimates) / len(estimates))),
+                    int(round(sum(y for _, y in estimates) / len(estimates))),
+                )
+        return predictions
@@ -0,0 +1,129 @@
+import cv2
+import numpy as np
+
+
+class FrameChangeDetector:
+    """
+    Cheap detector of which parts of the screen changed between two frames.
+
+    Each frame is reduced to a downsampled signature; consecutive signatures are
+    compared per tile and the tiles whose difference exceeds a threshold are
+    reported as dirty.
+    """
+
+    def __init__(self, tile_size=64, downsample=4, diff_threshold=12):
+        """
+        Initialize the FrameChangeDetector instance.
+
+        Args:
+            tile_size (int, optional): Side of a tile in frame pixels; must be a multiple of downsample.
+            downsample (int, optional): Downscaling factor used for the signature.
+            diff_threshold (int, optional): Minimum gray-level difference in a tile to count it as changed.
+        """
+        if tile_size % downsample:
+            raise ValueError("tile_size must be a multiple of downsample")
+        self.tile_size = tile_size
+        self.downsample = downsample
+        self.diff_threshold = diff_threshold
+        self.previous_signature = None
+        self.last_mask = None
+
+    def signature(self, frame):
+        """
+        Downsample a grayscale frame into its comparison signature.
+
+        Args:
+            frame (numpy.ndarray): Grayscale frame.
+
+        Returns:
+            numpy.ndarray: The int16 signature.
+        """
+        frame_h, frame_w = frame.shape[:2]
+        small = cv2.resize(
+            frame,
+            (max(frame_w // self.downsample, 1), max(frame_h // self.downsample, 1)),
+            interpolation=cv2.INTER_AREA
+        )
+        return small.astype(np.int16)
+
+    def update(self, frame):
+        """
+        Compare a frame with the previous one and remember it for the next call.
+
+        Args:
+            frame (numpy.ndarray): Grayscale frame.
+
+        Returns:
+            numpy.ndarray: Boolean tile grid, True where the frame changed. The first
+                           frame (or a frame of a new size) is dirty everywhere.
+        """
+        current_signature = self.signature(frame)
+        mask = self.compare(self.previous_signature, current_signature)
+        self.previous_signature = current_signature
+        self.last_mask = mask
+        return mask
+
+    def compare(self, older_signature, current_signature):
+        """
+        Tile grid of the changes between two signatures, e.g. to compare a frame with any earlier one.
+
+        Args:
+            older_signature (numpy.ndarray or None): Earlier signature. Everything is dirty if None.
+            current_signature (numpy.ndarray): Signature of the current frame.
+
+        Returns:
+            numpy.ndarray: Boolean tile grid, True where the frame changed.
+        """
+        tile = self.tile_size // self.downsample
+        sig_h, sig_w = current_signature.shape
+        grid_h, grid_w = -(-sig_h // tile), -(-sig_w // tile)
+
+        if older_signature is None or older_signature.shape != current_signature.shape:
+            return np.ones((grid_h, grid_w), dtype=bool)
+        if older_signature is current_signature:
+            return np.zeros((grid_h, grid_w), dtype=bool)
+        diff = np.abs(current_signature - older_signature)
+        # Pad to whole tiles, then take the strongest change inside each tile
+        padded = np.zeros((grid_h * tile, grid_w * tile), dtype=np.int16)
+        padded[:sig_h, :sig_w] = diff
+        return padded.reshape(grid_h, tile, grid_w, tile).max(axis=(1, 3)) > self.diff_threshold
+
+    def reset(self):
+        """
+        Forget the previous frame, so the next one is reported dirty everywhere.
+        """
+        self.previous_signature = None
+        self.last_mask = None
+
+    def region_dirty(self, mask, x, y, w, h):
+        """
+        Check whether a frame-pixel rectangle overlaps any dirty tile.
+
+        Args:
+            mask (numpy.ndarray): Tile grid returned by update().
+            x, y (int): Top-left corner of the rectangle.
+            w, h (int): Size of the rectangle.
+
+        Returns:
+            bool: True if any tile under the rectangle changed.
+        """
+        tx0, ty0 = max(x // self.tile_size, 0), max(y // self.tile_size, 0)
+        tx1, ty1 = (x + w - 1) // self.tile_size, (y + h - 1) // self.tile_size
+        return bool(mask[ty0:ty1 + 1, tx0:tx1 + 1].any())
+
+    def dirty_bounds(self, mask):
+        """
+        Bounding box of every dirty tile, in frame pixels.
+
+        Returns:
+            tuple or None: (x0, y0, x1, y1), or None if nothing changed.
+        """
+        tile_ys, tile_xs = np.nonzero(mask)
+        if tile_xs.size == 0:
+            return None
+        return (
+            int(tile_xs.min()) * self.tile_size,
+            int(tile_ys.min()) * self.tile_size,
+            (int(tile_xs.max()) + 1) * self.tile_size,
+            (int(tile_ys.max()) + 1) * self.tile_size,
+        )
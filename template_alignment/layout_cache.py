@@ -0,0 +1,154 @@
+import os
+import json
+import hashlib
+import threading
+
+
+LAYOUT_CACHE_FILE_NAME = "layout_cache.json"
+
+
+def template_tree_version(img_dir):
+    """
+    Fingerprint the template images of a folder from their names, sizes and modification times.
+
+    Used as the template version when no compiled template pack is available.
+
+    Args:
+        img_dir (str): Folder holding the template PNGs.
+
+    Returns:
+        str: A short hex fingerprint.
+    """
+    fingerprint = hashlib.sha1()
+    if os.path.isdir(img_dir):
+        for file in sorted(os.listdir(img_dir)):
+            if file.lower().endswith('.png'):
+                stat = os.stat(os.path.join(img_dir, file))
+                fingerprint.update(f"{file}|{stat.st_mtime}|{stat.st_size}".encode())
+    return fingerprint.hexdigest()[:16]
+
+
+class PageLayoutCache:
+    """
+    Remembers the discovered layout of each EMR page across sessions.
+
+    A layout holds the page's scroll length, the offset of every scroll position,
+    the coordinates of every field and the names of the anchor templates used to
+    check that the cached layout still matches the screen. Layouts are stored per
+    page, screen size, DPI scale and template version, so a different display or
+    an edited template set never reuses a stale layout.
+    """
+
+    def __init__(self):
+        """
+        Initialize the PageLayoutCache instance.
+        """
+        self._layouts = {}  # "page|WxH|scale|version" -> layout dict
+        self._lock = threading.Lock()
+        self.dirty = False
+
+    @staticmethod
+    def make_key(page, screen_size, dpi_scale, template_version):
+        """
+        Build the lookup key of a page layout.
+
+        Args:
+            page (str): Page name from config.json.
+            screen_size (tuple): (width, height) of the screen in points.
+            dpi_scale (float): Frame pixels per screen point.
+            template_version (str): Template pack version or template_tree_version().
+
+        Returns:
+            str: The key used in the cache.
+        """
+        screen_w, screen_h = screen_size
+        return f"{page}|{screen_w}x{screen_h}|{dpi_scale:.2f}|{template_version}"
+
+    def get(self, key):
+        """
+        Look up a cached layout.
+
+        Returns:
+            dict or None: Layout with "scroll_total_clicks", "scroll_offsets" (scroll click -> page offset),
+                          "fields" (field name -> (scroll_click, screen_x, screen_y)) and "anchors",
+                          or None if the page was never cached under this key.
+        """
+        with self._lock:
+            layout = self._layouts.get(key)
+        if layout is None:
+            return None
+        return {
+            "scroll_total_clicks": layout["scroll_total_clicks"],
+            "scroll_offsets": {int(click): offset for click, offset in layout["scroll_offsets"].items()},
+            "fields": {name: tuple(coors) for name, coors in layout["fields"].items()},
+            "anchors": list(layout["anchors"]),
+        }
+
+    def put(self, key, scroll_total_clicks, scroll_offsets, fields, anchors):
+        """
+        Record the layout of a page after a successful discovery.
+
+        Args:
+            key (str): Key built by make_key().
+            scroll_total_clicks (int): Scroll clicks from the top to the end of the page.
+            scroll_offsets (dict): Scroll click -> page offset in frame pixels.
+            fields (dict): Field name -> (scroll_click, screen_x, screen_y).
+            anchors (list of str): Fields checked before the layout is reused.
+        """
+        layout = {
+            "scroll_total_clicks": int(scroll_total_clicks),
+            "scroll_offsets": {str(click): int(offset) for click, offset in scroll_offsets.items()},
+            "fields": {name: [int(value) for value in coors] for name, coors in fields.items()},
+            "anchors": list(anchors),
+        }
+        with self._lock:
+            if self._layouts.get(key) != layout:
+                self._layouts[key] = layout
+                self.dirty = True
+
+    def forget(self, key):
+        """
+        Drop a cached layout, e.g. after its anchors failed to validate.
+        """
+        with self._lock:
+            if self._layouts.pop(key, None) is not None:
+                self.dirty = True
+
+    def __len__(self):
+        return len(self._layouts)
+
+    def load(self, file_path):
+        """
+        Merge layouts saved by a previous session.
+
+        Args:
+            file_path (str): Path to the JSON file.
+
+        Returns:
+            int: Number of layouts held after loading.
+        """
+        if not os.path.exists(file_path):
+            return len(self._layouts)
+        with open(file_path, 'r') as f:
+            saved_layouts = json.load(f)
+        with self._lock:
+            for key, layout in saved_layouts.items():
+                self._layouts.setdefault(key, layout)
+        return len(self._layouts)
+
+    def save(self, file_path):
+        """
+        Write the layouts to disk if they changed since the last save.
+
+        Args:
+            file_path (str): Path to the JSON file.
+        """
+        with self._lock:
+            if not self.dirty:
+                return
+            snapshot = dict(self._layouts)
+            self.dirty = False
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, indent=1)
+        os.replace(tmp_path, file_path)
@@ -0,0 +1,132 @@
+from template_alignment.change_detector import FrameChangeDetector
+
+
+class PageEndFinder:
+    """
+    Finds how many scroll clicks it takes to reach the end of a page.
+
+    Instead of scrolling a fixed step at a time, the finder gallops: it probes at
+    exponentially growing scroll positions until the end is seen, then bisects back
+    between the last two probes. The end is seen when the footer template is
+    visible, or when the frame stopped changing between two probes (the page can
+    not scroll further). Finding the end takes O(log page length) captures.
+
+    Scroll positions past the end of the page collapse onto the last one, so after
+    a probe that reached the end the finder scrolls back to the top before probing
+    a smaller position.
+    """
+
+    def __init__(self, aligner, control, initial_step=10, resolution=10, max_clicks=1280, change_detector=None):
+        """
+        Initialize the PageEndFinder instance.
+
+        Args:
+            aligner (TemplateAligner): Aligner used for capture and matching.
+            control (Control): Input controller used to scroll.
+            initial_step (int, optional): Scroll clicks of the first probe; each probe doubles it.
+            resolution (int, optional): Granularity in scroll clicks of the returned position.
+            max_clicks (int, optional): Upper bound on the page length in scroll clicks.
+            change_detector (FrameChangeDetector, optional): Detector used to compare frames.
+        """
+        self.aligner = aligner
+        self.control = control
+        self.initial_step = initial_step
+        self.resolution = resolution
+        self.max_clicks = max_clicks
+        self.change_detector = change_detector if change_detector is not None else FrameChangeDetector()
+        self.captures = 0  # Frames captured by the last find_end() call
+        self._position = 0
+        self._clamped = False  # The real position may be above self._position
+
+    def same_frame(self, frame_a, frame_b):
+        """
+        Check whether two frames show the same screen, ignoring small noise.
+        """
+        if frame_a.shape != frame_b.shape:
+            return False
+        self.change_detector.reset()
+        self.change_detector.update(frame_a)
+        return not self.change_detector.update(frame_b).any()
+
+    def _scroll_to(self, scroll_click):
+        """
+        Scroll to a position counted in clicks from the top of the page.
+        """
+        if self._clamped and scroll_click < self._position:
+            # The page may have stopped before self._position, so restart from the top
+            self.control.mouse_scroll(self._position + self.initial_step)
+            self._position, self._clamped = 0, False
+        if scroll_click != self._position:
+            self.control.mouse_scroll(self._position - scroll_click)
+            self._position = scroll_click
+
+    def _probe(self, scroll_click, footer_visible, bottom_frame):
+        """
+        Capture the frame at a scroll position and test whether the end of the page is reached.
+
+        Returns:
+            tuple: (frame, reached_end)
+        """
+        self._scroll_to(scroll_click)
+        frame = self.aligner.get_screenshot()
+        self.captures += 1
+        reached_end = (
+            (footer_visible is not None and footer_visible(frame, scroll_click))
+            or (bottom_frame is not None and self.same_frame(frame, bottom_frame))
+        )
+        if reached_end:
+            self._clamped = True
+        return frame, reached_end
+
+    def find_end(self, footer_visible=None):
+        """
+        Find the smallest scroll position, on the resolution grid, that reaches the end of the page.
+
+        The page is scrolled to the top first and left at the top at the end.
+
+        Args:
+            footer_visible (callable, optional): footer_visible(frame, scroll_click) -> bool, True when
+                                                 the footer template is visible in the frame. Without it,
+                                                 only the frame-stopped-changing condition is used.
+
+        Returns:
+            int: Scroll clicks from the top of the page to its end.
+        """
+        self.control.mouse_scroll(self.max_clicks)  # Back to top
+        self._position, self._clamped = 0, False
+        self.captures = 0
+
+        # Gallop: probe at 0, step, 3 * step, 7 * step, ... until the end is seen
+        positions = [0]
+        frame, reached_end = self._probe(0, footer_visible, None)
+        low, high, bottom_frame = None, 0, None
+        step = self.initial_step
+        while not reached_end:
+            if positions[-1] >= self.max_clicks:
+                raise RuntimeError(f"End of page not found within {self.max_clicks} scroll clicks")
+            previous_frame = frame
+            high = min(positions[-1] + step, self.max_clicks)
+            frame, reached_end = self._probe(high, footer_visible, None)
+            if reached_end:
+                low = positions[-1]
+            elif self.same_frame(frame, previous_frame):
+                # Scrolling did not move the page, so the previous probe was already at the end
+                high, bottom_frame, reached_end = positions[-1], frame, True
+                low = positions[-2] if len(positions) > 1 else None
+                self._clamped = True
+            positions.append(high)
+            step *= 2
+
+        # Bisect on the resolution grid between the last probe before the end and the first one at it
+        if low is not None:
+            while high - low > self.resolution:
+                middle = low + (high - low) // (2 * self.resolution) * self.resolution
+                _, reached_end = self._probe(middle, footer_visible, bottom_frame)
+                if reached_end:
+                    high = middle
+                else:
+                    low = middle
+
+        self.control.mouse_scroll(self._position + self.initial_step)  # Back to top
+        self._position, self._clamped = 0, False
+        return high
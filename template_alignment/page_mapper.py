@@ -0,0 +1,185 @@
+import os
+
+import cv2
+import numpy as np
+
+
+class PageMap:
+    """
+    A full page stitched from the frames captured during one scroll pass.
+
+    Attributes:
+        image (numpy.ndarray): Tall grayscale image of the whole page.
+        frame_shape (tuple): Shape of a single captured frame.
+        offsets (list): (scroll_click, page_offset) pairs; page_offset is the page row shown at the top of the frame.
+    """
+
+    def __init__(self, image, frame_shape, offsets):
+        self.image = image
+        self.frame_shape = frame_shape
+        self.offsets = offsets
+
+    @property
+    def total_scroll_clicks(self):
+        """
+        Number of scroll clicks from the top of the page to the last captured position.
+        """
+        return self.offsets[-1][0]
+
+    def scroll_position_for(self, page_y, height):
+        """
+        Pick the first scroll position whose frame fully shows a region of the page.
+
+        Args:
+            page_y (int): Top row of the region on the page.
+            height (int): Height of the region.
+
+        Returns:
+            tuple: (scroll_click, page_offset)
+        """
+        frame_h = self.frame_shape[0]
+        for scroll_click, page_offset in self.offsets:
+            if page_offset <= page_y and page_y + height <= page_offset + frame_h:
+                return scroll_click, page_offset
+        # Regions straddling two frames are shown by the frame where most of them is visible
+        return min(self.offsets, key=lambda entry: abs(entry[1] + frame_h // 2 - (page_y + height // 2)))
+
+
+class PageMapper:
+    """
+    Builds a PageMap by scrolling once from the top to the bottom of a page.
+
+    The displacement between consecutive frames is measured from their overlap, so
+    the scroll amount per click does not need to be known. The pass ends when a
+    scroll no longer moves the page.
+    """
+
+    def __init__(self, aligner, control, scroll_step=5, max_scrolls=60, strip_height=64, min_overlap_score=0.9):
+        """
+        Initialize the PageMapper instance.
+
+        Args:
+            aligner (TemplateAligner): Aligner used for capture and matching.
+            control (Control): Input controller used to scroll.
+            scroll_step (int, optional): Scroll clicks between two captures.
+            max_scrolls (int, optional): Upper bound on the number of scroll steps.
+            strip_height (int, optional): Height in frame pixels of the strip used to measure the overlap.
+            min_overlap_score (float, optional): Minimum correlation for an overlap measurement to be trusted.
+        """
+        self.aligner = aligner
+        self.control = control
+        self.scroll_step = scroll_step
+        self.max_scrolls = max_scrolls
+        self.strip_height = strip_height
+        self.min_overlap_score = min_overlap_score
+        self.captures = 0  # Frames captured by the last capture_page() call
+
+    def estimate_displacement(self, previous_frame, current_frame):
+        """
+        Measure how many pixel rows the page moved up between two frames.
+
+        A horizontal strip of the previous frame is located in the current one; the
+        most textured of a few candidate strips is used so blank areas do not mislead it.
+
+        Args:
+            previous_frame (numpy.ndarray): Grayscale frame before the scroll.
+            current_frame (numpy.ndarray): Grayscale frame after the scroll.
+
+        Returns:
+            int or None: Rows moved, 0 if the page did not move, None if the overlap could not be found.
+        """
+        frame_h = previous_frame.shape[0]
+        candidate_tops = [frame_h // 2, frame_h // 3, (2 * frame_h) // 3 - self.strip_height]
+        strip_top = max(
+            (top for top in candidate_tops if 0 <= top <= frame_h - self.strip_height),
+            key=lambda top: float(previous_frame[top:top + self.strip_height].std())
+        )
+        strip = previous_frame[strip_top:strip_top + self.strip_height]
+        if float(strip.std()) < 1.0:
+            # Nothing to lock onto, identical frames mean the page did not move
+            return 0 if np.array_equal(previous_frame, current_frame) else None
+
+        # The page only moves up when scrolling down, so search the strip at or above its old row
+        search = current_frame[:strip_top + self.strip_height]
+        result = cv2.matchTemplate(search, strip, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_val < self.min_overlap_score:
+            return None
+        return strip_top - max_loc[1]
+
+    def capture_page(self):
+        """
+        Scroll through the page once and stitch the frames together.
+
+        The page is scrolled to the top first and scrolled back to the top at the end.
+
+        Returns:
+            PageMap: The stitched page with its scroll-offset table.
+        """
+        self.control.mouse_scroll(100)  # Back to top
+        frame = self.aligner.get_screenshot()
+        self.captures = 1
+        frames = [(0, 0, frame)]  # (scroll_click, page_offset, frame)
+
+        scroll_click, page_offset = 0, 0
+        for _ in range(self.max_scrolls):
+            self.control.mouse_scroll(-self.scroll_step)
+            next_frame = self.aligner.get_screenshot()
+            self.captures += 1
+
+            displacement = self.estimate_displacement(frame, next_frame)
+            if displacement == 0:
+                break  # The page did not move, so we are at the bottom
+            if displacement is None:
+                raise RuntimeError(f"Could not measure scroll displacement after {scroll_click + self.scroll_step} clicks")
+
+            scroll_click += self.scroll_step
+            page_offset += displacement
+            frames.append((scroll_click, page_offset, next_frame))
+            frame = next_frame
+
+        # Back to top
+        self.control.mouse_scroll(scroll_click + self.scroll_step)
+
+        frame_h, frame_w = frame.shape[:2]
+        page_image = np.zeros((page_offset + frame_h, frame_w), dtype=np.uint8)
+        for _, offset, captured in frames:
+            page_image[offset:offset + frame_h] = captured
+        return PageMap(page_image, frame.shape, [(click, offset) for click, offset, _ in frames])
+
+    def locate_fields(self, page_map, template_paths, threshold_val=None):
+        """
+        Match every template once against the stitched page.
+
+        Args:
+            page_map (PageMap): Page built by capture_page().
+            template_paths (list of str): Paths to the field templates.
+            threshold_val (float, optional): Minimum score. Defaults to DEFAULT_TEMPLATE_MATCHING_THRESHOLD.
+
+        Returns:
+            dict: Template name -> (scroll_click, screen_x, screen_y), like EMRAssistant.page_elements_coors.
+        """
+        if threshold_val is None:
+            threshold_val = self.aligner.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
+        frame_h, frame_w = page_map.frame_shape[:2]
+        scale_x = frame_w / self.aligner.screen_width
+        scale_y = frame_h / self.aligner.screen_height
+
+        def match_one(template_image_path):
+            template_img = self.aligner.load_template(template_image_path)
+            return template_img.shape, self.aligner.template_match(page_map.image, template_img)
+
+        page_elements_coors = {}
+        results = self.aligner.parallel_matcher.map(match_one, template_paths)
+        for template_image_path, (template_shape, (max_val, max_loc)) in zip(template_paths, results):
+            if max_val < threshold_val:
+                continue
+            h, w = template_shape[:2]
+            scroll_click, page_offset = page_map.scroll_position_for(max_loc[1], h)
+            template_name = os.path.splitext(os.path.basename(template_image_path))[0]
+            page_elements_coors[template_name] = (
+                scroll_click,
+                int((max_loc[0] + w // 2) / scale_x),
+                int((max_loc[1] - page_offset + h // 2) / scale_y),
+            )
+        return page_elements_coors
@@ -0,0 +1,111 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ParallelMatcher:
+    """
+    Spread independent template matches over a thread pool.
+
+    cv2.matchTemplate releases the GIL, so matching the templates of one frame on
+    several threads uses several cores. Results keep the order of the inputs.
+    """
+
+    def __init__(self, max_workers=None):
+        """
+        Initialize the ParallelMatcher instance.
+
+        Args:
+            max_workers (int, optional): Size of the thread pool. Defaults to the CPU count, 1 disables threading.
+        """
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        """
+        Create the thread pool on first use.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="template_match")
+            return self._executor
+
+    def map(self, match_fn, items):
+        """
+        Apply a match function to every item.
+
+        Args:
+            match_fn (callable): Function run on each item; must be thread-safe.
+            items (list): Inputs, e.g. template paths.
+
+        Returns:
+            list: Results in the same order as items.
+        """
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [match_fn(item) for item in items]
+        return list(self._get_executor().map(match_fn, items))
+
+    def shutdown(self):
+        """
+        Stop the worker threads.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+def benchmark_parallel_matching(template_paths, target_paths, max_workers=None, repeats=3):
+    """
+    Compare align_many() throughput for 1 to N worker threads on recorded screenshots.
+
+    Args:
+        template_paths (list of str): Template images to match.
+        target_paths (list of str): Recorded screenshots to match against.
+        max_workers (int, optional): Largest pool size tried. Defaults to the CPU count.
+        repeats (int, optional): Number of passes over the screenshots per pool size.
+
+    Returns:
+        dict: Worker count -> matches per second.
+    """
+    import cv2
+    from template_alignment.template_alignment import TemplateAligner
+    from template_alignment.template_cache import TemplateCache
+
+    max_workers = max_workers or (os.cpu_count() or 1)
+    frames = [cv2.imread(target_path, cv2.IMREAD_GRAYSCALE) for target_path in target_paths]
+    template_cache = TemplateCache()
+    template_cache.preload(template_paths)
+
+    throughput = {}
+    serial_results = None
+    for workers in range(1, max_workers + 1):
+        aligner = TemplateAligner(screen_width=1, screen_height=1, template_cache=template_cache, match_workers=workers)
+        results = []
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            results = [aligner.align_many(template_paths, frame=frame) for frame in frames]
+        elapsed_time = time.perf_counter() - start_time
+        aligner.parallel_matcher.shutdown()
+
+        # Threading must not change what is found
+        if serial_results is None:
+            serial_results = results
+        elif results != serial_results:
+            raise RuntimeError(f"Parallel results with {workers} workers differ from the serial path")
+
+        throughput[workers] = repeats * len(frames) * len(template_paths) / elapsed_time
+        print(f"{workers} worker(s): {throughput[workers]:.1f} matches/sec "
+              f"({throughput[workers] / throughput[1]:.2f}x serial)")
+    return throughput
+
+
+if __name__ == "__main__":
+    import glob
+
+    target_paths = ['./template_alignment/target_1.png']
+    template_paths = sorted(glob.glob(os.path.join('./template_alignment/test_images', '*.png')))
+    benchmark_parallel_matching(template_paths, target_paths)
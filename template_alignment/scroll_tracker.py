@@ -0,0 +1,168 @@
+import cv2
+import numpy as np
+
+
+class ScrollTracker:
+    """
+    Tracks the absolute scroll offset of a page from the screen content itself.
+
+    The vertical displacement between two frames is measured with FFT phase
+    correlation on downsampled grayscale frames, so the offset stays correct even
+    when a scroll click does not move the page by the usual amount. Frames seen
+    during page discovery can be kept as references, so a frame can also be placed
+    on the page after a jump too large to overlap with the previous frame.
+    """
+
+    def __init__(self, downsample=2, min_response=0.2, max_overlap_loss=0.8):
+        """
+        Initialize the ScrollTracker instance.
+
+        Args:
+            downsample (int, optional): Downscaling factor applied before the phase correlation.
+            min_response (float, optional): Minimum phase correlation peak for a measurement to be trusted.
+            max_overlap_loss (float, optional): Largest expected displacement, as a fraction of the
+                                                frame height, that still leaves enough overlap to measure.
+        """
+        self.downsample = downsample
+        self.min_response = min_response
+        self.max_overlap_loss = max_overlap_loss
+        self.page_offset = 0  # Page row shown at the top of the screen, in frame pixels
+        self.frame_height = None
+        self.last_response = None
+        self.measurements = 0
+        self.failed_measurements = 0
+        self._last_small = None  # Downsampled previous frame
+        self._references = {}  # Page offset -> downsampled frame
+        self._window = None
+
+    @property
+    def has_frame(self):
+        """
+        Whether a frame was tracked since the last reset.
+        """
+        return self._last_small is not None
+
+    def reset(self, page_offset=0, keep_references=False):
+        """
+        Forget the previous frame and restart from a known page offset.
+
+        Args:
+            page_offset (int, optional): Page offset of the next tracked frame.
+            keep_references (bool, optional): Keep the reference frames of the current page.
+        """
+        self.page_offset = page_offset
+        self.last_response = None
+        self._last_small = None
+        if not keep_references:
+            self._references = {}
+
+    def _prepare(self, frame):
+        """
+        Downsample a grayscale frame into a float32 array for the phase correlation.
+        """
+        frame_h, frame_w = frame.shape[:2]
+        small = cv2.resize(
+            frame,
+            (max(frame_w // self.downsample, 1), max(frame_h // self.downsample, 1)),
+            interpolation=cv2.INTER_AREA
+        )
+        return small.astype(np.float32)
+
+    def _measure_prepared(self, before_small, after_small, expected_displacement):
+        """
+        Phase-correlate two downsampled frames around an expected displacement. See measure().
+        """
+        if before_small.shape != after_small.shape:
+            return None
+        small_h = before_small.shape[0]
+        shift = int(round(expected_displacement / self.downsample))
+        if abs(shift) >= small_h * self.max_overlap_loss:
+            return None
+
+        # Align the expected overlap of both frames, then measure the residual shift
+        if shift >= 0:
+            before_part, after_part = before_small[shift:], after_small[:small_h - shift]
+        else:
+            before_part, after_part = before_small[:small_h + shift], after_small[-shift:]
+        if self._window is None or self._window.shape != before_part.shape:
+            self._window = cv2.createHanningWindow(before_part.shape[::-1], cv2.CV_32F)
+
+        (_, shift_y), response = cv2.phaseCorrelate(
+            np.ascontiguousarray(before_part), np.ascontiguousarray(after_part), self._window
+        )
+        self.last_response = response
+        if response < self.min_response:
+            return None
+        # Content that moved further up shows as a negative shift of the second frame
+        return int(round((shift - shift_y) * self.downsample))
+
+    def measure(self, before, after, expected_displacement=0):
+        """
+        Measure how far the page moved up between two frames.
+
+        Only the rows expected to overlap are compared, so large scrolls with a
+        known approximate size can still be measured precisely.
+
+        Args:
+            before (numpy.ndarray): Grayscale frame before the scroll.
+            after (numpy.ndarray): Grayscale frame after the scroll.
+            expected_displacement (int, optional): Rows the page is expected to have moved up.
+
+        Returns:
+            int or None: Rows the page moved up, or None if the displacement could not be measured.
+        """
+        return self._measure_prepared(self._prepare(before), self._prepare(after), expected_displacement)
+
+    def add_reference(self, page_offset, frame):
+        """
+        Keep a frame whose page offset is known, e.g. one captured during page discovery.
+
+        Args:
+            page_offset (int): Page row shown at the top of the frame.
+            frame (numpy.ndarray): Grayscale frame.
+        """
+        self._references[int(page_offset)] = self._prepare(frame)
+
+    def track(self, frame, expected_offset=None, keep_reference=False):
+        """
+        Update the absolute page offset with a newly captured frame.
+
+        With an expected offset and reference frames, the frame is measured against the
+        reference closest to where it should be; otherwise against the previous frame.
+
+        Args:
+            frame (numpy.ndarray): Grayscale frame captured after the latest scroll.
+            expected_offset (int, optional): Page offset the scroll was supposed to reach, if known.
+            keep_reference (bool, optional): Keep the frame as a reference once its offset was measured,
+                                             e.g. when the references of discovery are not available.
+
+        Returns:
+            int: The page offset after this frame.
+        """
+        current_small = self._prepare(frame)  # A new array, so ring buffer views can be passed in
+        self.frame_height = frame.shape[0]
+
+        if expected_offset is not None and self._references:
+            base_offset = min(self._references, key=lambda offset: abs(offset - expected_offset))
+            base_small = self._references[base_offset]
+        elif self._last_small is not None:
+            base_offset, base_small = self.page_offset, self._last_small
+        else:
+            # First frame, nothing to compare with
+            if expected_offset is not None:
+                self.page_offset = expected_offset
+            self._last_small = current_small
+            return self.page_offset
+
+        expected_displacement = 0 if expected_offset is None else expected_offset - base_offset
+        displacement = self._measure_prepared(base_small, current_small, expected_displacement)
+        self.measurements += 1
+        if displacement is None:
+            # Could not measure, fall back to the click-count estimate
+            self.failed_measurements += 1
+            displacement = expected_displacement
+        elif keep_reference:
+            self._references[base_offset + displacement] = current_small
+        self.page_offset = base_offset + displacement
+        self._last_small = current_small
+        return self.page_offset
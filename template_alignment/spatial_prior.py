@@ -0,0 +1,111 @@
+import os
+import json
+import threading
+
+
+class SpatialPriorStore:
+    """
+    Remembers where each template was last found.
+
+    Locations are stored per page, scroll offset and frame size, so a template
+    matched at the same scroll position of the same page can be searched in a
+    small region around its previous position before falling back to the full frame.
+    """
+
+    def __init__(self):
+        """
+        Initialize the SpatialPriorStore instance.
+        """
+        self._priors = {}  # "page|scroll|WxH|template" -> [x, y]
+        self._lock = threading.Lock()
+        self.dirty = False
+
+    @staticmethod
+    def _make_key(prior_key, frame_shape, template_name):
+        """
+        Build the lookup key for a template in a given search context.
+
+        Args:
+            prior_key (tuple): (page, scroll_offset) search context.
+            frame_shape (tuple): Shape of the searched frame.
+            template_name (str): Template name.
+
+        Returns:
+            str: The key used in the store.
+        """
+        page, scroll_offset = prior_key
+        frame_h, frame_w = frame_shape[:2]
+        return f"{page}|{scroll_offset}|{frame_w}x{frame_h}|{template_name}"
+
+    def get(self, prior_key, frame_shape, template_name):
+        """
+        Look up the last top-left location of a template.
+
+        Returns:
+            tuple or None: (x, y) in frame pixels, or None if the template was never found here.
+        """
+        with self._lock:
+            location = self._priors.get(self._make_key(prior_key, frame_shape, template_name))
+        return tuple(location) if location is not None else None
+
+    def update(self, prior_key, frame_shape, template_name, location):
+        """
+        Record the top-left location where a template was found.
+        """
+        key = self._make_key(prior_key, frame_shape, template_name)
+        location = [int(location[0]), int(location[1])]
+        with self._lock:
+            if self._priors.get(key) != location:
+                self._priors[key] = location
+                self.dirty = True
+
+    def forget(self, prior_key, frame_shape, template_name):
+        """
+        Drop the recorded location of a template, e.g. after the layout changed.
+        """
+        with self._lock:
+            if self._priors.pop(self._make_key(prior_key, frame_shape, template_name), None) is not None:
+                self.dirty = True
+
+    def __len__(self):
+        return len(self._priors)
+
+    def load(self, file_path):
+        """
+        Merge priors saved by a previous session.
+
+        Args:
+            file_path (str): Path to the JSON file.
+
+        Returns:
+            int: Number of priors held after loading.
+        """
+        if not os.path.exists(file_path):
+            return len(self._priors)
+        with open(file_path, 'r') as f:
+            saved_priors = json.load(f)
+        with self._lock:
+            for key, location in saved_priors.items():
+                self._priors.setdefault(key, location)
+        return len(self._priors)
+
+    def save(self, file_path):
+        """
+        Write the priors to disk if they changed since the last save.
+
+        Args:
+            file_path (str): Path to the JSON file.
+        """
+        with self._lock:
+            if not self.dirty:
+                return
+            snapshot = dict(self._priors)
+            self.dirty = False
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, file_path)
+
+
+# Priors shared by every TemplateAligner, so they outlive a single EMRAssistant
+shared_spatial_priors = SpatialPriorStore()
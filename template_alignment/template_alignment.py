@@ -1,9 +1,13 @@
+import os
 import cv2
-import pyautogui
 import numpy as np
 from PIL import Image
 import time
 from functools import wraps
+from template_alignment.template_cache import shared_template_cache
+from template_alignment.spatial_prior import shared_spatial_priors
+from template_alignment.parallel_match import ParallelMatcher
+from computer.screen_capture import get_shared_capture_backend
 
 
 
@@ -50,8 +54,16 @@ def measure_average_time(method):
 class TemplateAligner:
     # Default threshold for template matching; can be adjusted as needed
     DEFAULT_TEMPLATE_MATCHING_THRESHOLD = 0.85
-
-    def __init__(self, debug=False, screen_width=None, screen_height=None):
+    # Supported matching modes
+    MATCH_MODE_EXHAUSTIVE = "exhaustive"
+    MATCH_MODE_PYRAMID = "pyramid"
+    # Smallest template side (in pixels) still matched at a coarse pyramid level
+    MIN_PYRAMID_TEMPLATE_SIDE = 8
+
+    def __init__(self, debug=False, screen_width=None, screen_height=None, template_cache=None,
+                 match_mode=MATCH_MODE_EXHAUSTIVE, pyramid_levels=2, refine_margin=6, pyramid_candidates=3,
+                 spatial_priors=None, prior_padding=40, match_workers=1, template_pack=None, change_detector=None,
+                 capture_backend=None):
         """
         Initialize the TemplateAligner instance.
 
@@ -59,12 +71,53 @@ class TemplateAligner:
             debug (bool): Flag to enable debugging mode.
             screen_width (int, optional): Width of the screen. Defaults to actual screen width if not provided.
             screen_height (int, optional): Height of the screen. Defaults to actual screen height if not provided.
+            template_cache (TemplateCache, optional): Store for decoded templates. Defaults to the shared cache.
+            match_mode (str, optional): "exhaustive" for full-resolution matching, "pyramid" for coarse-to-fine.
+            pyramid_levels (int, optional): Number of 2x downscaling steps used by the pyramid mode.
+            refine_margin (int, optional): Extra full-resolution pixels searched around each coarse candidate.
+            pyramid_candidates (int, optional): Number of coarse candidates refined at full resolution.
+            spatial_priors (SpatialPriorStore, optional): Last known template locations. Defaults to the shared store.
+            prior_padding (int, optional): Pixels added around a known location when searching there first.
+            match_workers (int, optional): Threads used by align_many() to match templates in parallel.
+            template_pack (TemplatePack, optional): Compiled templates served before falling back to PNG files.
+            change_detector (FrameChangeDetector, optional): Enables reusing matches in regions that did not change.
+            capture_backend (CaptureBackend, optional): Screen capture backend. Defaults to the fastest one available.
         """
+        if match_mode not in (self.MATCH_MODE_EXHAUSTIVE, self.MATCH_MODE_PYRAMID):
+            raise ValueError(f"Invalid match mode: {match_mode}")
         self.debug = debug
+        self.template_cache = template_cache if template_cache is not None else shared_template_cache
+        self.match_mode = match_mode
+        self.pyramid_levels = pyramid_levels
+        self.refine_margin = refine_margin
+        self.pyramid_candidates = pyramid_candidates
+        self.spatial_priors = spatial_priors if spatial_priors is not None else shared_spatial_priors
+        self.prior_padding = prior_padding
+        self.prior_hits = 0  # Matches resolved inside the prior ROI
+        self.prior_misses = 0  # Prior ROI searches that fell back to the full frame
+        self.pyramid_fallbacks = 0  # Pyramid matches redone exhaustively because no candidate reached the threshold
+        self.parallel_matcher = ParallelMatcher(match_workers)
+        self.template_pack = template_pack
+        self.change_detector = change_detector
+        self._dirty_tiles = None  # Dirty tile grid of the frame being searched, relative to the previous frame
+        self._frame_signature = None  # Change detector signature of the frame being searched
+        self._dirty_since = {}  # id of an older signature -> dirty tiles from it to the frame being searched
+        self._frame_matches = {}  # template name -> (max_val, max_loc, template shape, frame shape, frame signature)
+        self.gated_reuses = 0  # Matches answered from the previous frame
+        self._capture_backend = capture_backend  # Created on first capture when not provided
         self.screen_width, self.screen_height = self._get_screen_dimensions(screen_width, screen_height)
         self.current_x = None  # Stores the current x-coordinate of the matched template
         self.current_y = None  # Stores the current y-coordinate of the matched template
 
+    @property
+    def capture_backend(self):
+        """
+        Screen capture backend, created on first use so offline matching needs no display.
+        """
+        if self._capture_backend is None:
+            self._capture_backend = get_shared_capture_backend()
+        return self._capture_backend
+
     def _show_image(self, np_image):
         """
         Display an image using OpenCV.
@@ -90,12 +143,57 @@ class TemplateAligner:
         """
         if screen_w is not None and screen_h is not None:
             return screen_w, screen_h
-        return pyautogui.size()  # Returns the actual screen size
+        return self.capture_backend.screen_size()  # Returns the actual screen size
+
+    def load_template(self, template_image_path):
+        """
+        Load a grayscale template image from the template pack, or through the template cache.
+
+        Args:
+            template_image_path (str): Path to the template image.
+
+        Returns:
+            numpy.ndarray: The read-only grayscale template image.
+        """
+        if self.template_pack is not None:
+            template_img = self.template_pack.get(template_image_path)
+            if template_img is not None:
+                return template_img
+        return self.template_cache.get(template_image_path)
+
+    def load_template_pyramid(self, template_image_path):
+        """
+        Load the precomputed pyramid of a template from the template pack.
+
+        Args:
+            template_image_path (str): Path to the template image.
+
+        Returns:
+            list or None: Template pyramid levels, or None if the template is not packed.
+        """
+        if self.template_pack is None:
+            return None
+        return self.template_pack.get_pyramid(template_image_path)
 
     def template_match(self, screenshot_img, template_img):
         """
         Perform template matching to find the template in the screenshot.
 
+        Args:
+            screenshot_img (numpy.ndarray): The screenshot image in which to search.
+            template_img (numpy.ndarray): The template image to search for.
+
+        Returns:
+            tuple: A tuple containing the maximum correlation value and location.
+        """
+        if self.match_mode == self.MATCH_MODE_PYRAMID:
+            return self.pyramid_template_match(screenshot_img, template_img)
+        return self.exhaustive_template_match(screenshot_img, template_img)
+
+    def exhaustive_template_match(self, screenshot_img, template_img):
+        """
+        Match the template at every position of the full-resolution screenshot.
+
         Args:
             screenshot_img (numpy.ndarray): The screenshot image in which to search.
             template_img (numpy.ndarray): The template image to search for.
@@ -107,17 +205,247 @@ class TemplateAligner:
         _, max_val, _, max_loc = cv2.minMaxLoc(result)
         return max_val, max_loc
 
-    def get_screenshot(self):
+    def _pyramid_depth(self, template_img):
+        """
+        Number of pyramid levels usable for a template without shrinking it below the minimum side.
+        """
+        levels = 0
+        min_side = min(template_img.shape[:2])
+        while levels < self.pyramid_levels and (min_side >> (levels + 1)) >= self.MIN_PYRAMID_TEMPLATE_SIDE:
+            levels += 1
+        return levels
+
+    def build_pyramid(self, image, levels):
+        """
+        Build a list of successively 2x downscaled images.
+
+        Args:
+            image (numpy.ndarray): The full-resolution image.
+            levels (int): Number of downscaling steps.
+
+        Returns:
+            list: Images from full resolution (index 0) to the coarsest level (index levels).
+        """
+        pyramid = [image]
+        for _ in range(levels):
+            pyramid.append(cv2.pyrDown(pyramid[-1]))
+        return pyramid
+
+    def pyramid_template_match(self, screenshot_img, template_img, screenshot_pyramid=None, template_pyramid=None):
+        """
+        Coarse-to-fine template matching.
+
+        The template is matched on a downscaled screenshot first, then the best coarse
+        candidates are refined with a full-resolution match inside a small ROI. Small,
+        text-heavy templates can blur away at the coarse level, so the full screenshot is
+        matched exhaustively when no refined candidate reaches the matching threshold.
+
+        Args:
+            screenshot_img (numpy.ndarray): The screenshot image in which to search.
+            template_img (numpy.ndarray): The template image to search for.
+            screenshot_pyramid (list, optional): Precomputed pyramid of the screenshot, see build_pyramid().
+            template_pyramid (list, optional): Precomputed pyramid of the template, e.g. from a template pack.
+
+        Returns:
+            tuple: A tuple containing the maximum correlation value and location.
+        """
+        levels = self._pyramid_depth(template_img)
+        if levels == 0:
+            return self.exhaustive_template_match(screenshot_img, template_img)
+
+        if screenshot_pyramid is None or len(screenshot_pyramid) <= levels:
+            screenshot_pyramid = self.build_pyramid(screenshot_img, levels)
+        coarse_screenshot = screenshot_pyramid[levels]
+        if template_pyramid is None or len(template_pyramid) <= levels:
+            template_pyramid = self.build_pyramid(template_img, levels)
+        coarse_template = template_pyramid[levels]
+
+        coarse_result = cv2.matchTemplate(coarse_screenshot, coarse_template, cv2.TM_CCOEFF_NORMED)
+
+        scale = 1 << levels
+        h, w = template_img.shape[:2]
+        img_h, img_w = screenshot_img.shape[:2]
+        margin = self.refine_margin + scale
+        coarse_h, coarse_w = coarse_template.shape[:2]
+
+        best_val, best_loc = -1.0, (0, 0)
+        for _ in range(self.pyramid_candidates):
+            _, coarse_val, _, coarse_loc = cv2.minMaxLoc(coarse_result)
+            if coarse_val <= -1.0:
+                break
+
+            # Refine inside a full-resolution ROI around the coarse candidate
+            x0 = max(coarse_loc[0] * scale - margin, 0)
+            y0 = max(coarse_loc[1] * scale - margin, 0)
+            x1 = min(coarse_loc[0] * scale + w + margin, img_w)
+            y1 = min(coarse_loc[1] * scale + h + margin, img_h)
+            roi_val, roi_loc = self.exhaustive_template_match(screenshot_img[y0:y1, x0:x1], template_img)
+            if roi_val > best_val:
+                best_val, best_loc = roi_val, (x0 + roi_loc[0], y0 + roi_loc[1])
+
+            # Suppress this candidate's neighbourhood before picking the next one
+            cx, cy = coarse_loc
+            coarse_result[max(cy - coarse_h // 2, 0):cy + coarse_h // 2 + 1,
+                          max(cx - coarse_w // 2, 0):cx + coarse_w // 2 + 1] = -1.0
+
+        if best_val < self.DEFAULT_TEMPLATE_MATCHING_THRESHOLD:
+            self.pyramid_fallbacks += 1
+            return self.exhaustive_template_match(screenshot_img, template_img)
+        return best_val, best_loc
+
+    def match_with_prior(self, target_img, template_img, template_name, prior_key=None, threshold_val=None,
+                         target_pyramid=None, template_pyramid=None):
+        """
+        Match a template, searching around its last known location first.
+
+        When a prior exists for the template in this context, only a padded ROI around it
+        is searched. The full frame is searched when there is no prior or the ROI score is
+        below the threshold. Successful full-frame matches update the prior.
+
+        Args:
+            target_img (numpy.ndarray): The frame in which to search.
+            template_img (numpy.ndarray): The template image to search for.
+            template_name (str): Template name used as the prior key.
+            prior_key (tuple, optional): (page, scroll_offset) search context. Priors are skipped if None.
+            threshold_val (float, optional): Score a ROI match must reach. Defaults to DEFAULT_TEMPLATE_MATCHING_THRESHOLD.
+            target_pyramid (list, optional): Precomputed pyramid of the frame for the pyramid mode.
+            template_pyramid (list, optional): Precomputed pyramid of the template for the pyramid mode.
+
+        Returns:
+            tuple: A tuple containing the maximum correlation value and location.
+        """
+        if threshold_val is None:
+            threshold_val = self.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
+
+        # Reuse the previous result when the screen did not change where it matters
+        if self.change_detector is not None and self._dirty_tiles is not None:
+            reused = self._reuse_unchanged_match(target_img, template_img, template_name, threshold_val)
+            if reused is not None:
+                self.gated_reuses += 1
+                return reused
+
+        max_val, max_loc = self._match_prior_then_full(
+            target_img, template_img, template_name, prior_key, threshold_val, target_pyramid, template_pyramid
+        )
+        if self.change_detector is not None:
+            self._frame_matches[template_name] = (
+                max_val, max_loc, template_img.shape, target_img.shape, self._frame_signature
+            )
+        return max_val, max_loc
+
+    def _match_prior_then_full(self, target_img, template_img, template_name, prior_key, threshold_val,
+                               target_pyramid, template_pyramid):
+        """
+        Search the prior ROI first, then the full frame. See match_with_prior().
+        """
+        use_priors = prior_key is not None and self.spatial_priors is not None
+
+        if use_priors:
+            prior_loc = self.spatial_priors.get(prior_key, target_img.shape, template_name)
+            if prior_loc is not None:
+                h, w = template_img.shape[:2]
+                img_h, img_w = target_img.shape[:2]
+                x0 = max(prior_loc[0] - self.prior_padding, 0)
+                y0 = max(prior_loc[1] - self.prior_padding, 0)
+                x1 = min(prior_loc[0] + w + self.prior_padding, img_w)
+                y1 = min(prior_loc[1] + h + self.prior_padding, img_h)
+                if x1 - x0 >= w and y1 - y0 >= h:
+                    roi_val, roi_loc = self.exhaustive_template_match(target_img[y0:y1, x0:x1], template_img)
+                    if roi_val >= threshold_val:
+                        self.prior_hits += 1
+                        return roi_val, (x0 + roi_loc[0], y0 + roi_loc[1])
+                self.prior_misses += 1
+
+        if target_pyramid is not None:
+            max_val, max_loc = self.pyramid_template_match(target_img, template_img, target_pyramid, template_pyramid)
+        else:
+            max_val, max_loc = self.template_match(target_img, template_img)
+
+        if use_priors and max_val >= threshold_val:
+            self.spatial_priors.update(prior_key, target_img.shape, template_name, max_loc)
+        return max_val, max_loc
+
+    def gate_frame(self, target_img):
+        """
+        Feed a new frame to the change detector before matching on it.
+
+        Args:
+            target_img (numpy.ndarray): The grayscale frame about to be searched.
+
+        Returns:
+            numpy.ndarray or None: Dirty tile grid, or None when no change detector is configured.
+        """
+        if self.change_detector is None:
+            return None
+        self._dirty_tiles = self.change_detector.update(target_img)
+        self._frame_signature = self.change_detector.previous_signature
+        self._dirty_since = {}
+        return self._dirty_tiles
+
+    def _dirty_since_match(self, match_signature):
+        """
+        Dirty tiles between the frame a match was made on and the frame being searched.
+
+        Comparing with the previous frame only is not enough: a template skipped for a few
+        frames must see every change since it was last matched.
+        """
+        key = id(match_signature)
+        if key not in self._dirty_since:
+            self._dirty_since[key] = self.change_detector.compare(match_signature, self._frame_signature)
+        return self._dirty_since[key]
+
+    def _reuse_unchanged_match(self, target_img, template_img, template_name, threshold_val):
+        """
+        Return the previous match of a template if the frame did not change around it.
+
+        A found template is reused when its matched area is clean. A template that was not
+        found is only re-searched inside the changed area, since the rest of the frame
+        cannot produce a better score than before.
+
+        Returns:
+            tuple or None: (max_val, max_loc), or None if the template must be matched again.
+        """
+        previous = self._frame_matches.get(template_name)
+        if previous is None or previous[2] != template_img.shape or previous[3] != target_img.shape:
+            return None
+        prev_val, prev_loc = previous[0], previous[1]
+
+        dirty_tiles = self._dirty_since_match(previous[4])
+        dirty_bounds = self.change_detector.dirty_bounds(dirty_tiles)
+        if dirty_bounds is None:
+            return prev_val, prev_loc
+
+        h, w = template_img.shape[:2]
+        if self.change_detector.region_dirty(dirty_tiles, prev_loc[0], prev_loc[1], w, h):
+            return None
+        if prev_val >= threshold_val:
+            return prev_val, prev_loc
+
+        # Not found before and its best spot is untouched: only the changed area can do better
+        img_h, img_w = target_img.shape[:2]
+        x0, y0 = max(dirty_bounds[0] - w, 0), max(dirty_bounds[1] - h, 0)
+        x1, y1 = min(dirty_bounds[2] + w, img_w), min(dirty_bounds[3] + h, img_h)
+        if x1 - x0 < w or y1 - y0 < h:
+            return prev_val, prev_loc
+        roi_val, roi_loc = self.exhaustive_template_match(target_img[y0:y1, x0:x1], template_img)
+        if roi_val > prev_val:
+            prev_val, prev_loc = roi_val, (x0 + roi_loc[0], y0 + roi_loc[1])
+        self._frame_matches[template_name] = (
+            prev_val, prev_loc, template_img.shape, target_img.shape, self._frame_signature
+        )
+        return prev_val, prev_loc
+
+    def get_screenshot(self, region=None):
         """
         Capture a screenshot of the current screen.
 
+        Args:
+            region (tuple, optional): (left, top, width, height) in screenshot pixels. Full screen if None.
+
         Returns:
             numpy.ndarray: The grayscale screenshot image.
         """
-        screenshot = pyautogui.screenshot()
-        screenshot_np = np.array(screenshot)
-        screenshot_gray = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2GRAY)
-        return screenshot_gray
+        return self.capture_backend.grab(region=region, gray=True)
 
     def get_screen_coordinates(self, screenshot_image, coor_x, coor_y):
         """
@@ -142,7 +470,7 @@ class TemplateAligner:
         return scaled_center_x, scaled_center_y
 
     # @measure_average_time
-    def align(self, template_image_path, target_image_path=None, show_crop=False, show_overlay=False, custom_threshold=None):
+    def align(self, template_image_path, target_image_path=None, show_crop=False, show_overlay=False, custom_threshold=None, prior_key=None):
         """
         Align the template image with the target image or current screen.
 
@@ -151,6 +479,7 @@ class TemplateAligner:
             target_image_path (str, optional): Path to the target image. If None, a screenshot is used.
             show_crop (bool, optional): Whether to save the cropped matched area.
             show_overlay (bool, optional): Whether to save an overlay comparison image.
+            prior_key (tuple, optional): (page, scroll_offset) context used to search the last known location first.
 
         Returns:
             bool: True if alignment is successful, False otherwise.
@@ -161,17 +490,19 @@ class TemplateAligner:
         else:
             threshold_val = self.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
 
-        # Read the template image in grayscale
-        template_img = cv2.imread(template_image_path, cv2.IMREAD_GRAYSCALE)
+        # Read the template image in grayscale, decoded once and cached
+        template_img = self.load_template(template_image_path)
 
         # Use provided target image or take a screenshot
         if target_image_path:
             target_img = cv2.imread(target_image_path, cv2.IMREAD_GRAYSCALE)
         else:
             target_img = self.get_screenshot()  # Capture the current screen
+        self.gate_frame(target_img)
 
-        # Perform template matching
-        max_val, max_loc = self.template_match(target_img, template_img)
+        # Perform template matching, around the last known location first
+        template_name = os.path.splitext(os.path.basename(template_image_path))[0]
+        max_val, max_loc = self.match_with_prior(target_img, template_img, template_name, prior_key, threshold_val)
 
         # Check if the match is above the threshold
         if max_val < threshold_val:
@@ -213,8 +544,8 @@ class TemplateAligner:
         else:
             threshold_val = self.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
 
-        # Read the template image in grayscale
-        template_img = cv2.imread(template_image_path, cv2.IMREAD_GRAYSCALE)
+        # Read the template image in grayscale, decoded once and cached
+        template_img = self.load_template(template_image_path)
 
         # Use provided target image or take a screenshot
         if target_image_path:
@@ -232,9 +563,154 @@ class TemplateAligner:
             return None
         
         cropped_pil = self.cropped_match(template_img, target_img, max_loc)
-        
+
         return cropped_pil
 
+    def match_near(self, template_image_path, frame, screen_x, screen_y, padding=None):
+        """
+        Match a template only around a predicted location, e.g. to verify a prediction.
+
+        Args:
+            template_image_path (str): Path to the template image.
+            frame (numpy.ndarray): Grayscale frame to search in.
+            screen_x (int): Predicted x-coordinate of the template center, in screen coordinates.
+            screen_y (int): Predicted y-coordinate of the template center, in screen coordinates.
+            padding (int, optional): Frame pixels searched around the prediction. Defaults to prior_padding.
+
+        Returns:
+            tuple: (score, screen_x, screen_y) of the best match near the prediction; score is 0 if
+                   the search area falls outside the frame.
+        """
+        if padding is None:
+            padding = self.prior_padding
+        template_img = self.load_template(template_image_path)
+        h, w = template_img.shape[:2]
+        img_h, img_w = frame.shape[:2]
+        scale_x, scale_y = img_w / self.screen_width, img_h / self.screen_height
+
+        # Top-left corner of the template at the predicted center, in frame pixels
+        left, top = int(screen_x * scale_x) - w // 2, int(screen_y * scale_y) - h // 2
+        x0, y0 = max(left - padding, 0), max(top - padding, 0)
+        x1, y1 = min(left + w + padding, img_w), min(top + h + padding, img_h)
+        if x1 - x0 < w or y1 - y0 < h:
+            return 0.0, screen_x, screen_y
+
+        roi_val, roi_loc = self.exhaustive_template_match(frame[y0:y1, x0:x1], template_img)
+        found_x, found_y = self.get_screen_coordinates(
+            frame, x0 + roi_loc[0] + w // 2, y0 + roi_loc[1] + h // 2
+        )
+        return roi_val, found_x, found_y
+
+    def align_many(self, template_paths, frame=None, prior_key=None):
+        """
+        Match several templates against a single frame.
+
+        Args:
+            template_paths (list of str): Paths to the template images.
+            frame (numpy.ndarray, optional): Grayscale frame to search in. If None, one screenshot is taken.
+            prior_key (tuple, optional): (page, scroll_offset) context used to search last known locations first.
+
+        Returns:
+            dict: Template name (file name without extension) -> (score, screen_x, screen_y).
+                  Scores are returned for every template; callers compare them against their threshold.
+        """
+        # Capture and convert the screen once for the whole batch
+        if frame is None:
+            target_img = self.get_screenshot()
+        elif frame.ndim == 3:
+            target_img = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        else:
+            target_img = frame
+        self.gate_frame(target_img)
+
+        # Downscale the frame once when every template goes through the pyramid
+        target_pyramid = None
+        if self.match_mode == self.MATCH_MODE_PYRAMID:
+            target_pyramid = self.build_pyramid(target_img, self.pyramid_levels)
+
+        def match_one(template_image_path):
+            template_img = self.load_template(template_image_path)
+            template_name = os.path.splitext(os.path.basename(template_image_path))[0]
+            max_val, max_loc = self.match_with_prior(
+                target_img, template_img, template_name, prior_key, target_pyramid=target_pyramid,
+                template_pyramid=self.load_template_pyramid(template_image_path) if target_pyramid is not None else None
+            )
+
+            # Calculate the center coordinates of the matched area
+            w, h = template_img.shape[::-1]
+            screen_x, screen_y = self.get_screen_coordinates(
+                target_img, max_loc[0] + w // 2, max_loc[1] + h // 2
+            )
+            return template_name, (max_val, screen_x, screen_y)
+
+        # Templates are independent, so they can be matched on several threads; order is preserved
+        return dict(self.parallel_matcher.map(match_one, template_paths))
+
+    def find_all(self, template, threshold=None, max_results=None, frame=None, overlap=0.5):
+        """
+        Find every occurrence of a template in one matching pass.
+
+        Peaks above the threshold are extracted from the response map with NumPy,
+        overlapping peaks are suppressed keeping the strongest, and the survivors are
+        returned in reading order (top to bottom, then left to right).
+
+        Args:
+            template (str or numpy.ndarray): Path to the template image, or the grayscale template itself.
+            threshold (float, optional): Minimum score of a match. Defaults to DEFAULT_TEMPLATE_MATCHING_THRESHOLD.
+            max_results (int, optional): Keep at most this many of the strongest matches.
+            frame (numpy.ndarray, optional): Grayscale frame to search in. If None, a screenshot is used.
+            overlap (float, optional): Fraction of the template size two matches may overlap before one is suppressed.
+
+        Returns:
+            list: (score, screen_x, screen_y) tuples for the center of every match.
+        """
+        if threshold is None:
+            threshold = self.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
+        template_img = self.load_template(template) if isinstance(template, str) else template
+
+        if frame is None:
+            target_img = self.get_screenshot()
+        elif frame.ndim == 3:
+            target_img = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        else:
+            target_img = frame
+
+        result = cv2.matchTemplate(target_img, template_img, cv2.TM_CCOEFF_NORMED)
+        h, w = template_img.shape[:2]
+
+        # Keep local maxima above threshold; a plateau of equal scores yields several candidates for NMS
+        kernel = np.ones((max(h // 2, 1), max(w // 2, 1)), np.uint8)
+        local_max = cv2.dilate(result, kernel)
+        peak_ys, peak_xs = np.nonzero((result >= threshold) & (result >= local_max))
+        if peak_xs.size == 0:
+            return []
+        scores = result[peak_ys, peak_xs]
+
+        # Greedy non-maximum suppression, strongest peaks first
+        order = np.argsort(-scores, kind="stable")
+        peak_xs, peak_ys, scores = peak_xs[order], peak_ys[order], scores[order]
+        min_dx, min_dy = w * (1 - overlap), h * (1 - overlap)
+        keep = np.ones(scores.size, dtype=bool)
+        for i in range(scores.size):
+            if not keep[i]:
+                continue
+            close = (np.abs(peak_xs[i + 1:] - peak_xs[i]) < min_dx) & (np.abs(peak_ys[i + 1:] - peak_ys[i]) < min_dy)
+            keep[i + 1:] &= ~close
+        peak_xs, peak_ys, scores = peak_xs[keep], peak_ys[keep], scores[keep]
+
+        if max_results is not None:
+            peak_xs, peak_ys, scores = peak_xs[:max_results], peak_ys[:max_results], scores[:max_results]
+
+        # Sort by position so repeated widgets come back in reading order
+        position_order = np.lexsort((peak_xs, peak_ys))
+        matches = []
+        for i in position_order:
+            screen_x, screen_y = self.get_screen_coordinates(
+                target_img, int(peak_xs[i]) + w // 2, int(peak_ys[i]) + h // 2
+            )
+            matches.append((float(scores[i]), screen_x, screen_y))
+        return matches
+
 
     def cropped_match(self, template_img, target_img, max_loc, show=False):
         """
@@ -346,8 +822,139 @@ def test_align(template_path, target_path=None):
         cropped_img.show()
 
 
+def _synthetic_form(width=1920, height=1080, seed=0):
+    """
+    Render a form-like grayscale screenshot: rows of short text labels next to input boxes.
+    """
+    rng = np.random.default_rng(seed)
+    words = ["Name", "DOB", "Phone", "Email", "Address", "City", "State", "Zip", "Insurance", "Provider", "Notes"]
+    img = np.full((height, width), 245, dtype=np.uint8)
+    row = 0
+    for y in range(40, height - 30, 36):
+        for x in range(30, width - 380, 380):
+            # Numbered labels keep every crop unique on the frame
+            label = f"{words[int(rng.integers(len(words)))]} {row}"
+            cv2.putText(img, label, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, 30, 1, cv2.LINE_AA)
+            cv2.rectangle(img, (x + 140, y - 16), (x + 340, y + 6), 120, 1)
+            row += 1
+    return img
+
+
+def check_pyramid_accuracy(target_paths=None, template_sizes=((16, 32), (16, 48), (24, 96), (48, 160)), crops_per_size=4,
+                           tolerance=2, pyramid_levels=2, refine_margin=6, seed=0):
+    """
+    Compare the pyramid and exhaustive modes on templates cropped from the screenshots they are searched in.
+
+    Each template is cut out of the screenshot at a random textured location that no
+    other location matches above the threshold, so every case has a known answer. The
+    small sizes cover short text labels, which blur away at the coarse pyramid levels.
+    A synthetic form is always included.
+
+    Args:
+        target_paths (list of str, optional): Recorded screenshots. Defaults to template_alignment/target_1.png.
+        template_sizes (tuple, optional): (height, width) of the cropped templates.
+        crops_per_size (int, optional): Templates cropped per size and screenshot.
+        tolerance (int, optional): Maximum pixel distance for a location to count as correct.
+        pyramid_levels (int, optional): Pyramid levels used by the coarse-to-fine matcher.
+        refine_margin (int, optional): Refinement margin used by the coarse-to-fine matcher.
+        seed (int, optional): Seed of the crop locations.
+
+    Returns:
+        list: (target, template size, expected_loc, pyramid_loc, agreed) for every case.
+    """
+    if target_paths is None:
+        target_paths = [path for path in ['./template_alignment/target_1.png'] if os.path.exists(path)]
+    targets = [("synthetic form", _synthetic_form(seed=seed))]
+    targets += [(path, cv2.imread(path, cv2.IMREAD_GRAYSCALE)) for path in target_paths]
+
+    pyramid = TemplateAligner(screen_width=1, screen_height=1, match_mode=TemplateAligner.MATCH_MODE_PYRAMID,
+                              pyramid_levels=pyramid_levels, refine_margin=refine_margin)
+    rng = np.random.default_rng(seed)
+    report = []
+    exhaustive_time, pyramid_time = 0.0, 0.0
+    for target_name, target_img in targets:
+        img_h, img_w = target_img.shape[:2]
+        for template_h, template_w in template_sizes:
+            found = 0
+            for _ in range(crops_per_size * 50):
+                if found == crops_per_size:
+                    break
+                x = int(rng.integers(0, img_w - template_w))
+                y = int(rng.integers(0, img_h - template_h))
+                template_img = np.ascontiguousarray(target_img[y:y + template_h, x:x + template_w])
+                # Flat crops match anywhere, so they say nothing about either mode
+                if template_img.std() < 30:
+                    continue
+
+                start_time = time.perf_counter()
+                result = cv2.matchTemplate(target_img, template_img, cv2.TM_CCOEFF_NORMED)
+                elapsed_time = time.perf_counter() - start_time
+                # Skip crops that also match elsewhere, where either location would be right
+                result[max(y - template_h // 2, 0):y + template_h // 2 + 1,
+                       max(x - template_w // 2, 0):x + template_w // 2 + 1] = -1.0
+                if result.max() >= TemplateAligner.DEFAULT_TEMPLATE_MATCHING_THRESHOLD:
+                    continue
+                exhaustive_time += elapsed_time
+                found += 1
+
+                start_time = time.perf_counter()
+                pyramid_val, pyramid_loc = pyramid.template_match(target_img, template_img)
+                pyramid_time += time.perf_counter() - start_time
+
+                agreed = (pyramid_val >= TemplateAligner.DEFAULT_TEMPLATE_MATCHING_THRESHOLD
+                          and abs(x - pyramid_loc[0]) <= tolerance and abs(y - pyramid_loc[1]) <= tolerance)
+                report.append((target_name, (template_h, template_w), (x, y), pyramid_loc, agreed))
+                print(f"{template_w}x{template_h} template at {(x, y)} on {target_name}: "
+                      f"pyramid {pyramid_loc} ({pyramid_val:.3f}) -> {'OK' if agreed else 'MISMATCH'}")
+
+    agreed_count = sum(1 for row in report if row[-1])
+    print(f"Pyramid agreement: {agreed_count}/{len(report)} matches within {tolerance}px "
+          f"({pyramid.pyramid_fallbacks} exhaustive fallbacks)")
+    print(f"Matching time: exhaustive {exhaustive_time:.3f}s, pyramid {pyramid_time:.3f}s")
+    return report
+
+
+def check_change_gating():
+    """
+    Check that a reused match sees every change since the template was last matched.
+
+    A template moves while only another template is matched on the frames in between.
+    Once the screen is still again, the moved template must be found at its new
+    location instead of being answered from its stale match.
+
+    Returns:
+        bool: True if the gated aligner agrees with an ungated one.
+    """
+    from template_alignment.change_detector import FrameChangeDetector
+
+    rng = np.random.default_rng(0)
+    moving = rng.integers(0, 256, (40, 60), dtype=np.uint8)
+    still = rng.integers(0, 256, (40, 60), dtype=np.uint8)
+
+    def frame(moving_y):
+        img = np.full((600, 800), 255, dtype=np.uint8)
+        img[moving_y:moving_y + 40, 175:235] = moving
+        img[50:90, 600:660] = still
+        return img
+
+    gated = TemplateAligner(screen_width=1, screen_height=1, change_detector=FrameChangeDetector())
+    ungated = TemplateAligner(screen_width=1, screen_height=1)
+
+    def match(aligner, img, name, template):
+        aligner.gate_frame(img)
+        return aligner.match_with_prior(img, template, name)
+
+    match(gated, frame(125), "moving", moving)
+    match(gated, frame(429), "still", still)  # The moving template changes while another one is matched
+    gated_val, gated_loc = match(gated, frame(429), "moving", moving)
+    expected_val, expected_loc = ungated.match_with_prior(frame(429), moving, "moving")
+    agreed = tuple(gated_loc) == tuple(expected_loc)
+    print(f"Gated match {gated_loc} ({gated_val:.3f}), ungated {expected_loc} ({expected_val:.3f}) -> "
+          f"{'OK' if agreed else 'STALE'}")
+    return agreed
+
+
 if __name__ == "__main__":
-    import os
     import glob
 
     target_img_path = './template_alignment/target_1.png'
@@ -0,0 +1,166 @@
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+
+
+class TemplateCache:
+    """
+    LRU store of decoded grayscale template images.
+
+    Entries are keyed by absolute path and validated against the file mtime, so an
+    edited PNG is decoded again while an unchanged one is decoded exactly once.
+    The total size of cached arrays is kept under a byte budget by evicting the
+    least recently used templates.
+    """
+    # Default memory budget for decoded templates (64 MB)
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Initialize the TemplateCache instance.
+
+        Args:
+            max_bytes (int, optional): Upper bound on the bytes held by decoded templates.
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # abs path -> (mtime, image)
+        self._lock = threading.Lock()
+
+    def _decode(self, template_path):
+        """
+        Decode a template image from disk in grayscale.
+
+        Args:
+            template_path (str): Path to the template image.
+
+        Returns:
+            numpy.ndarray: The read-only grayscale template image.
+        """
+        template_img = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+        if template_img is None:
+            raise FileNotFoundError(f"Template image not found or unreadable: {template_path}")
+        # Cached arrays are shared between callers, protect them from in-place edits
+        template_img.flags.writeable = False
+        return template_img
+
+    def _evict(self):
+        """
+        Drop least recently used entries until the cache fits in its byte budget.
+        The most recent entry is always kept, even if it alone exceeds the budget.
+        """
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted_img) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_img.nbytes
+            self.evictions += 1
+
+    def get(self, template_path):
+        """
+        Return the decoded template, reading it from disk only on a miss.
+
+        Args:
+            template_path (str): Path to the template image.
+
+        Returns:
+            numpy.ndarray: The read-only grayscale template image.
+        """
+        key = os.path.abspath(template_path)
+        try:
+            mtime = os.path.getmtime(key)
+        except OSError:
+            raise FileNotFoundError(f"Template image not found: {template_path}")
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        # Decode outside the lock so other threads can keep reading cached entries
+        template_img = self._decode(key)
+
+        with self._lock:
+            self.misses += 1
+            stale = self._entries.pop(key, None)
+            if stale is not None:
+                self.current_bytes -= stale[1].nbytes
+            self._entries[key] = (mtime, template_img)
+            self.current_bytes += template_img.nbytes
+            self._evict()
+        return template_img
+
+    def preload(self, template_paths):
+        """
+        Decode a batch of templates ahead of time.
+
+        Args:
+            template_paths (iterable of str): Paths to the template images.
+
+        Returns:
+            int: Number of templates now held in the cache.
+        """
+        for template_path in template_paths:
+            self.get(template_path)
+        return len(self._entries)
+
+    def preload_dir(self, folder_path):
+        """
+        Decode every PNG template inside a folder.
+
+        Args:
+            folder_path (str): Folder holding the template images.
+
+        Returns:
+            int: Number of templates now held in the cache.
+        """
+        if not os.path.isdir(folder_path):
+            raise FileNotFoundError(f"Folder not found: {folder_path}")
+        return self.preload(
+            os.path.join(folder_path, file)
+            for file in sorted(os.listdir(folder_path))
+            if file.lower().endswith('.png')
+        )
+
+    def stats(self):
+        """
+        Report cache counters.
+
+        Returns:
+            dict: Hits, misses, evictions, entry count and bytes in use.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def reset_stats(self):
+        """
+        Zero the hit/miss/eviction counters without dropping cached templates.
+        """
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def clear(self):
+        """
+        Drop every cached template.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+# Cache shared by every TemplateAligner that is not given its own
+shared_template_cache = TemplateCache()
@@ -0,0 +1,262 @@
+import os
+import json
+import struct
+import hashlib
+import threading
+
+import cv2
+import numpy as np
+
+
+PACK_MAGIC = b"TPAK"
+PACK_FORMAT_VERSION = 1
+PACK_FILE_NAME = "templates.pack"
+# Offsets of every array are aligned so the memory-mapped views are well aligned
+PACK_ALIGNMENT = 64
+# Fixed-size file preamble: magic, format version, header length
+PACK_PREAMBLE = struct.Struct("<4sIQ")
+
+
+def _align(offset):
+    return (offset + PACK_ALIGNMENT - 1) // PACK_ALIGNMENT * PACK_ALIGNMENT
+
+
+def _relative_key(path, base_dir):
+    """
+    Normalize a template path into the key used by the pack's name index.
+    """
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(base_dir)).replace(os.sep, "/")
+
+
+def find_template_images(base_dir):
+    """
+    List every PNG template below the image folders of an EMR template tree.
+
+    Args:
+        base_dir (str): EMR template folder, e.g. ./emr_templates/officeAlly
+
+    Returns:
+        list: Sorted template image paths.
+    """
+    template_paths = []
+    for root, _, files in os.walk(base_dir):
+        if os.path.basename(root) != "images":
+            continue
+        template_paths.extend(os.path.join(root, file) for file in files if file.lower().endswith('.png'))
+    return sorted(template_paths)
+
+
+def build_template_pack(base_dir, output_path=None, pyramid_levels=2, min_level_side=8):
+    """
+    Compile every template of an EMR into a single memory-mappable pack file.
+
+    The pack holds the grayscale arrays, their sizes, per-template mean/std,
+    optional 2x downscaled pyramid levels and a name index keyed by the path
+    relative to base_dir.
+
+    Args:
+        base_dir (str): EMR template folder, e.g. ./emr_templates/officeAlly
+        output_path (str, optional): Where to write the pack. Defaults to <base_dir>/templates.pack
+        pyramid_levels (int, optional): Number of downscaled levels stored per template.
+        min_level_side (int, optional): Levels whose smaller side would drop below this are not stored.
+
+    Returns:
+        str: Path to the written pack.
+    """
+    if not os.path.isdir(base_dir):
+        raise FileNotFoundError(f"Folder not found: {base_dir}")
+    output_path = output_path or os.path.join(base_dir, PACK_FILE_NAME)
+
+    entries = {}
+    blobs = []
+    offset = 0
+    fingerprint = hashlib.sha1()
+    for template_path in find_template_images(base_dir):
+        template_img = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+        if template_img is None:
+            raise RuntimeError(f"Could not decode template image: {template_path}")
+        key = _relative_key(template_path, base_dir)
+        mtime = os.path.getmtime(template_path)
+
+        levels = [template_img]
+        while len(levels) <= pyramid_levels and min(levels[-1].shape[:2]) // 2 >= min_level_side:
+            levels.append(cv2.pyrDown(levels[-1]))
+
+        level_entries = []
+        for level_img in levels:
+            level_img = np.ascontiguousarray(level_img)
+            offset = _align(offset)
+            level_entries.append({"shape": list(level_img.shape), "offset": offset})
+            blobs.append((offset, level_img.tobytes()))
+            offset += level_img.nbytes
+
+        mean, std = cv2.meanStdDev(template_img)
+        entries[key] = {
+            "name": os.path.splitext(os.path.basename(template_path))[0],
+            "dir": os.path.dirname(key),
+            "shape": list(template_img.shape),
+            "mean": float(mean[0][0]),
+            "std": float(std[0][0]),
+            "mtime": mtime,
+            "levels": level_entries,
+        }
+        fingerprint.update(f"{key}|{mtime}|{template_img.shape}".encode())
+
+    header = {
+        "version": fingerprint.hexdigest()[:16],
+        "pyramid_levels": pyramid_levels,
+        "entries": entries,
+    }
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(PACK_PREAMBLE.size + len(header_bytes))
+
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(PACK_PREAMBLE.pack(PACK_MAGIC, PACK_FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for blob_offset, blob in blobs:
+            f.seek(data_start + blob_offset)
+            f.write(blob)
+    os.replace(tmp_path, output_path)
+    print(f"Packed {len(entries)} templates into {output_path} (version {header['version']})")
+    return output_path
+
+
+class TemplatePack:
+    """
+    Read-only, lazily memory-mapped view of a compiled template pack.
+
+    Nothing is read until the first lookup; arrays returned are zero-copy views
+    into the mapped file.
+    """
+
+    def __init__(self, pack_path, base_dir=None):
+        """
+        Initialize the TemplatePack instance.
+
+        Args:
+            pack_path (str): Path to the pack file.
+            base_dir (str, optional): Folder the template paths are relative to. Defaults to the pack's folder.
+        """
+        self.pack_path = pack_path
+        self.base_dir = os.path.abspath(base_dir or os.path.dirname(pack_path))
+        self._header = None
+        self._buffer = None
+        self._data_start = 0
+        self._names_by_dir = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        """
+        Map the pack file and parse its header on first use.
+        """
+        if self._header is not None:
+            return
+        with self._lock:
+            if self._header is not None:
+                return
+            if not os.path.exists(self.pack_path):
+                raise FileNotFoundError(f"Template pack not found at {self.pack_path}")
+            with open(self.pack_path, 'rb') as f:
+                magic, format_version, header_len = PACK_PREAMBLE.unpack(f.read(PACK_PREAMBLE.size))
+                if magic != PACK_MAGIC or format_version != PACK_FORMAT_VERSION:
+                    raise ValueError(f"Unsupported template pack: {self.pack_path}")
+                header = json.loads(f.read(header_len))
+            self._data_start = _align(PACK_PREAMBLE.size + header_len)
+            self._buffer = np.memmap(self.pack_path, dtype=np.uint8, mode='r')
+
+            names_by_dir = {}
+            for key, entry in header["entries"].items():
+                names_by_dir.setdefault(entry["dir"], []).append(entry["name"])
+            self._names_by_dir = names_by_dir
+            self._header = header
+
+    @property
+    def version(self):
+        """
+        Fingerprint of the packed templates (paths, mtimes and sizes).
+        """
+        self._ensure_loaded()
+        return self._header["version"]
+
+    def _entry(self, template_path):
+        self._ensure_loaded()
+        return self._header["entries"].get(_relative_key(template_path, self.base_dir))
+
+    def __contains__(self, template_path):
+        return self._entry(template_path) is not None
+
+    def _view(self, level_entry):
+        start = self._data_start + level_entry["offset"]
+        shape = tuple(level_entry["shape"])
+        return self._buffer[start:start + int(np.prod(shape))].reshape(shape)
+
+    def get(self, template_path):
+        """
+        Return the full-resolution grayscale template.
+
+        Args:
+            template_path (str): Path of the original template PNG.
+
+        Returns:
+            numpy.ndarray or None: Read-only view into the pack, or None if the template is not packed.
+        """
+        entry = self._entry(template_path)
+        if entry is None:
+            return None
+        return self._view(entry["levels"][0])
+
+    def get_pyramid(self, template_path):
+        """
+        Return the stored pyramid of a template.
+
+        Returns:
+            list or None: Views from full resolution (index 0) to the coarsest stored level.
+        """
+        entry = self._entry(template_path)
+        if entry is None:
+            return None
+        return [self._view(level_entry) for level_entry in entry["levels"]]
+
+    def get_stats(self, template_path):
+        """
+        Return the precomputed (mean, std) of a template, or None if it is not packed.
+        """
+        entry = self._entry(template_path)
+        if entry is None:
+            return None
+        return entry["mean"], entry["std"]
+
+    def list_names(self, img_dir):
+        """
+        List template names packed for an image folder, replacing a directory scan.
+
+        Args:
+            img_dir (str): Image folder, e.g. ./emr_templates/officeAlly/patient_input/images
+
+        Returns:
+            list: Template names without extension, empty if the folder is not in the pack.
+        """
+        self._ensure_loaded()
+        return list(self._names_by_dir.get(_relative_key(img_dir, self.base_dir), []))
+
+    def is_stale(self):
+        """
+        Check whether templates were changed, removed or added on disk since the pack was built.
+        """
+        self._ensure_loaded()
+        for key, entry in self._header["entries"].items():
+            template_path = os.path.join(self.base_dir, key)
+            if not os.path.exists(template_path) or os.path.getmtime(template_path) != entry["mtime"]:
+                return True
+        return any(
+            _relative_key(template_path, self.base_dir) not in self._header["entries"]
+            for template_path in find_template_images(self.base_dir)
+        )
+
+
+if __name__ == "__main__":
+    import sys
+
+    emr_base_dir = sys.argv[1] if len(sys.argv) > 1 else "./emr_templates/officeAlly"
+    build_template_pack(emr_base_dir)
@@ -1,7 +1,8 @@
 import pyautogui
 import keyboard
 import time
-from PIL import ImageGrab
+import cv2
+from computer.screen_capture import get_shared_capture_backend
 
 # Parameters for the cropping region
 CROP_WIDTH = 350 # Width of the cropping region
@@ -9,12 +10,11 @@ CROP_HEIGHT = 150  # Height of the cropping region
 
 
 def capture_screenshot(center_x, center_y, width, height):
-    # Get screen size
-    screen_width, screen_height = pyautogui.size()
+    capture_backend = get_shared_capture_backend()
 
-    # Get the scale factor between the actual screen size and the image size captured by ImageGrab
-    screenshot = ImageGrab.grab()
-    img_width, img_height = screenshot.size
+    # Get the scale factor between the actual screen size and the captured image size
+    screen_width, screen_height = capture_backend.screen_size()
+    img_width, img_height = capture_backend.frame_size()
     scale_x = img_width / screen_width
     scale_y = img_height / screen_height
 
@@ -28,12 +28,12 @@ def capture_screenshot(center_x, center_y, width, height):
     right = min(img_width, scaled_center_x + int(width * scale_x) // 2)
     bottom = min(img_height, scaled_center_y + int(height * scale_y) // 2)
 
-    # Crop the screenshot to the desired region
-    cropped_image = screenshot.crop((left, top, right, bottom))
+    # Capture only the desired region
+    cropped_image = capture_backend.grab(region=(left, top, right - left, bottom - top), gray=False)
 
     # Save the cropped image
     timestamp = int(time.time())
-    cropped_image.save(f"cropped_screenshot_{timestamp}.png")
+    cv2.imwrite(f"cropped_screenshot_{timestamp}.png", cropped_image)
     print(f"Saved cropped screenshot as cropped_screenshot_{timestamp}.png")
 
 